@@ -0,0 +1,172 @@
+# 压缩包直读：以 GDAL 风格的 /vsizip/、/vsitar/ 虚拟路径表示压缩包内的文件，无需先解压
+import functools
+import io
+import os
+import re
+import tarfile
+import zipfile
+from contextlib import contextmanager
+
+VSI_ZIP = "/vsizip/"
+VSI_TAR = "/vsitar/"
+# GDAL 的 /vsitar/ 只支持未压缩与 gzip 压缩的 tar，bz2/xz 仅用于 Python 端读取的 CSV
+ARCHIVE_EXT = (".zip", ".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tar.xz")
+GDAL_ARCHIVE_EXT = (".zip", ".tar", ".tgz", ".tar.gz")
+# 压缩的 tar 不能随机访问，定位任一成员都要从包头解压
+COMPRESSED_TAR_EXT = (".tgz", ".tar.gz", ".tar.bz2", ".tar.xz")
+READ_BUFFER = 8 << 20
+
+_VSI_RE = re.compile(r"^(/vsi(?:zip|tar)/)(.*?\.(?:zip|tar|tgz|tar\.gz|tar\.bz2|tar\.xz))(?:/(.*))?$", re.IGNORECASE)
+
+
+def is_archive(path, gdal_readable=False):
+    return path.lower().endswith(GDAL_ARCHIVE_EXT if gdal_readable else ARCHIVE_EXT) and os.path.isfile(path)
+
+
+def is_compressed_tar(path):
+    return path.lower().endswith(COMPRESSED_TAR_EXT)
+
+
+def archive_stem(path):
+    name = os.path.basename(path)
+    for ext in sorted(ARCHIVE_EXT, key=len, reverse=True):
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+
+def vsi_path(archive, member=""):
+    prefix = VSI_ZIP if archive.lower().endswith(".zip") else VSI_TAR
+    return prefix + archive.replace("\\", "/") + (f"/{member.strip('/')}" if member.strip("/") else "")
+
+
+def split_vsi(path):
+    """虚拟路径拆分为 (压缩包路径, 包内路径)，普通路径返回 None"""
+    match = _VSI_RE.match(path)
+    if not match:
+        return None
+    return match.group(2), (match.group(3) or "").strip("/")
+
+
+def member_names(archive):
+    """包内全部文件（不含目录）的路径列表，按压缩包大小与修改时间缓存"""
+    stat = os.stat(archive)
+    return _member_names(archive, stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _member_names(archive, size, mtime_ns):
+    if archive.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as zf:
+            return tuple(info.filename for info in zf.infolist() if not info.is_dir())
+    with tarfile.open(archive, "r:*") as tf:
+        return tuple(info.name for info in tf.getmembers() if info.isfile())
+
+
+def archive_folders(archive, suffixes):
+    """包内含有指定扩展名文件的目录，返回其虚拟路径列表"""
+    folders = sorted({posix_dirname(name) for name in member_names(archive) if name.lower().endswith(suffixes)})
+    return [vsi_path(archive, folder) for folder in folders]
+
+
+def scene_name(scene, parts):
+    """由场景名（压缩包名或解压目录名）与其下的相对路径各级拼出输出名，不同目录或压缩包中的同名文件互不覆盖；
+    压缩包内常见与包同名的顶层目录，拼接时去掉重复的一级"""
+    parts = [p for p in parts if p and p != "."]
+    return "_".join([scene] + parts[1 if parts[:1] == [scene] else 0:])
+
+
+def posix_dirname(member):
+    return member.rsplit("/", 1)[0] if "/" in member else ""
+
+
+def list_files(folder, suffixes):
+    """列出目录（或压缩包内目录）下直接包含的指定扩展名文件，返回完整路径"""
+    parts = split_vsi(folder)
+    if parts is None:
+        return sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                      if f.lower().endswith(suffixes) and os.path.isfile(os.path.join(folder, f)))
+    archive, prefix = parts
+    return [vsi_path(archive, name) for name in sorted(member_names(archive))
+            if posix_dirname(name) == prefix and name.lower().endswith(suffixes)]
+
+
+def path_exists(path):
+    parts = split_vsi(path)
+    if parts is None:
+        return os.path.exists(path)
+    archive, member = parts
+    return os.path.isfile(archive) and member in member_names(archive)
+
+
+@contextmanager
+def open_text(path, newline=None, errors=None):
+    """以文本方式打开普通文件或压缩包内的文件，包内文件边解压边读取"""
+    parts = split_vsi(path)
+    if parts is None:
+        with open(path, "r", encoding="utf-8", newline=newline, errors=errors) as f:
+            yield f
+        return
+    archive, member = parts
+    if archive.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as zf, zf.open(member) as raw:
+            yield io.TextIOWrapper(io.BufferedReader(raw, READ_BUFFER), encoding="utf-8", newline=newline,
+                                   errors=errors)
+    else:
+        with tarfile.open(archive, "r:*") as tf:
+            raw = tf.extractfile(member)
+            if raw is None:
+                raise FileNotFoundError(f"压缩包中没有该文件：{path}")
+            with raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8", newline=newline, errors=errors)
+
+
+@contextmanager
+def open_texts(paths, reader=None):
+    """批量读取同一目录（或同一压缩包内目录）下的文件，返回 (读取顺序, 打开函数)，打开函数与 open_text 用法相同。
+
+    tar 包内的文件经 TarReader 读取，成员按包内存放顺序排列；给定 reader 时沿用已打开的包，否则为本批文件打开一次。
+    普通目录与 zip 保持给定顺序"""
+    parts = split_vsi(paths[0]) if paths else None
+    if parts is None or parts[0].lower().endswith(".zip"):
+        yield list(paths), open_text
+        return
+    if reader is not None:
+        yield sorted(paths, key=reader.offset), reader.open
+        return
+    with TarReader(parts[0]) as reader:
+        yield sorted(paths, key=reader.offset), reader.open
+
+
+class TarReader:
+    """只打开一次、成员信息只读取一遍的 tar 包。
+
+    gzip/bz2/xz 压缩的 tar 不能随机访问，逐个用 open_text 打开时每个成员都要从包头重新解压；
+    经同一个 TarReader 按包内存放顺序（offset）读取成员时，整个包只需顺序解压一遍"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self._tar = tarfile.open(archive, "r:*")
+        self._infos = {vsi_path(archive, info.name): info for info in self._tar.getmembers() if info.isfile()}
+
+    def offset(self, path):
+        """成员在包内的位置，按此排序即为顺序读取的次序"""
+        info = self._infos.get(path)
+        if info is None:
+            raise FileNotFoundError(f"压缩包中没有该文件：{path}")
+        return info.offset
+
+    @contextmanager
+    def open(self, path, newline=None, errors=None):
+        self.offset(path)
+        with self._tar.extractfile(self._infos[path]) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", newline=newline, errors=errors)
+
+    def close(self):
+        self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,142 @@
+# 影像边界提取：从低分辨率金字塔读取有效数据范围，并行矢量化、简化后合并为一个带空间索引的 shapefile
+import os
+import time
+from concurrent.futures import as_completed
+import numpy as np
+from osgeo import gdal, ogr, osr
+from core.thread_pool import ThreadPool, ProcessPool
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+OVERVIEW_MAX_PIXELS = 1 << 20  # 读取有效范围时使用的最大像元数，GDAL 会自动选用相近的金字塔层
+SIMPLIFY_PIXELS = 1.0          # 简化容差（以降采样后的像元大小为单位）
+
+
+def extract_boundaries(input_folder, output_file, log_func, logger=None, use_processes=True,
+                       max_pixels=OVERVIEW_MAX_PIXELS):
+    """批量提取 GeoTIFF 的有效数据边界，统一转换到 WGS84 后写入 output_file，返回 [output_file]"""
+    start = time.perf_counter()
+    tif_files = [
+        os.path.join(input_folder, f)
+        for f in sorted(os.listdir(input_folder))
+        if f.lower().endswith((".tif", ".tiff")) and os.path.isfile(os.path.join(input_folder, f))
+    ]
+    # 矢量化与几何合并为 CPU 任务，默认交给进程池以绕开 GIL
+    pool = ProcessPool("boundary") if use_processes else ThreadPool()
+
+    with pool.log_channel(log_func) as job_log:
+        futures = [pool.submit(_extract_one, path, max_pixels, job_log) for path in tif_files]
+        results = [r for r in (f.result() for f in as_completed(futures)) if r]
+
+    results.sort(key=lambda r: r[0])
+    _write_boundaries(output_file, results)
+    log_func(f"🎉 影像边界提取完成: {len(results)}/{len(tif_files)} 景 → {output_file}"
+             f"（耗时 {time.perf_counter() - start:.2f}s）")
+    if logger:
+        logger.flush()
+    return [output_file] if results else []
+
+
+def _extract_one(tif_path, max_pixels, log_func):
+    """返回 (文件名, 路径, WGS84 下的 WKB 几何)，失败时返回 None"""
+    name = os.path.basename(tif_path)
+    try:
+        dataset = gdal.Open(tif_path)
+        srs_wkt = dataset.GetProjection()
+        if not srs_wkt:
+            raise ValueError("影像缺少坐标系")
+
+        # 按目标像元数缩小读取，GDAL 自动从金字塔读取，不触及全分辨率数据
+        scale = min(1.0, (max_pixels / (dataset.RasterXSize * dataset.RasterYSize)) ** 0.5)
+        small = gdal.Translate("", dataset, options=gdal.TranslateOptions(
+            format="MEM",
+            width=max(1, int(dataset.RasterXSize * scale)),
+            height=max(1, int(dataset.RasterYSize * scale)),
+            resampleAlg="nearest"
+        ))
+
+        mask = _valid_mask(small)
+        if not mask.any():
+            raise ValueError("影像没有有效数据")
+
+        geometry = _polygonize(mask, small.GetGeoTransform(), srs_wkt)
+        pixel_size = abs(small.GetGeoTransform()[1])
+        geometry = geometry.SimplifyPreserveTopology(pixel_size * SIMPLIFY_PIXELS)
+
+        source_srs = osr.SpatialReference(wkt=srs_wkt)
+        target_srs = osr.SpatialReference()
+        target_srs.ImportFromEPSG(4326)
+        for srs in (source_srs, target_srs):
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        geometry.Transform(osr.CoordinateTransformation(source_srs, target_srs))
+
+        log_func(f"✅ 边界提取完成: {name}")
+        return name, tif_path, bytes(geometry.ExportToWkb())
+    except Exception as e:
+        log_func(f"❌ 边界提取失败: {name} → {e}")
+        return None
+
+
+def _valid_mask(dataset):
+    """有 nodata/掩膜时以掩膜为准；否则按正射输出的约定，各波段均为 0 的像元视为无效"""
+    valid = np.zeros((dataset.RasterYSize, dataset.RasterXSize), dtype=bool)
+    for i in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(i)
+        if band.GetMaskFlags() & gdal.GMF_ALL_VALID:
+            valid |= band.ReadAsArray() != 0
+        else:
+            valid |= band.GetMaskBand().ReadAsArray() > 0
+    return valid
+
+
+def _polygonize(mask, geo_transform, srs_wkt):
+    rows, cols = mask.shape
+    mask_ds = gdal.GetDriverByName("MEM").Create("", cols, rows, 1, gdal.GDT_Byte)
+    mask_ds.SetGeoTransform(geo_transform)
+    mask_ds.SetProjection(srs_wkt)
+    band = mask_ds.GetRasterBand(1)
+    band.WriteArray(mask.astype(np.uint8))
+
+    vector_ds = ogr.GetDriverByName("Memory").CreateDataSource("")
+    layer = vector_ds.CreateLayer("mask", osr.SpatialReference(wkt=srs_wkt), ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("value", ogr.OFTInteger))
+    # 以自身作为掩膜，只矢量化有效像元
+    gdal.Polygonize(band, band, layer, 0, [])
+
+    merged = ogr.Geometry(ogr.wkbMultiPolygon)
+    for feature in layer:
+        merged.AddGeometry(feature.GetGeometryRef())
+    return merged.UnionCascaded()
+
+
+def _write_boundaries(output_file, results):
+    driver = ogr.GetDriverByName("ESRI Shapefile")
+    if os.path.exists(output_file):
+        driver.DeleteDataSource(output_file)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    datasource = driver.CreateDataSource(output_file)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    layer_name = os.path.splitext(os.path.basename(output_file))[0]
+    layer = datasource.CreateLayer(layer_name, srs, ogr.wkbMultiPolygon)
+    for field_name in ("name", "path"):
+        field = ogr.FieldDefn(field_name, ogr.OFTString)
+        field.SetWidth(254)
+        layer.CreateField(field)
+
+    # 所有要素在一个事务中写入
+    layer.StartTransaction()
+    for name, path, wkb in results:
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField("name", name)
+        feature.SetField("path", path)
+        feature.SetGeometry(ogr.ForceToMultiPolygon(ogr.CreateGeometryFromWkb(wkb)))
+        layer.CreateFeature(feature)
+    layer.CommitTransaction()
+
+    # 写完后一次性建立 .qix 空间索引，QGIS 加载时自动使用
+    datasource.ExecuteSQL(f'CREATE SPATIAL INDEX ON "{layer_name}"')
+    datasource = None
@@ -0,0 +1,85 @@
+# 按影像范围裁剪的 DEM 缓存：同一 DEM 与范围只裁剪一次，跨分块与重跑复用，磁盘占用按 LRU 淘汰
+import hashlib
+import os
+import threading
+from math import floor, ceil
+from osgeo import gdal
+
+gdal.UseExceptions()
+
+DEM_CACHE_DIRNAME = ".dem_cache"
+DEM_CACHE_BYTES = 2 << 30    # 缓存目录的磁盘占用上限
+DEM_MARGIN_DEGREES = 0.02    # 裁剪范围在影像范围外额外保留的边距（度）
+_GRID_DEGREES = 0.01         # 裁剪范围向外对齐到该网格，相邻或重复的范围可共用缓存
+
+_lock = threading.Lock()  # 只保护同一进程内的线程，跨进程依靠临时文件加原子替换
+
+
+def cropped_dem(dem_path, bounds, cache_dir, max_bytes=DEM_CACHE_BYTES):
+    """bounds 为 WGS84 (min_lon, min_lat, max_lon, max_lat)，返回裁剪后的 DEM 路径"""
+    min_lon, min_lat, max_lon, max_lat = _expand(bounds)
+    stat = os.stat(dem_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(dem_path)}|{stat.st_size}|{stat.st_mtime_ns}|{min_lon},{min_lat},{max_lon},{max_lat}"
+        .encode("utf-8")
+    ).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"dem_{key}.tif")
+
+    with _lock:
+        if os.path.exists(path):
+            os.utime(path)  # 命中时刷新修改时间，作为 LRU 排序依据
+            return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # 整景正射在多个子进程中进行，临时文件名同时带进程号与线程号
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    translate_options = gdal.TranslateOptions(
+        format="GTiff",
+        projWin=[min_lon, max_lat, max_lon, min_lat],
+        projWinSRS="EPSG:4326",
+        creationOptions=["TILED=YES", "COMPRESS=DEFLATE"]
+    )
+    try:
+        gdal.Translate(tmp_path, dem_path, options=translate_options)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    with _lock:
+        os.replace(tmp_path, path)
+        _evict(cache_dir, max_bytes, keep=path)
+    return path
+
+
+def _expand(bounds):
+    min_lon, min_lat, max_lon, max_lat = bounds
+    return (
+        round(floor((min_lon - DEM_MARGIN_DEGREES) / _GRID_DEGREES) * _GRID_DEGREES, 6),
+        round(floor((min_lat - DEM_MARGIN_DEGREES) / _GRID_DEGREES) * _GRID_DEGREES, 6),
+        round(ceil((max_lon + DEM_MARGIN_DEGREES) / _GRID_DEGREES) * _GRID_DEGREES, 6),
+        round(ceil((max_lat + DEM_MARGIN_DEGREES) / _GRID_DEGREES) * _GRID_DEGREES, 6),
+    )
+
+
+def _evict(cache_dir, max_bytes, keep):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.startswith("dem_") and name.endswith(".tif"):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except OSError:
+                continue  # 已被其他进程淘汰
+            entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(cache_dir, name)))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass  # 其他线程仍在读取（Windows 下无法删除），留待下次淘汰
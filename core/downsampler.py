@@ -1,73 +1,449 @@
 import os
-from math import floor
-import random
-from core.thread_pool import ThreadPool
+import time
+from concurrent.futures import as_completed
+from itertools import islice
+from math import log
+import numpy as np
+from core.job_manifest import JobManifest
+from core.point_cache import load_point_cache, read_point_lines
+from core.thread_pool import ThreadPool, ProcessPool
 
-def downsample_all(input_dir, output_dir, target_count, log_func, logger=None):
-    pool = ThreadPool()
-    futures = []
+MODE_MEMORY = "memory"      # 整文件读入内存后抽稀
+MODE_STREAM = "stream"      # 两遍流式读取，内存只与网格数相关
+MODE_ADAPTIVE = "adaptive"  # 自适应网格，输出点数精确等于目标点数
 
-    for file in os.listdir(input_dir):
-        if not file.endswith(".txt"):
-            continue
-        input_path = os.path.join(input_dir, file)
-        output_path = os.path.join(output_dir, file)
-        futures.append(pool.submit(_downsample_uniform, input_path, output_path, target_count, log_func))
+STREAM_CHUNK_LINES = 1_000_000  # 流式模式每次读取的行数
+ADAPTIVE_MAX_ITER = 32          # 自适应网格最大搜索次数
+MAX_GRID_SIZE = 1 << 30         # 网格边长上限，保证网格编号不溢出 int64
+CHUNK_THRESHOLD_BYTES = 512 << 20  # 超过该大小的文件在文件内部分块并行处理
+CHUNK_BYTES = 64 << 20             # 文件内并行时每个分块的字节数
+RANGE_READ_BYTES = 16 << 20        # 分块内每次读取的字节数
+
+
+def downsample_all(input_dir, output_dir, target_count, log_func, logger=None,
+                   mode=MODE_MEMORY, seed=None, tolerance=0.01, use_processes=True, incremental=True):
+    """返回抽稀失败的文件数"""
+    # 解析与网格计算为纯 CPU 任务，默认交给进程池以绕开 GIL
+    pool = ProcessPool("downsample") if use_processes else ThreadPool()
+    manifest = JobManifest(output_dir, "downsample", {
+        "target_count": target_count, "mode": mode, "seed": seed, "tolerance": tolerance
+    })
+    skipped = 0
+    failed = 0
 
-    for f in futures:
-        f.result()
+    with pool.log_channel(log_func) as job_log:
+        futures = {}
+        for file in os.listdir(input_dir):
+            if not file.endswith(".txt"):
+                continue
+            input_path = os.path.join(input_dir, file)
+            output_path = os.path.join(output_dir, file)
+            if incremental and manifest.is_done([input_path], [output_path]):
+                skipped += 1
+                continue
+            future = submit_downsample(pool, input_path, output_path, target_count, log_func, job_log,
+                                       mode, seed, tolerance, use_processes)
+            futures[future] = (input_path, output_path)
 
+        # 每完成一个文件立即写入清单，中途中断后重跑可从断点继续
+        for f in as_completed(futures):
+            input_path, output_path = futures[f]
+            try:
+                ok = f.result()
+            except Exception as e:
+                # 子进程异常退出等情况下任务函数来不及记录失败
+                log_func(f"❌ 抽稀失败: {os.path.basename(input_path)} → {e}")
+                ok = False
+            if ok:
+                manifest.mark_done([input_path], [output_path])
+            else:
+                failed += 1
+
+    if skipped:
+        log_func(f"⏭️ 跳过 {skipped} 个未变化的文件")
+    if failed:
+        log_func(f"⚠️ {failed} 个文件抽稀失败")
     log_func("🎯 点云抽稀全部完成")
     if logger:
         logger.flush()
+    return failed
+
+
+def submit_downsample(pool, input_path, output_path, target_count, log_func, job_log, mode=MODE_MEMORY, seed=None,
+                      tolerance=0.01, use_processes=True):
+    """按文件大小与模式选择抽稀方式并提交，返回 future；job_log 为 pool.log_channel 给出的日志函数"""
+    if (use_processes and mode != MODE_ADAPTIVE and os.path.getsize(input_path) > CHUNK_THRESHOLD_BYTES
+            and (mode == MODE_STREAM or load_point_cache(input_path) is None)):
+        # 大文件拆成字节区间交给进程池，由本进程的线程负责调度与合并，避免批次末尾只剩单核在跑
+        return ThreadPool().submit(_downsample_chunked, input_path, output_path, target_count, log_func, seed, pool)
+    if mode == MODE_STREAM:
+        return pool.submit(_downsample_stream, input_path, output_path, target_count, job_log, seed)
+    return pool.submit(_downsample_uniform, input_path, output_path, target_count, job_log,
+                       seed, mode == MODE_ADAPTIVE, tolerance)
+
+
+def _downsample_uniform(input_file, output_file, target_count, log_func, seed=None, adaptive=False, tolerance=0.01):
+    try:
+        start = time.perf_counter()
+        cache = load_point_cache(input_file)
+        if cache is not None and len(cache) <= target_count:
+            cache = None
+        if cache is not None:
+            # 命中二进制缓存：坐标直接来自 memmap，只按偏移读取被选中的行
+            lats, lons = cache["lat"], cache["lon"]
+            source = "缓存"
+        else:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            lats, lons, point_lines = _parse_lines(lines[1:])
+            source = "文本"
+
+            if len(point_lines) <= target_count:
+                _write_lines(output_file, point_lines)
+                log_func(f"⚠️ 点数不足，未抽稀: {os.path.basename(input_file)} → 原始点数 {len(point_lines)}")
+                return True
+
+        rng = np.random.default_rng(seed)
+        if adaptive:
+            selected, iterations = _select_adaptive(lats, lons, target_count, rng, tolerance)
+        else:
+            grid_size = max(1, int((len(lats) ** 0.5) / 5))
+            selected, iterations = _select_grid(lats, lons, grid_size, target_count, rng), 1
+
+        if cache is not None:
+            _write_lines(output_file, read_point_lines(input_file, cache, selected), len(selected))
+        else:
+            _write_lines(output_file, (point_lines[i] for i in selected), len(selected))
+        log_func(f"✅ 抽稀完成: {os.path.basename(input_file)} → {len(selected)} 点"
+                 f"（{source}，网格迭代 {iterations} 次，耗时 {time.perf_counter() - start:.2f}s）")
+        return True
+    except Exception as e:
+        log_func(f"❌ 抽稀失败: {os.path.basename(input_file)} → {e}")
+        return False
+
+
+def _cell_ids(lats, lons, bounds, grid_size):
+    min_lat, max_lat, min_lon, max_lon = bounds
+    i = np.floor((lats - min_lat) / (max_lat - min_lat + 1e-8) * grid_size).astype(np.int64)
+    j = np.floor((lons - min_lon) / (max_lon - min_lon + 1e-8) * grid_size).astype(np.int64)
+    return i * (grid_size + 1) + j
+
+
+def _pick_per_cell(cells, target_count, rng):
+    # 先随机打乱，再取每个网格第一次出现的点，相当于在网格内随机选一个
+    order = rng.permutation(len(cells))
+    _, first = np.unique(cells[order], return_index=True)
+    selected = order[first]
+
+    if len(selected) > target_count:
+        selected = rng.choice(selected, target_count, replace=False)
+    return np.sort(selected)
+
 
+def _select_grid(lats, lons, grid_size, target_count, rng):
+    """NumPy 网格抽稀：每个网格随机保留一个点，返回按原始顺序排列的行号"""
+    bounds = (lats.min(), lats.max(), lons.min(), lons.max())
+    return _pick_per_cell(_cell_ids(lats, lons, bounds, grid_size), target_count, rng)
 
-def _downsample_uniform(input_file, output_file, target_count, log_func):
+
+def _select_adaptive(lats, lons, target_count, rng, tolerance):
+    """搜索网格分辨率，使被占网格数落在 [目标点数, 目标点数×(1+容差)] 内，返回 (行号, 迭代次数)"""
+    bounds = (lats.min(), lats.max(), lons.min(), lons.max())
+    upper = target_count * (1 + tolerance)
+
+    # lo/hi 为 (网格边长, 被占网格数)，分别是当前已知不足与已达到目标的分辨率
+    lo, hi, hi_cells = (0, 0), None, None
+    prev = None
+    grid_size = max(1, int(target_count ** 0.5))
+    cells = None
+    iterations = 0
+
+    while iterations < ADAPTIVE_MAX_ITER:
+        iterations += 1
+        cells = _cell_ids(lats, lons, bounds, grid_size)
+        occupied = len(np.unique(cells))
+
+        if occupied >= target_count:
+            hi, hi_cells = (grid_size, occupied), cells
+            if occupied <= upper:
+                break
+        else:
+            lo = (grid_size, occupied)
+
+        if hi is None:
+            # 尚未达到目标：按被占网格数随分辨率的增长规律外推
+            if grid_size >= MAX_GRID_SIZE:
+                break
+            dim = _growth_dim(prev, (grid_size, occupied)) if prev else 2.0
+            next_size = int(grid_size * (target_count / max(occupied, 1)) ** (1 / dim)) + 1
+            next_size = min(max(next_size, grid_size + 1), grid_size * 16, MAX_GRID_SIZE)
+        else:
+            if hi[0] - lo[0] <= 1:
+                break
+            # 已夹逼：在对数空间插值，越界时退化为几何二分
+            next_size = 0
+            if lo[1] > 0:
+                dim = _growth_dim(lo, hi)
+                next_size = int(lo[0] * (target_count / lo[1]) ** (1 / dim))
+            if not lo[0] < next_size < hi[0]:
+                next_size = int((max(lo[0], 1) * hi[0]) ** 0.5)
+            next_size = min(max(next_size, lo[0] + 1), hi[0] - 1)
+
+        prev = (grid_size, occupied)
+        grid_size = next_size
+
+    # 取最小的已达标分辨率；无法达标（重复点过多）时使用最后一次结果
+    if hi_cells is not None:
+        cells = hi_cells
+    return _pick_per_cell(cells, target_count, rng), iterations
+
+
+def _growth_dim(a, b):
+    """由两次采样估计被占网格数随网格边长增长的幂次（点云的盒维数）"""
+    if a[1] <= 0 or b[1] <= 0 or a[0] == b[0] or a[1] == b[1]:
+        return 2.0
+    dim = log(b[1] / a[1]) / log(b[0] / a[0])
+    return min(max(dim, 0.25), 2.0)
+
+
+def _downsample_stream(input_file, output_file, target_count, log_func, seed=None):
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        total_count = int(lines[0].strip())
-        point_lines = lines[1:]
-
-        points = []
-        for line in point_lines:
-            parts = line.strip().split()
-            if len(parts) >= 4:
-                lat, lon = float(parts[1]), float(parts[2])
-                points.append((lat, lon, line.rstrip('\n')))  # 保留原始行
-
-        if len(points) <= target_count:
-            # 不抽稀，直接复制，保留原格式
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"{len(points)}\n")
-                f.writelines(line + "\n" for _, _, line in points)
-            log_func(f"⚠️ 点数不足，未抽稀: {os.path.basename(input_file)} → 原始点数 {len(points)}")
-            return
-
-        # 均匀抽稀（网格采样）
-        lats = [p[0] for p in points]
-        lons = [p[1] for p in points]
-        min_lat, max_lat = min(lats), max(lats)
-        min_lon, max_lon = min(lons), max(lons)
-
-        grid_size = max(1, int((len(points) ** 0.5) / 5))
-        grid = dict()
-        for lat, lon, line in points:
-            i = floor((lat - min_lat) / (max_lat - min_lat + 1e-8) * grid_size)
-            j = floor((lon - min_lon) / (max_lon - min_lon + 1e-8) * grid_size)
-            key = (i, j)
-            grid.setdefault(key, []).append(line)
-
-        selected_lines = [random.choice(pts) for pts in grid.values()]
-        if len(selected_lines) > target_count:
-            selected_lines = random.sample(selected_lines, target_count)
-
-        # 写入文件，保持原行格式
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"{len(selected_lines)}\n")
-            f.writelines(line + "\n" if not line.endswith("\n") else line for line in selected_lines)
-
-        log_func(f"✅ 抽稀完成: {os.path.basename(input_file)} → {len(selected_lines)} 点")
+        start = time.perf_counter()
+        # 第一遍：分块读取，统计点数与范围
+        count, bounds = 0, None
+        for lats, lons, _ in _iter_chunks(input_file):
+            count, bounds = _extend_bounds(count, bounds, lats, lons)
+
+        if count <= target_count:
+            _copy_points(input_file, output_file, count)
+            log_func(f"⚠️ 点数不足，未抽稀: {os.path.basename(input_file)} → 原始点数 {count}")
+            return True
+
+        # 第二遍：网格蓄水池采样，每个网格只保留一个点
+        grid_size = max(1, int((count ** 0.5) / 5))
+        rng = np.random.default_rng(seed)
+        reservoir = _CellReservoir(grid_size)
+
+        offset = 0
+        for lats, lons, lines in _iter_chunks(input_file):
+            if not len(lats):
+                continue
+            cells = _cell_ids(lats, lons, bounds, grid_size)
+            keys = rng.random(len(cells))
+            winners = _cell_winners(cells, keys)
+            reservoir.offer(cells[winners], keys[winners], offset + winners, [lines[i] for i in winners.tolist()])
+            offset += len(lines)
+
+        selected = reservoir.result(target_count, rng)
+        _write_lines(output_file, selected, len(selected))
+        log_func(f"✅ 流式抽稀完成: {os.path.basename(input_file)} → {len(selected)} 点"
+                 f"（网格迭代 1 次，耗时 {time.perf_counter() - start:.2f}s）")
+        return True
     except Exception as e:
         log_func(f"❌ 抽稀失败: {os.path.basename(input_file)} → {e}")
+        return False
+
+
+def _downsample_chunked(input_file, output_file, target_count, log_func, seed, pool):
+    """超大文件按换行对齐切分为字节区间，由进程池并行解析，主进程合并各区间的网格结果"""
+    try:
+        start = time.perf_counter()
+        ranges = _split_ranges(input_file, CHUNK_BYTES)
+
+        # 第一遍：各区间并行统计点数与范围
+        count, bounds = 0, None
+        for future in [pool.submit(_scan_range, input_file, lo, hi) for lo, hi in ranges]:
+            n, part = future.result()
+            if n:
+                count += n
+                bounds = _merge_bounds(bounds, part)
+
+        if count <= target_count:
+            _copy_points(input_file, output_file, count)
+            log_func(f"⚠️ 点数不足，未抽稀: {os.path.basename(input_file)} → 原始点数 {count}")
+            return True
+
+        # 第二遍：各区间并行求每个网格的候选点，按完成顺序并入全局蓄水池
+        grid_size = max(1, int((count ** 0.5) / 5))
+        reservoir = _CellReservoir(grid_size)
+        futures = [
+            pool.submit(_sample_range, input_file, lo, hi, bounds, grid_size, _range_seed(seed, k))
+            for k, (lo, hi) in enumerate(ranges)
+        ]
+        for future in as_completed(futures):
+            reservoir.offer(*future.result())
+
+        selected = reservoir.result(target_count, np.random.default_rng(seed))
+        _write_lines(output_file, selected, len(selected))
+        log_func(f"✅ 分块并行抽稀完成: {os.path.basename(input_file)} → {len(selected)} 点"
+                 f"（{len(ranges)} 个分块，网格迭代 1 次，耗时 {time.perf_counter() - start:.2f}s）")
+        return True
+    except Exception as e:
+        log_func(f"❌ 抽稀失败: {os.path.basename(input_file)} → {e}")
+        return False
+
+
+def _split_ranges(input_file, chunk_bytes):
+    """跳过点数行后，将文件切分为若干以换行结尾的字节区间"""
+    size = os.path.getsize(input_file)
+    with open(input_file, 'rb') as f:
+        f.readline()
+        begin = f.tell()
+        bounds = [begin]
+        pos = begin + chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()  # 移到下一行行首
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_bytes
+    bounds.append(size)
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def _iter_range(input_file, begin, end):
+    """逐块读取 [begin, end) 字节区间，返回 (块起始字节, 纬度数组, 经度数组, 原始行列表)；
+    二进制读取不做换行转换，行尾统一去掉回车，与文本方式读取的结果一致"""
+    with open(input_file, 'rb') as f:
+        f.seek(begin)
+        pos = begin
+        while pos < end:
+            data = f.read(min(RANGE_READ_BYTES, end - pos))
+            if pos + len(data) < end and not data.endswith(b"\n"):
+                data += f.readline()  # 补齐到行尾，区间本身已按换行对齐
+            lines = [line.rstrip("\r") + "\n" for line in data.decode('utf-8').split("\n")]
+            if data.endswith(b"\n"):
+                lines.pop()  # 末尾换行之后的空串不是一行
+            yield (pos,) + _parse_lines(lines)
+            pos += len(data)
+
+
+def _scan_range(input_file, begin, end):
+    count, bounds = 0, None
+    for _, lats, lons, _ in _iter_range(input_file, begin, end):
+        count, bounds = _extend_bounds(count, bounds, lats, lons)
+    return count, bounds
+
+
+def _sample_range(input_file, begin, end, bounds, grid_size, seed):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for block_start, lats, lons, lines in _iter_range(input_file, begin, end):
+        if not len(lats):
+            continue
+        cells = _cell_ids(lats, lons, bounds, grid_size)
+        keys = rng.random(len(cells))
+        winners = _cell_winners(cells, keys)
+        # 每行至少 1 字节，块起始字节加行号即可作为跨区间的全局顺序
+        parts.append((cells[winners], keys[winners], block_start + winners, [lines[i] for i in winners.tolist()]))
+
+    if not parts:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64), []
+
+    cells = np.concatenate([p[0] for p in parts])
+    keys = np.concatenate([p[1] for p in parts])
+    positions = np.concatenate([p[2] for p in parts])
+    lines = [line for p in parts for line in p[3]]
+    winners = _cell_winners(cells, keys)
+    return cells[winners], keys[winners], positions[winners], [lines[i] for i in winners.tolist()]
+
+
+def _range_seed(seed, index):
+    return None if seed is None else [seed, index]
+
+
+def _extend_bounds(count, bounds, lats, lons):
+    if not len(lats):
+        return count, bounds
+    return count + len(lats), _merge_bounds(bounds, (lats.min(), lats.max(), lons.min(), lons.max()))
+
+
+def _merge_bounds(a, b):
+    if a is None:
+        return b
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+def _cell_winners(cells, keys):
+    """返回每个网格中随机键最小的点的下标"""
+    order = np.lexsort((keys, cells))
+    _, first = np.unique(cells[order], return_index=True)
+    return order[first]
+
+
+class _CellReservoir:
+    """网格蓄水池：每个网格只保留随机键最小的一个点。
+
+    为每个点赋予均匀随机键并保留最小者，与"第 k 个点以 1/k 概率替换"的蓄水池采样等价，
+    且可以按块向量化、在多个分块之间合并。内存只与网格数相关。
+    """
+
+    def __init__(self, grid_size):
+        self.key = np.full((grid_size + 1) ** 2, np.inf)
+        self.pos = np.zeros((grid_size + 1) ** 2, dtype=np.int64)
+        self.line = {}
+
+    def offer(self, cells, keys, positions, lines):
+        # cells 须互不重复
+        better = np.flatnonzero(keys < self.key[cells])
+        cells = cells[better]
+        self.key[cells] = keys[better]
+        self.pos[cells] = positions[better]
+        for cell, idx in zip(cells.tolist(), better.tolist()):
+            self.line[cell] = lines[idx]
+
+    def result(self, target_count, rng):
+        occupied = np.flatnonzero(np.isfinite(self.key))
+        if len(occupied) > target_count:
+            occupied = rng.choice(occupied, target_count, replace=False)
+        occupied = occupied[np.argsort(self.pos[occupied])]
+        return [self.line[c] for c in occupied.tolist()]
+
+
+def _copy_points(input_file, output_file, count):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"{count}\n")
+        for _, _, lines in _iter_chunks(input_file):
+            f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+def _iter_chunks(input_file):
+    """分块读取点云文件，逐块返回 (纬度数组, 经度数组, 原始行列表)"""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        f.readline()  # 跳过点数行
+        while True:
+            lines = list(islice(f, STREAM_CHUNK_LINES))
+            if not lines:
+                break
+            yield _parse_lines(lines)
+
+
+def _parse_lines(lines):
+    try:
+        # 读入第 4 列只为确认每行至少有 4 列，列数不足时 loadtxt 报错并转入逐行过滤
+        coords = np.loadtxt(lines, usecols=(1, 2, 3), ndmin=2, dtype=np.float64)
+        if len(coords) == len(lines):
+            return coords[:, 0], coords[:, 1], lines
+    except ValueError:
+        pass
+
+    # 含空行或异常行时逐行过滤，与原实现一致只保留至少 4 列的行
+    kept, lats, lons = [], [], []
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 4:
+            lats.append(float(parts[1]))
+            lons.append(float(parts[2]))
+            kept.append(line)
+    return np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64), kept
+
+
+def _write_lines(output_file, lines, count=None):
+    if count is None:
+        lines = list(lines)
+        count = len(lines)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"{count}\n")
+        f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
@@ -0,0 +1,80 @@
+# 正射批处理的 GDAL 资源配置：在并发正射数与单景线程数之间分配 CPU 核，在各景之间分配内存
+import os
+from osgeo import gdal
+
+WARP_THREADS = 4                 # 单景正射的线程数上限，再多 Warp 的加速已不明显，不如多开一景
+MEMORY_FRACTION = 0.6            # 正射批处理可使用的可用内存比例
+MIN_CACHE_MB = 64                # 每景块缓存与 Warp 缓冲的下限
+DEFAULT_MEMORY_BYTES = 4 << 30   # 无法获取可用内存时的假定值
+
+
+class ResourceProfile:
+    """并发正射数 × 单景线程数不超过 CPU 核数；内存按并发数均分，每景一半作块缓存（GDAL_CACHEMAX），一半作 Warp 缓冲"""
+
+    def __init__(self, concurrent_warps, warp_threads, cache_mb, warp_memory_mb):
+        self.concurrent_warps = max(1, int(concurrent_warps))
+        self.warp_threads = max(1, int(warp_threads))
+        self.cache_mb = max(MIN_CACHE_MB, int(cache_mb))
+        self.warp_memory_mb = max(MIN_CACHE_MB, int(warp_memory_mb))
+
+    @classmethod
+    def auto(cls, cpu_count=None, memory_bytes=None):
+        """由 CPU 核数与可用内存推算配置"""
+        cpu_count = cpu_count or os.cpu_count() or 1
+        budget_mb = int((memory_bytes or available_memory() or DEFAULT_MEMORY_BYTES) * MEMORY_FRACTION) >> 20
+
+        warp_threads = min(WARP_THREADS, cpu_count)
+        # 内存不足以让每景分到最小缓存时减少并发数，而不是压低单景缓存
+        concurrent = max(1, min(cpu_count // warp_threads, budget_mb // (2 * MIN_CACHE_MB)))
+        per_warp_mb = budget_mb // concurrent
+        return cls(concurrent, warp_threads, per_warp_mb // 2, per_warp_mb // 2)
+
+    def apply(self):
+        """在执行正射的进程内调用，设置该进程的块缓存大小与 GDAL 线程数"""
+        gdal.SetCacheMax(self.cache_mb << 20)
+        gdal.SetConfigOption("GDAL_NUM_THREADS", str(self.warp_threads))
+
+    def warp_kwargs(self):
+        # warpMemoryLimit 小于 10000 时按 MB 解释，统一以字节传入避免歧义
+        return {
+            "multithread": self.warp_threads > 1,
+            "warpMemoryLimit": self.warp_memory_mb << 20,
+            "warpOptions": [f"NUM_THREADS={self.warp_threads}"],
+        }
+
+    def creation_options(self, options):
+        """追加压缩线程数，与单景线程数一致"""
+        return options + [f"NUM_THREADS={self.warp_threads}"]
+
+    def describe(self):
+        return (f"{self.concurrent_warps} 景并发 × 每景 {self.warp_threads} 线程，"
+                f"每景缓存 {self.cache_mb} MB / Warp 缓冲 {self.warp_memory_mb} MB")
+
+
+def available_memory():
+    """当前可用物理内存（字节），无法获取时返回 None"""
+    if os.name == "nt":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(status)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
@@ -0,0 +1,185 @@
+# 批处理作业清单：记录每个输入的指纹、参数与输出校验值，用于增量处理与断点续跑
+import datetime
+import hashlib
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from core.archive_reader import split_vsi
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+MANIFEST_NAME = ".tools_manifest.json"
+JOURNAL_SUFFIX = ".journal"   # 清单旁的追加日志，每完成一项追加一行
+LOCK_SUFFIX = ".lock"         # 跨进程锁文件，追加日志与合并清单时持有
+MANIFEST_VERSION = 1
+CHECKSUM_BLOCK_BYTES = 16 << 20
+COMPACT_ENTRIES = 1000        # 本进程追加的日志达到该条数时合并回清单文件
+
+
+class JobManifest:
+    """输出目录下的作业清单：每个输入完成后立即追加一行到日志文件，重跑时跳过输入、参数、输出均未变化的条目。
+
+    日志按条目数定期（以及下次打开清单时）合并回清单文件，每完成一项只写一行，不必重写整个清单；
+    读写均持有输出目录下的文件锁，多个进程（如同时运行的多个命令行任务）共用一个清单时不会丢失彼此的条目"""
+
+    def __init__(self, output_dir, job_type, params=None):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.journal_path = self.path + JOURNAL_SUFFIX
+        self.lock_path = self.path + LOCK_SUFFIX
+        self.job_type = job_type
+        # 经 JSON 往返归一化（元组变列表等），保证与读回的记录可直接比较
+        self.params = json.loads(json.dumps(params or {}, sort_keys=True))
+        self._lock = threading.Lock()
+        self._journaled = 0
+        if os.path.isdir(output_dir):
+            with _file_lock(self.lock_path):
+                jobs = self._compact() if os.path.exists(self.journal_path) else self._load()
+        else:
+            jobs = {}
+        self._entries = jobs.get(job_type, {})
+
+    def is_done(self, inputs, outputs):
+        """inputs 的第一个路径作为条目键，其余为附属输入（如 RPC 文件）"""
+        entry = self._entries.get(_key(inputs[0]))
+        if not entry or entry.get("params") != self.params:
+            return False
+        if entry.get("inputs") != [_fingerprint(p) for p in inputs]:
+            return False
+        recorded = entry.get("outputs", {})
+        if sorted(recorded) != sorted(_key(p) for p in outputs):
+            return False
+        for path in outputs:
+            info = recorded[_key(path)]
+            current = _fingerprint(path)
+            if current is None or any(current.get(k) != info.get(k) for k in current):
+                return False
+        return True
+
+    def mark_done(self, inputs, outputs):
+        entry = {
+            "params": self.params,
+            "inputs": [_fingerprint(p) for p in inputs],
+            "outputs": {_key(p): dict(_fingerprint(p), checksum=_checksum(p)) for p in outputs},
+            "finished": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        key = _key(inputs[0])
+        record = json.dumps({"job": self.job_type, "key": key, "entry": entry}, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with _file_lock(self.lock_path):
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write(record + "\n")
+                self._journaled += 1
+                if self._journaled >= COMPACT_ENTRIES:
+                    self._compact()
+                    self._journaled = 0
+
+    def _load(self):
+        """清单文件与日志合并后的全部作业条目，日志中后写入的条目覆盖先前的记录"""
+        jobs = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                jobs = data.get("jobs", {})
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 写入中断留下的不完整行
+                    jobs.setdefault(record["job"], {})[record["key"]] = record["entry"]
+        except OSError:
+            pass
+        return jobs
+
+    def _compact(self):
+        """日志合并进清单文件（原子替换）后删除日志，返回合并后的全部条目；须持有文件锁"""
+        jobs = self._load()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "jobs": jobs}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        return jobs
+
+
+@contextmanager
+def _file_lock(path):
+    """对锁文件首字节加排他锁，进程异常退出时由系统释放，不会留下失效的锁"""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK 重试约 10 秒仍未取得时抛出，继续等待
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _key(path):
+    return os.path.abspath(path)
+
+
+def _fingerprint(path):
+    """文件记录大小与修改时间；目录记录其下所有文件的相对路径、大小与修改时间的摘要；
+    压缩包内的路径记录所在压缩包的大小与修改时间"""
+    parts = split_vsi(path)
+    if parts is not None:
+        if not os.path.isfile(parts[0]):
+            return None
+        stat = os.stat(parts[0])
+        return {"path": _key(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return {"path": _key(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if os.path.isdir(path):
+        digest = hashlib.sha1()
+        total = 0
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                stat = os.stat(full)
+                total += stat.st_size
+                digest.update(f"{os.path.relpath(full, path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+        return {"path": _key(path), "size": total, "tree": digest.hexdigest()}
+    return None
+
+
+def _checksum(path):
+    """文件输出记录 CRC32；目录输出的校验值即其指纹摘要"""
+    if os.path.isdir(path):
+        return _fingerprint(path)["tree"]
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(CHECKSUM_BLOCK_BYTES)
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+    return f"{crc:08x}"
@@ -5,6 +5,22 @@ from qgis.core import (
 from PyQt5.QtWidgets import QListWidgetItem
 from PyQt5.QtCore import Qt
 
+def ensure_pyramids(layer, log_func):
+    """栅格已带金字塔（如正射输出的 COG）时直接跳过，否则为大图构建金字塔"""
+    name = layer.name()
+    try:
+        provider = layer.dataProvider()
+        if provider.hasPyramids():
+            log_func(f"📐 已有内置金字塔，跳过构建：{name}")
+        elif provider.supportsPyramids():
+            result = provider.buildPyramid()
+            if result:
+                log_func(f"📐 金字塔构建成功：{name}")
+            else:
+                log_func(f"⚠️ 金字塔构建失败：{name}")
+    except Exception as e:
+        log_func(f"⚠️ 金字塔异常：{e}")
+
 def load_layers_batch(layer_paths, canvas, layer_list_widget, log_func):
     valid_layers = []
 
@@ -12,7 +28,7 @@ def load_layers_batch(layer_paths, canvas, layer_list_widget, log_func):
         name = os.path.basename(path)
         if path.lower().endswith((".tif", ".tiff")):
             layer = QgsRasterLayer(path, name)
-        elif path.lower().endswith(".shp"):
+        elif path.lower().endswith((".shp", ".gpkg")):
             layer = QgsVectorLayer(path, name, "ogr")
         else:
             log_func(f"⚠️ 不支持的图层格式，跳过：{path}")
@@ -24,15 +40,7 @@ def load_layers_batch(layer_paths, canvas, layer_list_widget, log_func):
 
         # 为大图构建金字塔
         if isinstance(layer, QgsRasterLayer):
-            try:
-                if layer.dataProvider().supportsPyramids():
-                    result = layer.dataProvider().buildPyramid()
-                    if result:
-                        log_func(f"📐 金字塔构建成功：{name}")
-                    else:
-                        log_func(f"⚠️ 金字塔构建失败：{name}")
-            except Exception as e:
-                log_func(f"⚠️ 金字塔异常：{e}")
+            ensure_pyramids(layer, log_func)
 
         QgsProject.instance().addMapLayer(layer)
         valid_layers.append(layer)
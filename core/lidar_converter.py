@@ -1,64 +1,323 @@
 import os
+import io
 import csv
-import glob
-from core.thread_pool import ThreadPool
-
-def merge_csv_to_txt(folder_path, output_file):
-    csv_files = glob.glob(os.path.join(folder_path, "*.csv"))
-    all_points = []
-
-    for csv_file in csv_files:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            csv_reader = csv.reader(f)
-            header = next(csv_reader)
-
-            lon_idx = header.index('lon_ph')
-            lat_idx = header.index('lat_ph')
-            h_idx = header.index('h_ph')
-            class_idx = header.index('classification')
-            signal_conf_idx = header.index('signal_conf_ph')
-            beam_strength_idx = header.index('beam_strength')
-
-            for row in csv_reader:
-                if len(row) > max(lon_idx, lat_idx, h_idx, class_idx, signal_conf_idx, beam_strength_idx):
-                    if (row[beam_strength_idx] == "strong" and
-                        int(row[signal_conf_idx]) > 2 and
-                        int(row[class_idx]) == 1):
-                        lon = row[lon_idx]
-                        lat = row[lat_idx]
-                        height = row[h_idx]
-                        all_points.append((lat, lon, height))
+import shutil
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from core.archive_reader import (TarReader, archive_folders, archive_stem, is_archive, is_compressed_tar, list_files,
+                                 open_text, open_texts, scene_name, split_vsi)
+from core.job_manifest import JobManifest
+from core.lidar_filter import DEFAULT_FILTERS, compile_filters, rule_mask, rule_match
+from core.point_cache import PointCacheWriter, write_point_cache
+from core.thread_pool import ThreadPool, ProcessPool
 
+READ_CHUNK_BYTES = 64 << 20  # 快速路径每次读取的字节数
+READ_CHUNK_ROWS = 1_000_000  # 逐行路径每批返回的最大点数
+COPY_BUFFER_BYTES = 16 << 20  # 流式模式拼接正文时的复制缓冲区
+
+
+def merge_csv_to_txt(folder_path, output_file, write_cache=True, streaming=False, filters=None, reader=None):
+    """folder_path 可以是普通目录，也可以是压缩包内目录的虚拟路径（/vsizip/、/vsitar/），后者边解压边读取；
+    普通目录与 zip 内的 CSV 按文件名顺序合并，tar 内的 CSV 按包内存放顺序合并。
+    reader 为已打开的 TarReader 时从中读取，同一 tar 包的多个目录共用一次打开"""
+    filters = DEFAULT_FILTERS if filters is None else filters
+
+    with open_texts(list_files(folder_path, (".csv",)), reader) as (csv_files, opener):
+        if streaming:
+            _stream_points(csv_files, output_file, write_cache, filters, opener)
+            return
+
+        all_points = []
+        for csv_file in csv_files:
+            for points in _iter_csv_points(csv_file, filters, opener):
+                all_points.extend(points)
+
+    _write_points(output_file, all_points, write_cache)
+
+
+def _iter_csv_points(csv_file, filters, opener=open_text):
+    """逐块返回单个 CSV 中通过筛选的 (lat, lon, h) 列表"""
+    emitted = 0
+    try:
+        for points in _filter_csv_fast(csv_file, filters, opener):
+            emitted += len(points)
+            yield points
+    except ValueError:
+        # 缺列、空行、字段数不一致或数值异常时回退到逐行解析，保持原有的容错行为。
+        # 出错前已返回的块与逐行解析结果一致，回退时跳过这部分点
+        for points in _filter_csv_rows(csv_file, filters, skip=emitted, opener=opener):
+            yield points
+
+
+def _filter_csv_fast(csv_file, filters, opener=open_text):
+    """按块读取 CSV：字符串条件预筛原始行，只对候选行解析筛选列并求掩码，最后只拆分通过筛选的行取坐标原文"""
+    with opener(csv_file, newline='') as f:
+        header = next(csv.reader([f.readline()]))
+        lon_idx = header.index('lon_ph')
+        lat_idx = header.index('lat_ph')
+        h_idx = header.index('h_ph')
+        str_rules, num_rules = compile_filters(filters, header)
+        max_idx = max([lon_idx, lat_idx, h_idx] + [rule[0] for rule in str_rules + num_rules])
+        needles = [value if op == "in" else [value] for _, op, value, _ in str_rules if op in ("==", "in")]
+        dtypes = {idx: "category" for idx, _, _, _ in str_rules}
+        dtypes.update({idx: np.int64 if kind is int else np.float64 for idx, _, _, kind in num_rules})
+
+        while True:
+            lines = f.readlines(READ_CHUNK_BYTES)
+            if not lines:
+                break
+
+            # 字符串等值条件先在原始行上做子串预筛：不含目标值的行不可能满足条件，无需解析任何列
+            candidates = np.array(_prefilter(lines, needles), dtype=np.int64)
+            if len(candidates) and str_rules + num_rules:
+                block = _read_columns([lines[i] for i in candidates.tolist()], dtypes)
+                mask = np.ones(len(candidates), dtype=bool)
+                for idx, op, value, _ in str_rules:
+                    mask &= rule_mask(block[idx], op, value)
+                for idx, op, value, _ in num_rules:
+                    mask &= rule_mask(block[idx].to_numpy(), op, value)
+                candidates = candidates[mask]
+
+            yield [
+                (row[lat_idx], row[lon_idx], row[h_idx])
+                for row in csv.reader([lines[i] for i in candidates])
+                if len(row) > max_idx
+            ]
+
+
+def _prefilter(lines, needles):
+    candidates = range(len(lines))
+    for values in needles:
+        if len(values) == 1:
+            value = values[0]
+            candidates = [i for i in candidates if value in lines[i]]
+        else:
+            candidates = [i for i in candidates if any(v in lines[i] for v in values)]
+    return candidates
+
+
+def _read_columns(lines, dtypes):
+    block = pd.read_csv(
+        io.StringIO("".join(lines)),
+        header=None,
+        usecols=list(dtypes),
+        dtype=dtypes,
+        keep_default_na=False
+    )
+    if len(block) != len(lines):
+        raise ValueError("CSV 含空行或跨行字段")
+    return block
+
+
+def _filter_csv_rows(csv_file, filters, skip=0, opener=open_text):
+    points = []
+    with opener(csv_file) as f:
+        csv_reader = csv.reader(f)
+        header = next(csv_reader)
+
+        lon_idx = header.index('lon_ph')
+        lat_idx = header.index('lat_ph')
+        h_idx = header.index('h_ph')
+        str_rules, num_rules = compile_filters(filters, header)
+        rules = str_rules + num_rules  # 字符串条件在前，未通过的行不做数值转换
+        max_idx = max([lon_idx, lat_idx, h_idx] + [rule[0] for rule in rules])
+
+        for row in csv_reader:
+            if len(row) > max_idx:
+                if all(rule_match(row[idx], op, value, kind) for idx, op, value, kind in rules):
+                    if skip:
+                        skip -= 1
+                        continue
+                    lon = row[lon_idx]
+                    lat = row[lat_idx]
+                    height = row[h_idx]
+                    points.append((lat, lon, height))
+                    if len(points) >= READ_CHUNK_ROWS:
+                        yield points
+                        points = []
+    if points:
+        yield points
+
+
+def _format_points(points, first_id):
+    return [f"{first_id + i}\t{lat}\t{lon}\t{height}\n" for i, (lat, lon, height) in enumerate(points)]
+
+
+def _line_sizes(lines):
+    # 文本模式下换行会被转换为 os.linesep，按实际写入的字节数记录
+    newline_extra = len(os.linesep) - 1
+    return np.array([len(line.encode('utf-8')) for line in lines], dtype=np.int64) + newline_extra
+
+
+def _coords(points):
+    return tuple(np.array([p[k] for p in points], dtype=np.float64) for k in range(3))
+
+
+def _write_points(output_file, all_points, write_cache):
+    header = f"{len(all_points)}\n"
+    lines = _format_points(all_points, 1)
+
+    # 一次性写出全部点
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"{len(all_points)}\n")
-        for i, (lat, lon, height) in enumerate(all_points):
-            f.write(f"{i+1}\t{lat}\t{lon}\t{height}\n")
+        f.write(header + "".join(lines))
+
+    if write_cache:
+        # 写出二进制缓存，抽稀时可直接 memmap 读取坐标，免去文本解析
+        sizes = _line_sizes([header] + lines)
+        write_point_cache(output_file, *_coords(all_points), np.cumsum(sizes)[:-1])
+
+
+def _stream_points(csv_files, output_file, write_cache, filters, opener=open_text):
+    """流式写出：点先逐块写入临时正文文件，点数确定后再写表头并拼接正文，最后原子替换"""
+    body_path = output_file + ".part"
+    tmp_path = output_file + ".tmp"
+    cache = PointCacheWriter(output_file) if write_cache else None
+    count = 0
+    body_size = 0
+
+    try:
+        with open(body_path, 'w', encoding='utf-8') as body:
+            for csv_file in csv_files:
+                for points in _iter_csv_points(csv_file, filters, opener):
+                    if not points:
+                        continue
+                    lines = _format_points(points, count + 1)
+                    body.write("".join(lines))
+                    count += len(points)
+                    if cache:
+                        # 偏移先按正文计算，表头长度确定后在 close 时统一平移
+                        sizes = _line_sizes(lines)
+                        cache.append(*_coords(points), body_size + np.cumsum(sizes) - sizes)
+                        body_size += int(sizes.sum())
+
+        header = f"{count}\n"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(header)
+        with open(tmp_path, 'ab') as out, open(body_path, 'rb') as body:
+            shutil.copyfileobj(body, out, COPY_BUFFER_BYTES)
+        os.replace(tmp_path, output_file)
+        os.remove(body_path)
 
+        if cache:
+            cache.close(offset_shift=int(_line_sizes([header])[0]))
+    except Exception:
+        for path in (body_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if cache:
+            cache.discard()
+        raise
 
-def convert_all_lidar_folders(input_dir, output_dir, log_func, logger=None):
-    pool = ThreadPool()
-    futures = []
 
-    for name in os.listdir(input_dir):
-        subdir = os.path.join(input_dir, name)
-        if os.path.isdir(subdir):
+def convert_all_lidar_folders(input_dir, output_dir, log_func, logger=None, use_processes=True, write_cache=True,
+                              streaming=False, filters=None, incremental=True):
+    """返回转换失败的文件夹数"""
+    # CSV 解析与筛选为纯 CPU 任务，默认交给进程池以绕开 GIL
+    pool = ProcessPool("lidar_convert") if use_processes else ThreadPool()
+    # 缓存与流式写出不改变 txt 内容，只有筛选条件参与判断
+    manifest = JobManifest(output_dir, "lidar_convert", {
+        "filters": DEFAULT_FILTERS if filters is None else filters
+    })
+    skipped = 0
+    failed = 0
+
+    with pool.log_channel(log_func) as job_log:
+        futures = {}
+        tar_jobs = {}  # 压缩的 tar 包 → [(包内目录, 输出文件)]
+        for subdir, name in _lidar_folders(input_dir):
             output_file = os.path.join(output_dir, f"{name}.txt")
-            future = pool.submit(_safe_convert, subdir, output_file, log_func)
-            futures.append(future)
+            if incremental and manifest.is_done([subdir], [output_file]):
+                skipped += 1
+                continue
+            parts = split_vsi(subdir)
+            if parts and is_compressed_tar(parts[0]):
+                tar_jobs.setdefault(parts[0], []).append((subdir, output_file))
+                continue
+            future = submit_convert(pool, subdir, output_file, job_log, write_cache, streaming, filters)
+            futures[future] = (subdir, [(subdir, output_file)])
+        for archive, jobs in tar_jobs.items():
+            future = pool.submit(_safe_convert_tar, archive, jobs, job_log, write_cache, streaming, filters)
+            futures[future] = (archive, jobs)
 
-    # 等待所有任务完成
-    for f in futures:
-        f.result()
+        # 等待所有任务完成，每完成一个立即写入清单
+        for f in as_completed(futures):
+            source, jobs = futures[f]
+            try:
+                results = f.result()
+            except Exception as e:
+                # 子进程异常退出等情况下任务函数来不及记录失败
+                log_func(f"❌ 转换失败: {os.path.basename(source)} -> {e}")
+                results = False
+            # 整包任务返回每个目录的结果，单个目录的任务（以及异常时）为一个布尔值
+            if not isinstance(results, list):
+                results = [results] * len(jobs)
+            for (subdir, output_file), ok in zip(jobs, results):
+                if ok:
+                    manifest.mark_done([subdir], [output_file])
+                else:
+                    failed += 1
 
+    if skipped:
+        log_func(f"⏭️ 跳过 {skipped} 个未变化的文件夹")
+    if failed:
+        log_func(f"⚠️ {failed} 个文件夹转换失败")
     log_func("🎉 所有激光格式转换任务已完成")
 
     if logger:
         logger.flush()
+    return failed
+
+
+def _lidar_folders(input_dir):
+    """返回 (目录, 输出名)：每个子目录为一组；压缩包内每个含 CSV 的目录也为一组，直接从包内读取"""
+    folders = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if os.path.isdir(path):
+            folders.append((path, name))
+        elif is_archive(path):
+            stem = archive_stem(name)
+            for folder in archive_folders(path, (".csv",)):
+                folders.append((folder, scene_name(stem, split_vsi(folder)[1].split("/"))))
+    return folders
 
 
-def _safe_convert(subdir, output_file, log_func):
+def submit_convert(pool, subdir, output_file, job_log, write_cache=True, streaming=False, filters=None):
+    """提交单个文件夹的转换，返回 future；job_log 为 pool.log_channel 给出的日志函数"""
+    return pool.submit(_safe_convert, subdir, output_file, job_log, write_cache, streaming, filters)
+
+
+def _safe_convert(subdir, output_file, log_func, write_cache=True, streaming=False, filters=None, reader=None):
     try:
-        merge_csv_to_txt(subdir, output_file)
+        merge_csv_to_txt(subdir, output_file, write_cache, streaming, filters, reader)
         log_func(f"✅ 转换完成: {os.path.basename(subdir)} → {output_file}")
+        return True
     except Exception as e:
         log_func(f"❌ 转换失败: {os.path.basename(subdir)} -> {e}")
+        return False
+
+
+def _safe_convert_tar(archive, jobs, log_func, write_cache=True, streaming=False, filters=None):
+    """同一个压缩 tar 包内的各目录在一个任务中依次转换，返回与 jobs 对应的结果列表。
+
+    每个目录单独提交时，各任务都要打开整个包并从头解压；这里包只打开一次，目录按其 CSV 在包内的位置依次处理，
+    按目录打包的 tar 整包只需顺序解压一遍"""
+    try:
+        reader = TarReader(archive)
+    except Exception as e:
+        log_func(f"❌ 转换失败: {os.path.basename(archive)} -> {e}")
+        return [False] * len(jobs)
+
+    def position(k):
+        try:
+            return min(reader.offset(p) for p in list_files(jobs[k][0], (".csv",)))
+        except (ValueError, FileNotFoundError):
+            return 0  # 目录下没有可读的 CSV，转换时照常报错
+
+    results = [False] * len(jobs)
+    with reader:
+        for k in sorted(range(len(jobs)), key=position):
+            subdir, output_file = jobs[k]
+            results[k] = _safe_convert(subdir, output_file, log_func, write_cache, streaming, filters, reader)
+    return results
@@ -0,0 +1,119 @@
+# 激光点筛选条件：(列名, 运算符, 值) 三元组组成的声明式规则
+import operator
+import re
+import numpy as np
+
+# 与原先硬编码的筛选条件一致：强波束、信号置信度大于 2、地面点
+DEFAULT_FILTERS = [
+    ("beam_strength", "==", "strong"),
+    ("signal_conf_ph", ">", 2),
+    ("classification", "==", 1),
+]
+
+_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+_SET_OPS = ("in", "not in")
+_STR_OPS = ("==", "!=") + _SET_OPS
+
+_RULE_RE = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|not\s+in|in)\s*(.+?)\s*$")
+
+
+def parse_filter_spec(text):
+    """解析形如 "beam_strength == strong; signal_conf_ph > 2; classification in 1,2" 的筛选规则"""
+    filters = []
+    for part in re.split(r"[;\n]", text):
+        if not part.strip():
+            continue
+        match = _RULE_RE.match(part)
+        if not match:
+            raise ValueError(f"无法解析筛选条件：{part.strip()}")
+        column, op, value = match.groups()
+        op = " ".join(op.split())
+        if op in _SET_OPS:
+            value = [_parse_value(v) for v in value.split(",") if v.strip()]
+        else:
+            value = _parse_value(value)
+        if _is_str_rule(op, value) and op not in _STR_OPS:
+            raise ValueError(f"字符串值不支持运算符 {op}：{part.strip()}")
+        filters.append((column, op, value))
+    return filters
+
+
+def format_filter_spec(filters):
+    parts = []
+    for column, op, value in filters:
+        if op in _SET_OPS:
+            value = ",".join(str(v) for v in value)
+        parts.append(f"{column} {op} {value}")
+    return "; ".join(parts)
+
+
+def compile_filters(filters, header):
+    """按 CSV 表头编译筛选规则，返回 (字符串规则, 数值规则)，每条为 (列号, 运算符, 值, 数值类型)
+
+    字符串规则只需比较原文，代价低，先于数值规则执行。
+    """
+    for column, op, value in filters:
+        if op not in _OPS and op not in _SET_OPS:
+            raise ValueError(f"不支持的运算符：{op}")
+        if _is_str_rule(op, value) and op not in _STR_OPS:
+            raise ValueError(f"字符串列不支持运算符 {op}：{column}")
+
+    # 同一列只要出现浮点值就按浮点解析，否则与原实现一致按整数解析
+    float_columns = {
+        column for column, op, value in filters
+        if not _is_str_rule(op, value) and any(isinstance(v, float) for v in _values(op, value))
+    }
+
+    str_rules, num_rules = [], []
+    for column, op, value in filters:
+        if _is_str_rule(op, value):
+            str_rules.append((header.index(column), op, value, None))
+        else:
+            kind = float if column in float_columns else int
+            num_rules.append((header.index(column), op, value, kind))
+    return str_rules, num_rules
+
+
+def rule_mask(values, op, value):
+    """对一列数组（或 pandas Series）求布尔掩码"""
+    if op in _SET_OPS:
+        mask = np.asarray(values.isin(value)) if hasattr(values, "isin") else np.isin(values, value)
+        return ~mask if op == "not in" else mask
+    return np.asarray(_OPS[op](values, value), dtype=bool)
+
+
+def rule_match(text, op, value, kind):
+    """逐行路径：对单个字段原文求值"""
+    field = text if kind is None else kind(text)
+    if op == "in":
+        return field in value
+    if op == "not in":
+        return field not in value
+    return _OPS[op](field, value)
+
+
+def _values(op, value):
+    return value if op in _SET_OPS else [value]
+
+
+def _is_str_rule(op, value):
+    return all(isinstance(v, str) for v in _values(op, value))
+
+
+def _parse_value(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]  # 带引号的值始终按字符串处理
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
@@ -1,11 +1,41 @@
 import os
 import glob
-from osgeo import gdal
-from core.thread_pool import ThreadPool
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from osgeo import gdal, ogr, osr
+from core.archive_reader import archive_stem, is_archive, member_names, path_exists, scene_name, split_vsi, vsi_path
+from core.dem_cache import DEM_CACHE_DIRNAME, cropped_dem
+from core.gdal_profile import ResourceProfile
+from core.job_manifest import JobManifest
+from core.rpc_model import read_rpc, rpc_metadata
+from core.thread_pool import ThreadPool, ProcessPool
 
 gdal.UseExceptions()
+ogr.UseExceptions()
+
+TILED_THRESHOLD_PIXELS = 1 << 28  # 超过该像元数的影像自动按输出窗口分块并行正射
+TILE_SIZE = 4096                  # 分块正射时每个输出窗口的边长（像素）
+PREVIEW_DIRNAME = "preview"       # 预览结果保存在输出目录下的子目录
+PREVIEW_SEGMENTS = 8              # 预览时沿影像每条边的采样段数
+PREVIEW_DECIMATION = 16           # 预览影像相对原始影像的降采样倍数
+
+# 输出为带内置金字塔的 COG：512 分块与平均值重采样的金字塔便于快速显示，预测器提高 DEFLATE 压缩率
+COG_OPTIONS = [
+    "COMPRESS=DEFLATE",
+    "PREDICTOR=YES",
+    "BLOCKSIZE=512",
+    "OVERVIEWS=AUTO",
+    "OVERVIEW_RESAMPLING=AVERAGE",
+    "BIGTIFF=IF_SAFER",
+]
 
 def find_rpc_file(image_path, input_folder):
+    # 压缩包内的影像在其所在的包内目录查找
+    if split_vsi(image_path):
+        input_folder = image_path.rsplit("/", 1)[0]
     name = os.path.splitext(os.path.basename(image_path))[0]
     candidates = [
         os.path.join(input_folder, f"{name}_rpc.txt"),
@@ -13,47 +43,360 @@ def find_rpc_file(image_path, input_folder):
         os.path.join(input_folder, f"{name}.RPB")
     ]
     for path in candidates:
-        if os.path.exists(path):
+        if path_exists(path):
             return path
     return None
 
 def is_valid_image(file):
     return file.lower().endswith(('.tif', '.tiff'))
 
-def orthorectify_all(input_folder, output_folder, log_func):
-    tif_files = [
-        os.path.join(input_folder, f)
-        for f in os.listdir(input_folder)
-        if is_valid_image(f) and os.path.isfile(os.path.join(input_folder, f))
-    ]
-    pool = ThreadPool()
+def orthorectify_all(input_folder, output_folder, log_func, incremental=True, tiled=None,
+                     dem_path=None, dem_cache_dir=None, profile=None, preview=False, preview_images=False):
+    """tiled 为 None 时按影像大小自动选择是否分块并行，True/False 强制开启或关闭；
+    给定 dem_path 时按每景影像范围裁剪 DEM 参与 RPC 正射，裁剪结果缓存在 dem_cache_dir；
+    profile 为 None 时按本机 CPU 核数与可用内存自动分配资源；
+    preview 为 True 时只计算各景范围（preview_images 为 True 时另生成降采样正射影像），不做完整正射；
+    input_folder 下的 zip/tar 压缩包经 /vsizip/、/vsitar/ 直接读取包内影像与 RPC 文件，无需先解压，
+    输出名以包名与包内目录为前缀。返回 (已生成的输出路径列表, 失败的影像数)"""
+    tif_files = _list_images(input_folder, log_func)
+    if preview:
+        return _preview_all(tif_files, input_folder, output_folder, log_func, preview_images)
+
+    profile = profile or ResourceProfile.auto()
+    pool = ProcessPool("orthorectify")
+    # 整景正射与分块窗口共用同一组名额，同时进行的 Warp 不超过 profile 指定的并发数
+    slots = threading.BoundedSemaphore(profile.concurrent_warps)
+    dem_cache_dir = dem_cache_dir or os.path.join(output_folder, DEM_CACHE_DIRNAME)
+    manifest = JobManifest(output_folder, "orthorectify", {
+        "dem": os.path.abspath(dem_path) if dem_path else None, "format": "COG"
+    })
+    start = time.perf_counter()
     futures = []
+    done = queue.Queue()
+    errors = []
+    skipped = 0
+    failed = 0
+    log_func(f"⚙️ 资源配置：{profile.describe()}")
 
-    for tif_path in tif_files:
-        rpc_path = find_rpc_file(tif_path, input_folder)
-        if not rpc_path:
-            log_func(f"⚠️ 未找到 RPC 文件: {os.path.basename(tif_path)}")
+    def dispatch(job_log):
+        # 提交时会因 Warp 名额已满而等待，放在单独的线程中进行，本线程同时按完成顺序记录结果
+        nonlocal skipped
+        try:
+            for tif_path, name in tif_files:
+                rpc_path = find_rpc_file(tif_path, input_folder)
+                if not rpc_path:
+                    log_func(f"⚠️ 未找到 RPC 文件: {os.path.basename(tif_path)}")
+                    continue
+
+                output_path = os.path.join(output_folder, name)
+                inputs = [tif_path, rpc_path] + ([dem_path] if dem_path else [])
+                if incremental and manifest.is_done(inputs, [output_path]):
+                    skipped += 1
+                    continue
+                future = submit_orthorectify(pool, slots, tif_path, rpc_path, output_path, log_func, job_log,
+                                             profile, tiled, dem_path, dem_cache_dir)
+                futures.append(future)
+                future.add_done_callback(lambda f, job=(inputs, output_path): done.put((job, f)))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.put(None)
+
+    with pool.log_channel(log_func) as job_log:
+        dispatcher = threading.Thread(target=dispatch, args=(job_log,), daemon=True)
+        dispatcher.start()
+        # 每完成一景立即写入清单，批处理中途退出时已完成的影像下次不必重做
+        total, received = None, 0
+        while total is None or received < total:
+            item = done.get()
+            if item is None:
+                total = len(futures)
+                continue
+            (inputs, output_path), f = item
+            received += 1
+            try:
+                ok = f.result()
+            except Exception as e:
+                # 子进程异常退出等情况下任务函数来不及记录失败
+                log_func(f"❌ 正射失败: {os.path.basename(inputs[0])} → {e}")
+                ok = False
+            if ok:
+                manifest.mark_done(inputs, [output_path])
+            else:
+                failed += 1
+        dispatcher.join()
+    if errors:
+        raise errors[0]
+
+    if skipped:
+        log_func(f"⏭️ 跳过 {skipped} 景未变化的影像")
+    if failed:
+        log_func(f"⚠️ {failed} 景影像正射失败")
+    # 与各景单独耗时之和对比即可看出并发正射的加速比
+    log_func(f"⏱️ 正射 {len(futures)} 景，总耗时 {time.perf_counter() - start:.2f}s")
+
+    outputs = [os.path.join(output_folder, name) for _, name in tif_files]
+    return [p for p in outputs if os.path.exists(p)], failed
+
+def _list_images(input_folder, log_func):
+    """返回 [(影像路径, 输出文件名)]：目录下的影像沿用原名，压缩包内的影像以包名与包内目录为前缀；
+    输出重名（Windows 下不区分大小写）的影像只保留第一个，避免多个进程同时写入同一文件"""
+    images = []
+    for f in sorted(os.listdir(input_folder)):
+        path = os.path.join(input_folder, f)
+        if is_valid_image(f) and os.path.isfile(path):
+            images.append((path, f))
+        elif is_archive(path, gdal_readable=True):
+            stem = archive_stem(f)
+            images.extend((vsi_path(path, m), scene_name(stem, m.split("/")))
+                          for m in sorted(member_names(path)) if is_valid_image(m))
+
+    unique, seen = [], set()
+    for tif_path, name in images:
+        if name.lower() in seen:
+            log_func(f"⚠️ 输出重名，已跳过: {tif_path} → {name}")
             continue
+        seen.add(name.lower())
+        unique.append((tif_path, name))
+    return unique
+
+def submit_orthorectify(pool, slots, tif_path, rpc_path, output_path, log_func, job_log, profile, tiled=None,
+                        dem_path=None, dem_cache_dir=None):
+    """按影像大小选择整景或分块正射并提交，返回 future；job_log 为 pool.log_channel 给出的日志函数。
+    影像无法打开时记录失败并返回结果为 False 的 future，不影响同批其他影像"""
+    try:
+        use_tiles = _is_large(tif_path) if tiled is None else tiled
+    except Exception as e:
+        log_func(f"❌ 正射失败: {os.path.basename(tif_path)} → {e}")
+        future = Future()
+        future.set_result(False)
+        return future
+    if use_tiles:
+        # 单景大影像拆成输出窗口交给进程池，由本进程的线程负责调度与拼接
+        return ThreadPool().submit(_orthorectify_tiled, tif_path, rpc_path, output_path, log_func,
+                                   pool, slots, profile, dem_path, dem_cache_dir)
+    return _submit_warp(pool, slots, _orthorectify_one, tif_path, rpc_path, output_path, job_log,
+                        profile, dem_path, dem_cache_dir)
+
+def _submit_warp(pool, slots, func, *args):
+    """占用一个 Warp 名额后提交，任务结束时归还"""
+    slots.acquire()
+    future = pool.submit(func, *args)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def _rpc_dataset(tif_path, rpc):
+    """以内存 VRT 包装源影像并写入 RPC 元数据，RPC 参数随数据集走，多线程同时正射互不干扰"""
+    dataset = gdal.Translate("", tif_path, options=gdal.TranslateOptions(format="VRT"))
+    dataset.SetMetadata(rpc_metadata(rpc), "RPC")
+    return dataset
 
-        output_path = os.path.join(output_folder, os.path.basename(tif_path))
-        futures.append(pool.submit(_orthorectify_one, tif_path, rpc_path, output_path, log_func))
+def _edge_pixels(width, height, segments):
+    """沿影像四边依次采样的像点坐标，四个角点均包含在内，首尾相接即为影像边界"""
+    steps = [k / segments for k in range(segments)]
+    return ([(t * width, 0) for t in steps] + [(width, t * height) for t in steps]
+            + [((1 - t) * width, height) for t in steps] + [(0, (1 - t) * height) for t in steps])
 
-    for f in futures:
-        f.result()
+def _rpc_ground(dataset, pixels, height):
+    """按给定高程用 RPC 模型将像点换算为 (经度, 纬度)，丢弃不收敛的点"""
+    transformer = gdal.Transformer(dataset, None, ["METHOD=RPC", f"RPC_HEIGHT={height}"])
+    points, success = transformer.TransformPoints(0, pixels)
+    return [(lon, lat) for (lon, lat, _), ok in zip(points, success) if ok]
 
-    return [os.path.join(output_folder, os.path.basename(p)) for p in tif_files if os.path.exists(os.path.join(output_folder, os.path.basename(p)))]
+def _rpc_footprint(dataset, rpc, segments=16):
+    """沿影像四边采样，按 RPC 模型高程范围的上下限换算到经纬度，返回 (min_lon, min_lat, max_lon, max_lat)"""
+    pixels = _edge_pixels(dataset.RasterXSize, dataset.RasterYSize, segments)
+    points = []
+    for h in (rpc["HEIGHT_OFF"] - rpc["HEIGHT_SCALE"], rpc["HEIGHT_OFF"] + rpc["HEIGHT_SCALE"]):
+        points.extend(_rpc_ground(dataset, pixels, h))
+    if not points:
+        raise ValueError("无法由 RPC 模型计算影像范围")
+    lons, lats = [p[0] for p in points], [p[1] for p in points]
+    return min(lons), min(lats), max(lons), max(lats)
 
-def _orthorectify_one(tif_path, rpc_path, output_path, log_func):
+def _prepare_dem(source, rpc, dem_path, dem_cache_dir):
+    """按影像范围裁剪 DEM 并返回对应的 RPC 变换参数，未提供 DEM 时使用常数高程"""
+    if not dem_path:
+        return []
+    dem = cropped_dem(dem_path, _rpc_footprint(source, rpc), dem_cache_dir)
+    return [f"RPC_DEM={dem}", "RPC_DEMINTERPOLATION=BILINEAR"]
+
+def _orthorectify_one(tif_path, rpc_path, output_path, log_func, profile, dem_path=None, dem_cache_dir=None):
+    # 在子进程中执行，每个进程同一时刻只做一景，块缓存与线程数按 profile 设置
     try:
-        gdal.SetConfigOption("RPC_FILE", rpc_path)
+        start = time.perf_counter()
+        profile.apply()
+        rpc = read_rpc(rpc_path)
+        source = _rpc_dataset(tif_path, rpc)
+        # 金字塔在同一个工作进程中随输出一并生成，加载时无需再在界面线程构建
         warp_options = gdal.WarpOptions(
-            format="GTiff",
+            format="COG",
             rpc=True,
+            transformerOptions=_prepare_dem(source, rpc, dem_path, dem_cache_dir),
             resampleAlg=gdal.GRA_Cubic,
-            multithread=True,
-            creationOptions=["TILED=YES", "COMPRESS=DEFLATE"]
+            creationOptions=profile.creation_options(COG_OPTIONS),
+            **profile.warp_kwargs()
+        )
+        gdal.Warp(output_path, source, options=warp_options)
+        log_func(f"✅ 正射完成: {os.path.basename(tif_path)}（耗时 {time.perf_counter() - start:.2f}s）")
+        return True
+    except Exception as e:
+        log_func(f"❌ 正射失败: {os.path.basename(tif_path)} → {e}")
+        return False
+
+def _is_large(tif_path):
+    dataset = gdal.Open(tif_path)
+    return dataset.RasterXSize * dataset.RasterYSize > TILED_THRESHOLD_PIXELS
+
+def _orthorectify_tiled(tif_path, rpc_path, output_path, log_func, pool, slots, profile, dem_path=None,
+                        dem_cache_dir=None, tile_size=TILE_SIZE):
+    """由 RPC 模型确定输出网格后按窗口切分，各窗口并行正射为分块文件，再经 VRT 拼接为一个 COG"""
+    tile_dir = output_path + ".tiles"
+    try:
+        start = time.perf_counter()
+        rpc = read_rpc(rpc_path)
+        # DEM 只在调度线程裁剪一次，各窗口共用同一份裁剪结果
+        dem_options = _prepare_dem(_rpc_dataset(tif_path, rpc), rpc, dem_path, dem_cache_dir)
+        geo_transform, width, height, srs = _output_grid(tif_path, rpc, dem_options)
+        os.makedirs(tile_dir, exist_ok=True)
+
+        futures = []
+        for k, (x, y, w, h) in enumerate(_split_windows(width, height, tile_size)):
+            tile_path = os.path.join(tile_dir, f"tile_{k:05d}.tif")
+            bounds = _window_bounds(geo_transform, x, y, w, h)
+            futures.append(_submit_warp(pool, slots, _warp_tile, tif_path, rpc, dem_options, profile, tile_path,
+                                        bounds, w, h, srs))
+        tile_paths = sorted(f.result() for f in futures)
+
+        vrt_path = os.path.join(tile_dir, "mosaic.vrt")
+        gdal.BuildVRT(vrt_path, tile_paths)
+        translate_options = gdal.TranslateOptions(
+            format="COG",
+            creationOptions=profile.creation_options(COG_OPTIONS)
         )
-        gdal.Warp(output_path, tif_path, options=warp_options)
-        log_func(f"✅ 正射完成: {os.path.basename(tif_path)}")
+        gdal.Translate(output_path, vrt_path, options=translate_options)
+        log_func(f"✅ 分块正射完成: {os.path.basename(tif_path)}"
+                 f"（{len(tile_paths)} 个分块，耗时 {time.perf_counter() - start:.2f}s）")
+        return True
     except Exception as e:
         log_func(f"❌ 正射失败: {os.path.basename(tif_path)} → {e}")
+        return False
+    finally:
+        shutil.rmtree(tile_dir, ignore_errors=True)
+
+def _output_grid(tif_path, rpc, dem_options):
+    """Warp 到 VRT 只按 RPC 模型推算输出范围与分辨率，不处理像元，结果与整景正射的输出网格一致"""
+    warp_options = gdal.WarpOptions(format="VRT", rpc=True, transformerOptions=dem_options,
+                                    resampleAlg=gdal.GRA_Cubic)
+    dataset = gdal.Warp("", _rpc_dataset(tif_path, rpc), options=warp_options)
+    return dataset.GetGeoTransform(), dataset.RasterXSize, dataset.RasterYSize, dataset.GetProjection()
+
+def _split_windows(width, height, tile_size):
+    return [
+        (x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+def _window_bounds(geo_transform, x, y, w, h):
+    # 输出为正北朝上的网格，窗口范围按 (xmin, ymin, xmax, ymax) 给出
+    x0, dx, _, y0, _, dy = geo_transform
+    return x0 + x * dx, y0 + (y + h) * dy, x0 + (x + w) * dx, y0 + y * dy
+
+def _warp_tile(tif_path, rpc, dem_options, profile, tile_path, bounds, width, height, srs):
+    # 在子进程中执行，RPC 参数以字典传入，由子进程自行构建内存 VRT
+    profile.apply()
+    warp_options = gdal.WarpOptions(
+        format="GTiff",
+        rpc=True,
+        transformerOptions=dem_options,
+        dstSRS=srs,
+        outputBounds=bounds,
+        width=width,
+        height=height,
+        resampleAlg=gdal.GRA_Cubic,
+        creationOptions=["TILED=YES"],
+        **profile.warp_kwargs()
+    )
+    gdal.Warp(tile_path, _rpc_dataset(tif_path, rpc), options=warp_options)
+    return tile_path
+
+def _preview_all(tif_files, input_folder, output_folder, log_func, preview_images):
+    """快速预览：稀疏采样 RPC 模型得到各景边界，合并写入一个矢量图层，可选生成降采样正射影像"""
+    start = time.perf_counter()
+    preview_dir = os.path.join(output_folder, PREVIEW_DIRNAME)
+    os.makedirs(preview_dir, exist_ok=True)
+    pool = ThreadPool()
+
+    futures = []
+    for tif_path, name in tif_files:
+        rpc_path = find_rpc_file(tif_path, input_folder)
+        if not rpc_path:
+            log_func(f"⚠️ 未找到 RPC 文件: {os.path.basename(tif_path)}")
+            continue
+        futures.append(pool.submit(_preview_one, tif_path, rpc_path, name, preview_dir, preview_images, log_func))
+
+    results = [r for r in (f.result() for f in futures) if r]
+    failed = len(futures) - len(results)
+    if not results:
+        log_func("⚠️ 没有可预览的影像")
+        return [], failed
+
+    footprint_path = os.path.join(preview_dir, "footprints.shp")
+    _write_footprints(footprint_path, [(name, ring) for name, ring, _ in results])
+    log_func(f"✅ 范围预览完成: {len(results)} 景 → {footprint_path}（耗时 {time.perf_counter() - start:.2f}s）")
+    return [path for _, _, path in results if path] + [footprint_path], failed
+
+def _preview_one(tif_path, rpc_path, name, preview_dir, preview_images, log_func):
+    try:
+        rpc = read_rpc(rpc_path)
+        source = _rpc_dataset(tif_path, rpc)
+        pixels = _edge_pixels(source.RasterXSize, source.RasterYSize, PREVIEW_SEGMENTS)
+        ring = _rpc_ground(source, pixels, rpc["HEIGHT_OFF"])
+        if len(ring) < 3:
+            raise ValueError("无法由 RPC 模型计算影像范围")
+
+        preview_path = None
+        if preview_images:
+            # 输出尺寸缩小后 GDAL 会自动选用源影像中分辨率相近的金字塔层，只读取很少的数据
+            preview_path = os.path.join(preview_dir, name)
+            warp_options = gdal.WarpOptions(
+                format="GTiff",
+                rpc=True,
+                width=max(1, source.RasterXSize // PREVIEW_DECIMATION),
+                height=0,
+                resampleAlg=gdal.GRA_Average,
+                creationOptions=["TILED=YES", "COMPRESS=DEFLATE"]
+            )
+            gdal.Warp(preview_path, source, options=warp_options)
+        return name, ring, preview_path
+    except Exception as e:
+        log_func(f"❌ 预览失败: {name} → {e}")
+        return None
+
+def _write_footprints(path, footprints):
+    driver = ogr.GetDriverByName("ESRI Shapefile")
+    if os.path.exists(path):
+        driver.DeleteDataSource(path)
+    datasource = driver.CreateDataSource(path)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    layer = datasource.CreateLayer("footprints", srs, ogr.wkbPolygon)
+    field = ogr.FieldDefn("name", ogr.OFTString)
+    field.SetWidth(254)
+    layer.CreateField(field)
+
+    for name, ring in footprints:
+        linear_ring = ogr.Geometry(ogr.wkbLinearRing)
+        for lon, lat in ring + ring[:1]:
+            linear_ring.AddPoint_2D(lon, lat)
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(linear_ring)
+
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField("name", name)
+        feature.SetGeometry(polygon)
+        layer.CreateFeature(feature)
+    datasource = None  # 关闭数据源，写出到磁盘
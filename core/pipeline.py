@@ -0,0 +1,330 @@
+# 流水线处理：解压 → 激光转换 / 影像正射 → 点云抽稀 → 图层注册，各阶段以有界队列衔接，每景就绪即进入下一阶段
+import os
+import queue
+import threading
+import time
+from contextlib import ExitStack
+from core.archive_reader import (archive_folders, archive_stem, is_archive, is_compressed_tar, member_names,
+                                 scene_name, split_vsi, vsi_path)
+from core.downsampler import MODE_MEMORY, submit_downsample
+from core.gdal_profile import ResourceProfile
+from core.job_manifest import JobManifest
+from core.lidar_converter import submit_convert
+from core.lidar_filter import DEFAULT_FILTERS
+from core.orthorectifier import find_rpc_file, is_valid_image, submit_orthorectify
+from core.dem_cache import DEM_CACHE_DIRNAME
+from core.thread_pool import ThreadPool, ProcessPool
+from core.unpacker import SUPPORTED_EXT, plan_archive
+
+QUEUE_SIZE = 4   # 每个阶段已完成但未被下游取走、以及正在执行的任务数上限
+# 解压时只取后续阶段用得到的文件
+PIPELINE_INCLUDE = ["*.csv", "*.tif", "*.tiff", "*.rpb", "*_rpc.txt"]
+
+# 各阶段输出目录，与单独运行各工具时对话框的默认目录一致，清单可以互相复用
+UNPACK_DIRNAME = "unpack"
+LIDAR_DIRNAME = "lidar_convert"
+DOWNSAMPLE_DIRNAME = "lidar_downsample"
+ORTHO_DIRNAME = "orthorectified"
+
+
+class _Feed:
+    """阶段之间的有界队列：上游占用名额后提交任务，任务完成后按完成顺序入队，下游取出时归还名额"""
+
+    def __init__(self, size=QUEUE_SIZE):
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+
+    def submit(self, tag, submit_func, *args):
+        """submit_func(*args) 返回 future；下游积压已满时在此阻塞，形成反压。
+        提交本身出错时归还名额与计数后抛出异常，由调用方记录并按失败放入（put）"""
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = submit_func(*args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._done(tag, f.exception() is None and f.result()))
+
+    def put(self, tag, ok):
+        """直接放入已有结果（如清单中已完成、无需重做的条目）"""
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        self._done(tag, ok)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            last = not self._pending
+        if last:
+            self._queue.put(None)
+
+    def _done(self, tag, ok):
+        self._queue.put((tag, ok))
+        with self._lock:
+            self._pending -= 1
+            last = self._closed and not self._pending
+        if last:
+            self._queue.put(None)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._slots.release()
+            yield item
+
+
+def run_pipeline(input_folder, output_folder, log_func, logger=None, target_count=None, dem_path=None,
+                 on_layer=None, incremental=True, queue_size=QUEUE_SIZE, extract=True):
+    """input_folder 下的每个压缩包解压后立即按内容分派：含 CSV 的目录做激光格式转换（给定 target_count 时
+    接着抽稀），带 RPC 的影像做正射，正射结果经 on_layer(path) 注册为图层。
+    返回 (所有正射结果路径, 失败的压缩包与作业数)。
+    extract 为 False 时 zip 与未压缩的 tar 包不解压，直接从包内读取（rar、tar.gz 等其他格式仍先解压）"""
+    start = time.perf_counter()
+    dirs = {name: os.path.join(output_folder, name)
+            for name in (UNPACK_DIRNAME, LIDAR_DIRNAME, DOWNSAMPLE_DIRNAME, ORTHO_DIRNAME)}
+    # 与各工具单独运行时使用相同的作业类型与参数，流水线与单独运行的结果互相识别
+    manifests = {
+        "unpack": JobManifest(dirs[UNPACK_DIRNAME], "unpack", {"include": PIPELINE_INCLUDE, "exclude": None}),
+        "lidar": JobManifest(dirs[LIDAR_DIRNAME], "lidar_convert", {"filters": DEFAULT_FILTERS}),
+        "downsample": JobManifest(dirs[DOWNSAMPLE_DIRNAME], "downsample", {
+            "target_count": target_count, "mode": MODE_MEMORY, "seed": None, "tolerance": 0.01
+        }),
+        "ortho": JobManifest(dirs[ORTHO_DIRNAME], "orthorectify", {
+            "dem": os.path.abspath(dem_path) if dem_path else None, "format": "COG"
+        }),
+    }
+    unpacked, processed, sampled = _Feed(queue_size), _Feed(queue_size), _Feed(queue_size)
+    layers = []
+
+    with ExitStack() as stack:
+        context = {
+            "dirs": dirs,
+            "manifests": manifests,
+            "incremental": incremental,
+            "extract": extract,
+            "log_func": log_func,
+            "target_count": target_count,
+            "dem_path": dem_path,
+            "on_layer": on_layer,
+            "layers": layers,
+            "outputs": set(),
+            # 各阶段线程只累加自己的计数，无需加锁
+            "failed": {"unpack": 0, "process": 0, "register": 0, "record": 0},
+            "profile": ResourceProfile.auto(),
+            "lidar_pool": ProcessPool("lidar_convert"),
+            "ortho_pool": ProcessPool("orthorectify"),
+            "downsample_pool": ProcessPool("downsample"),
+        }
+        for name in ("lidar", "ortho", "downsample"):
+            context[f"{name}_log"] = stack.enter_context(context[f"{name}_pool"].log_channel(log_func))
+        context["slots"] = threading.BoundedSemaphore(context["profile"].concurrent_warps)
+
+        stages = [
+            threading.Thread(target=_process_stage, args=(unpacked, processed, context), daemon=True),
+            threading.Thread(target=_register_stage, args=(processed, sampled, context), daemon=True),
+            threading.Thread(target=_record_stage, args=(sampled, context), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            _unpack_stage(input_folder, unpacked, context)
+        finally:
+            unpacked.close()
+            for stage in stages:
+                stage.join()
+
+    failed = sum(context["failed"].values())
+    if failed:
+        log_func(f"⚠️ {failed} 个压缩包或作业处理失败")
+    log_func(f"🎉 流水线处理完成: 正射 {len(layers)} 景（总耗时 {time.perf_counter() - start:.2f}s）")
+    if logger:
+        logger.flush()
+    return layers, failed
+
+
+def _unpack_stage(input_folder, unpacked, context):
+    """逐个提交压缩包，只解压后续阶段需要且尚未解压的成员；大压缩包拆成多个任务，在本线程等待其全部完成"""
+    pool = ThreadPool()
+    manifest = context["manifests"]["unpack"]
+    log_func = context["log_func"]
+    for filename in sorted(os.listdir(input_folder)):
+        file_path = os.path.join(input_folder, filename)
+        if not filename.lower().endswith(SUPPORTED_EXT) or not os.path.isfile(file_path):
+            continue
+
+        # 压缩的 tar 不能随机访问，包内每个目录、每景影像单独读取时都要从头解压，不如先顺序解压一遍
+        if not context["extract"] and is_archive(file_path) and not is_compressed_tar(file_path):
+            unpacked.put((file_path, vsi_path(file_path), False), True)
+            continue
+
+        # 与 unpack_all 及直读时的场景名一致，两种方式的输出名与清单互相识别
+        target_dir = os.path.join(context["dirs"][UNPACK_DIRNAME], archive_stem(filename))
+        if context["incremental"] and manifest.is_done([file_path], [target_dir]):
+            log_func(f"⏭️ 跳过未变化的压缩文件: {filename}")
+            unpacked.put((file_path, target_dir, False), True)
+            continue
+
+        plan = plan_archive(file_path, target_dir, pool.max_workers, PIPELINE_INCLUDE, None, log_func)
+        if plan is None:
+            context["failed"]["unpack"] += 1
+            continue
+        tasks, _ = plan
+        if len(tasks) == 1:
+            _, func, args = tasks[0]
+            unpacked.submit((file_path, target_dir, True), pool.submit, func, *args)
+        else:
+            unpacked.put((file_path, target_dir, True), _unpack_parallel(tasks, pool))
+
+
+def _unpack_parallel(tasks, pool):
+    """大压缩包拆出的多个任务提交到线程池并等待全部完成，只能在线程池以外的线程中调用"""
+    futures = [pool.submit(func, *args) for _, func, args in tasks]
+    return all([f.result() for f in futures])
+
+
+def _process_stage(unpacked, processed, context):
+    """每解压完一个压缩包，立即将其中的激光数据与影像提交转换/正射"""
+    try:
+        for (file_path, target_dir, fresh), ok in unpacked:
+            if not ok:
+                context["failed"]["process"] += 1
+                continue
+            if fresh:
+                context["log_func"](f"✅ 解压完成: {os.path.basename(file_path)}")
+                try:
+                    context["manifests"]["unpack"].mark_done([file_path], [target_dir])
+                except Exception as e:
+                    # 解压结果仍然可用，照常分派；只是下次运行会重新解压
+                    context["log_func"](f"⚠️ 清单写入失败: {os.path.basename(file_path)} → {e}")
+                    context["failed"]["process"] += 1
+            try:
+                jobs = _scene_jobs(target_dir, context)
+            except Exception as e:
+                # 单个压缩包出错不能中断本阶段，否则上游会因队列占满而一直等待
+                context["log_func"](f"❌ 分派失败: {os.path.basename(file_path)} → {e}")
+                context["failed"]["process"] += 1
+                continue
+            for kind, inputs, output_path in jobs:
+                try:
+                    _submit_scene_job(kind, inputs, output_path, processed, context)
+                except Exception as e:
+                    context["log_func"](f"❌ 提交失败: {os.path.basename(inputs[0])} → {e}")
+                    processed.put((kind, inputs, output_path, True), False)
+    finally:
+        processed.close()
+
+
+def _submit_scene_job(kind, inputs, output_path, processed, context):
+    tag = (kind, inputs, output_path, True)
+    if context["incremental"] and context["manifests"][kind].is_done(inputs, [output_path]):
+        processed.put(tag[:3] + (False,), True)
+        return
+    if kind == "lidar":
+        processed.submit(tag, submit_convert, context["lidar_pool"], inputs[0], output_path, context["lidar_log"])
+    else:
+        processed.submit(tag, submit_orthorectify, context["ortho_pool"], context["slots"], inputs[0], inputs[1],
+                         output_path, context["log_func"], context["ortho_log"], context["profile"], None,
+                         context["dem_path"], os.path.join(context["dirs"][ORTHO_DIRNAME], DEM_CACHE_DIRNAME))
+
+
+def _register_stage(processed, sampled, context):
+    """正射结果立即注册为图层；激光转换结果在给定目标点数时继续抽稀"""
+    try:
+        for (kind, inputs, output_path, fresh), ok in processed:
+            if not ok:
+                context["failed"]["register"] += 1
+                continue
+            try:
+                _register_result(kind, inputs, output_path, fresh, sampled, context)
+            except Exception as e:
+                # 与 _process_stage 相同，单个结果出错不能中断本阶段
+                context["log_func"](f"❌ 后续处理失败: {os.path.basename(output_path)} → {e}")
+                context["failed"]["register"] += 1
+    finally:
+        sampled.close()
+
+
+def _register_result(kind, inputs, output_path, fresh, sampled, context):
+    if fresh:
+        context["manifests"][kind].mark_done(inputs, [output_path])
+    if kind == "ortho":
+        context["layers"].append(output_path)
+        if context["on_layer"]:
+            try:
+                context["on_layer"](output_path)
+            except Exception as e:
+                context["log_func"](f"⚠️ 图层注册失败: {os.path.basename(output_path)} → {e}")
+    elif context["target_count"]:
+        sample_path = os.path.join(context["dirs"][DOWNSAMPLE_DIRNAME], os.path.basename(output_path))
+        if context["incremental"] and context["manifests"]["downsample"].is_done([output_path], [sample_path]):
+            sampled.put((output_path, sample_path, False), True)
+            return
+        os.makedirs(context["dirs"][DOWNSAMPLE_DIRNAME], exist_ok=True)
+        sampled.submit((output_path, sample_path, True), submit_downsample, context["downsample_pool"],
+                       output_path, sample_path, context["target_count"], context["log_func"],
+                       context["downsample_log"])
+
+
+def _record_stage(sampled, context):
+    for (input_path, output_path, fresh), ok in sampled:
+        if not ok:
+            context["failed"]["record"] += 1
+        elif fresh:
+            try:
+                context["manifests"]["downsample"].mark_done([input_path], [output_path])
+            except Exception as e:
+                context["log_func"](f"⚠️ 清单写入失败: {os.path.basename(output_path)} → {e}")
+                context["failed"]["record"] += 1
+
+
+def _scene_jobs(scene_dir, context):
+    """遍历解压目录（或压缩包内全部成员）：含 CSV 的目录为一组激光数据，带 RPC 文件的 GeoTIFF 为一景待正射影像。
+    输出名由场景名与相对路径拼成，解压与直读两种方式得到相同的输出名；与本次运行中已有输出重名的条目跳过"""
+    parts = split_vsi(scene_dir)
+    if parts:
+        archive = parts[0]
+        scene = archive_stem(archive)
+        csv_dirs = [(folder, split_vsi(folder)[1].split("/")) for folder in archive_folders(archive, (".csv",))]
+        images = [(vsi_path(archive, m), m.split("/")) for m in sorted(member_names(archive)) if is_valid_image(m)]
+    else:
+        scene = os.path.basename(scene_dir)
+        csv_dirs, images = [], []
+        for root, dirs, files in os.walk(scene_dir):
+            dirs.sort()
+            rel = os.path.relpath(root, scene_dir).split(os.sep)
+            if any(f.lower().endswith(".csv") for f in files):
+                csv_dirs.append((root, rel))
+            images.extend((os.path.join(root, f), rel + [f]) for f in sorted(files) if is_valid_image(f))
+
+    jobs = []
+    for folder, rel in csv_dirs:
+        jobs.append(("lidar", [folder], os.path.join(context["dirs"][LIDAR_DIRNAME], f"{scene_name(scene, rel)}.txt")))
+    for tif_path, rel in images:
+        rpc_path = find_rpc_file(tif_path, os.path.dirname(tif_path))
+        if not rpc_path:
+            context["log_func"](f"⚠️ 未找到 RPC 文件: {os.path.basename(tif_path)}")
+            continue
+        inputs = [tif_path, rpc_path] + ([context["dem_path"]] if context["dem_path"] else [])
+        jobs.append(("ortho", inputs, os.path.join(context["dirs"][ORTHO_DIRNAME], scene_name(scene, rel))))
+
+    unique = []
+    for job in jobs:
+        # Windows 下文件名不区分大小写，按小写判断重名
+        key = job[2].lower()
+        if key in context["outputs"]:
+            context["log_func"](f"⚠️ 输出重名，已跳过: {job[1][0]} → {os.path.basename(job[2])}")
+            continue
+        context["outputs"].add(key)
+        os.makedirs(os.path.dirname(job[2]), exist_ok=True)
+        unique.append(job)
+    return unique
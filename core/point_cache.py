@@ -0,0 +1,129 @@
+# 点云二进制缓存：与 txt 点云同目录的结构化 .npy 侧车文件
+import json
+import os
+import numpy as np
+
+CACHE_VERSION = 1
+
+# offset 为该点所在行在 txt 中的起始字节，用于按行号直接取回原始文本
+POINT_DTYPE = np.dtype([
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("h", "<f8"),
+    ("offset", "<i8"),
+])
+
+
+def cache_paths(txt_path):
+    return txt_path + ".cache.npy", txt_path + ".cache.json"
+
+
+def write_point_cache(txt_path, lats, lons, heights, offsets):
+    """为已写完的 txt 点云生成缓存，记录源文件大小与修改时间用于失效判断"""
+    npy_path, meta_path = cache_paths(txt_path)
+    records = np.empty(len(offsets), dtype=POINT_DTYPE)
+    records["lat"] = lats
+    records["lon"] = lons
+    records["h"] = heights
+    records["offset"] = offsets
+
+    tmp_path = npy_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp_path, npy_path)
+    _write_meta(txt_path, meta_path, len(records))
+
+
+def load_point_cache(txt_path):
+    """以 memmap 方式零拷贝读取缓存；缓存不存在或源文件已变化时返回 None"""
+    npy_path, meta_path = cache_paths(txt_path)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        stat = os.stat(txt_path)
+        if (meta.get("version") != CACHE_VERSION
+                or meta.get("source_size") != stat.st_size
+                or meta.get("source_mtime_ns") != stat.st_mtime_ns):
+            return None
+        records = np.load(npy_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if records.dtype != POINT_DTYPE or len(records) != meta.get("count"):
+        return None
+    return records
+
+
+def read_point_lines(txt_path, records, indices):
+    """按缓存中的行偏移直接读取指定点的原始行，indices 须升序"""
+    size = os.path.getsize(txt_path)
+    offsets = records["offset"]
+    lines = []
+    with open(txt_path, "rb") as f:
+        for i in indices:
+            begin = int(offsets[i])
+            end = int(offsets[i + 1]) if i + 1 < len(offsets) else size
+            f.seek(begin)
+            lines.append(f.read(end - begin).decode("utf-8").rstrip("\r\n") + "\n")
+    return lines
+
+
+def _write_meta(txt_path, meta_path, count):
+    stat = os.stat(txt_path)
+    meta = {
+        "version": CACHE_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "count": count,
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+class PointCacheWriter:
+    """流式写缓存：记录先追加到临时文件，点数确定后再补写 .npy 文件头"""
+
+    COPY_RECORDS = 1 << 20
+
+    def __init__(self, txt_path):
+        self.txt_path = txt_path
+        self.npy_path, self.meta_path = cache_paths(txt_path)
+        self.raw_path = self.npy_path + ".part"
+        self.raw = open(self.raw_path, "wb")
+        self.count = 0
+
+    def append(self, lats, lons, heights, offsets):
+        records = np.empty(len(offsets), dtype=POINT_DTYPE)
+        records["lat"] = lats
+        records["lon"] = lons
+        records["h"] = heights
+        records["offset"] = offsets
+        self.raw.write(records.tobytes())
+        self.count += len(records)
+
+    def close(self, offset_shift=0):
+        """须在 txt 写完后调用；offset_shift 为 txt 表头的字节数"""
+        self.raw.close()
+        tmp_path = self.npy_path + ".tmp"
+        header = {
+            "descr": np.lib.format.dtype_to_descr(POINT_DTYPE),
+            "fortran_order": False,
+            "shape": (self.count,),
+        }
+        with open(tmp_path, "wb") as out, open(self.raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, header)
+            while True:
+                block = raw.read(self.COPY_RECORDS * POINT_DTYPE.itemsize)
+                if not block:
+                    break
+                records = np.frombuffer(block, dtype=POINT_DTYPE).copy()
+                records["offset"] += offset_shift
+                out.write(records.tobytes())
+        os.remove(self.raw_path)
+        os.replace(tmp_path, self.npy_path)
+        _write_meta(self.txt_path, self.meta_path, self.count)
+
+    def discard(self):
+        self.raw.close()
+        if os.path.exists(self.raw_path):
+            os.remove(self.raw_path)
@@ -0,0 +1,77 @@
+# RPC 有理函数模型参数：解析 .rpb / _rpc.txt 文件，转换为 GDAL 的 RPC 元数据
+import re
+from core.archive_reader import open_text
+
+RPC_SCALARS = (
+    "LINE_OFF", "SAMP_OFF", "LAT_OFF", "LONG_OFF", "HEIGHT_OFF",
+    "LINE_SCALE", "SAMP_SCALE", "LAT_SCALE", "LONG_SCALE", "HEIGHT_SCALE",
+)
+RPC_COEFFS = ("LINE_NUM_COEFF", "LINE_DEN_COEFF", "SAMP_NUM_COEFF", "SAMP_DEN_COEFF")
+
+# .rpb 文件中的键名与 GDAL 元数据键名的对应关系
+_RPB_KEYS = {
+    "errBias": "ERR_BIAS",
+    "errRand": "ERR_RAND",
+    "lineOffset": "LINE_OFF",
+    "sampOffset": "SAMP_OFF",
+    "latOffset": "LAT_OFF",
+    "longOffset": "LONG_OFF",
+    "heightOffset": "HEIGHT_OFF",
+    "lineScale": "LINE_SCALE",
+    "sampScale": "SAMP_SCALE",
+    "latScale": "LAT_SCALE",
+    "longScale": "LONG_SCALE",
+    "heightScale": "HEIGHT_SCALE",
+    "lineNumCoef": "LINE_NUM_COEFF",
+    "lineDenCoef": "LINE_DEN_COEFF",
+    "sampNumCoef": "SAMP_NUM_COEFF",
+    "sampDenCoef": "SAMP_DEN_COEFF",
+}
+
+_RPB_RE = re.compile(r"(\w+)\s*=\s*(\([^)]*\)|[^;\n]*);")
+_TXT_RE = re.compile(r"^\s*([A-Z_]+?)(?:_(\d+))?\s*:\s*([-+]?[0-9.]+(?:[eE][-+]?\d+)?)", re.MULTILINE)
+_NUMBER_RE = re.compile(r"[-+]?[0-9.]+(?:[eE][-+]?\d+)?")
+
+
+def read_rpc(rpc_path):
+    """读取 RPC 文件，返回 {键: 数值}，四组系数为长度 20 的列表"""
+    with open_text(rpc_path, errors="ignore") as f:
+        text = f.read()
+    rpc = _parse_rpb(text) if rpc_path.lower().endswith(".rpb") else _parse_rpc_txt(text)
+
+    missing = [k for k in RPC_SCALARS + RPC_COEFFS if k not in rpc]
+    bad = [k for k in RPC_COEFFS if k in rpc and len(rpc[k]) != 20]
+    if missing or bad:
+        raise ValueError(f"RPC 文件不完整：{rpc_path}（{', '.join(missing + bad)}）")
+    return rpc
+
+
+def rpc_metadata(rpc):
+    """转换为 GDAL "RPC" 元数据域的字符串字典"""
+    return {key: " ".join(repr(v) for v in value) if isinstance(value, list) else repr(value)
+            for key, value in rpc.items()}
+
+
+def _parse_rpb(text):
+    rpc = {}
+    for name, value in _RPB_RE.findall(text):
+        key = _RPB_KEYS.get(name)
+        if key is None:
+            continue
+        numbers = [float(v) for v in _NUMBER_RE.findall(value)]
+        if key in RPC_COEFFS:
+            rpc[key] = numbers
+        elif numbers:
+            rpc[key] = numbers[0]
+    return rpc
+
+
+def _parse_rpc_txt(text):
+    rpc = {}
+    for key, index, value in _TXT_RE.findall(text):
+        if key in RPC_COEFFS and index and 1 <= int(index) <= 20:
+            coeffs = rpc.setdefault(key, [0.0] * 20)
+            coeffs[int(index) - 1] = float(value)
+        elif not index:
+            rpc[key] = float(value)
+    return rpc
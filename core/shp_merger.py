@@ -0,0 +1,131 @@
+# SHP 合并：逐要素流式读取多个矢量文件，分批事务写入一个 GeoPackage 或 shapefile，内存占用与输入数量无关
+import os
+import time
+from osgeo import ogr, osr
+
+ogr.UseExceptions()
+
+BATCH_FEATURES = 20000     # 每个事务写入的要素数
+SOURCE_FIELD = "source"    # 记录要素来源文件名的字段
+
+
+def find_vector_files(input_folder):
+    """递归查找文件夹下的 shapefile"""
+    paths = []
+    for root, dirs, files in os.walk(input_folder):
+        dirs.sort()
+        paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".shp"))
+    return paths
+
+
+def merge_vector_files(input_files, output_file, log_func, logger=None, batch_features=BATCH_FEATURES):
+    """输出格式由扩展名决定（.gpkg / .shp）。字段按出现顺序合并，同名字段沿用首次出现的类型；
+    坐标系以第一个输入为准，其余输入按需重投影；空间索引在全部写完后一次性建立。返回 [output_file]"""
+    start = time.perf_counter()
+    is_gpkg = output_file.lower().endswith(".gpkg")
+    driver = ogr.GetDriverByName("GPKG" if is_gpkg else "ESRI Shapefile")
+    if os.path.exists(output_file):
+        driver.DeleteDataSource(output_file)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    datasource = driver.CreateDataSource(output_file)
+    layer_name = os.path.splitext(os.path.basename(output_file))[0]
+
+    layer = None
+    out_type = None
+    fields = {}        # 字段名（小写）→ 输出图层中的序号
+    total = 0
+    in_batch = 0
+
+    for path in input_files:
+        source = ogr.Open(path)
+        if source is None:
+            log_func(f"⚠️ 无法打开，跳过：{path}")
+            continue
+        source_layer = source.GetLayer()
+
+        if layer is None:
+            # 以第一个输入确定坐标系与几何类型（统一为多部件类型，兼容单部件与多部件混合）
+            srs = source_layer.GetSpatialRef()
+            geom_type = ogr.GT_Flatten(source_layer.GetGeomType())
+            out_type = ogr.GT_GetCollection(geom_type) if geom_type != ogr.wkbUnknown else ogr.wkbUnknown
+            options = ["SPATIAL_INDEX=NO"] if is_gpkg else []
+            layer = datasource.CreateLayer(layer_name, srs, out_type, options=options)
+            _add_field(layer, fields, ogr.FieldDefn(SOURCE_FIELD, ogr.OFTString))
+            layer.StartTransaction()
+
+        field_map = _field_map(layer, fields, source_layer.GetLayerDefn())
+        transform = _transform(source_layer.GetSpatialRef(), layer.GetSpatialRef())
+        source_index = fields[SOURCE_FIELD]
+        source_name = os.path.basename(path)
+        defn = layer.GetLayerDefn()
+
+        count = 0
+        for feature in source_layer:
+            out = ogr.Feature(defn)
+            out.SetFromWithMap(feature, 1, field_map)
+            out.SetField(source_index, source_name)
+            geometry = feature.GetGeometryRef()
+            if geometry is not None:
+                geometry = geometry.Clone()
+                if transform:
+                    geometry.Transform(transform)
+                if out_type != ogr.wkbUnknown:
+                    geometry = ogr.ForceTo(geometry, out_type)
+                out.SetGeometryDirectly(geometry)
+            layer.CreateFeature(out)
+            count += 1
+            in_batch += 1
+            if in_batch >= batch_features:
+                layer.CommitTransaction()
+                layer.StartTransaction()
+                in_batch = 0
+        total += count
+        source = None
+
+    if layer is None:
+        datasource = None
+        driver.DeleteDataSource(output_file)
+        log_func("⚠️ 没有可合并的矢量文件")
+        return []
+
+    layer.CommitTransaction()
+    # 写完后一次性建立空间索引，避免逐要素维护索引
+    if is_gpkg:
+        datasource.ExecuteSQL(f"SELECT CreateSpatialIndex('{layer_name}', '{layer.GetGeometryColumn()}')")
+    else:
+        datasource.ExecuteSQL(f'CREATE SPATIAL INDEX ON "{layer_name}"')
+    datasource = None
+
+    log_func(f"🎉 SHP 合并完成: {len(input_files)} 个文件，{total} 个要素 → {output_file}"
+             f"（耗时 {time.perf_counter() - start:.2f}s）")
+    if logger:
+        logger.flush()
+    return [output_file]
+
+
+def _add_field(layer, fields, field_defn):
+    layer.CreateField(field_defn)
+    fields[field_defn.GetName().lower()] = layer.GetLayerDefn().GetFieldCount() - 1
+
+
+def _field_map(layer, fields, source_defn):
+    """输入字段到输出字段序号的映射，遇到新字段时先提交当前事务再追加到输出图层"""
+    defns = [source_defn.GetFieldDefn(i) for i in range(source_defn.GetFieldCount())]
+    new_defns = [d for d in defns if d.GetName().lower() not in fields and d.GetName().lower() != SOURCE_FIELD]
+    if new_defns:
+        layer.CommitTransaction()
+        for field_defn in new_defns:
+            _add_field(layer, fields, field_defn)
+        layer.StartTransaction()
+    return [-1 if d.GetName().lower() == SOURCE_FIELD else fields[d.GetName().lower()] for d in defns]
+
+
+def _transform(source_srs, target_srs):
+    if source_srs is None or target_srs is None:
+        return None
+    source_srs, target_srs = source_srs.Clone(), target_srs.Clone()
+    for srs in (source_srs, target_srs):
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    if source_srs.IsSame(target_srs):
+        return None
+    return osr.CoordinateTransformation(source_srs, target_srs)
@@ -0,0 +1,166 @@
+# 影像优选子集：在大量影像边界中选出覆盖目标区域的最优组合（加权贪心集合覆盖）
+import heapq
+import os
+import time
+import numpy as np
+import shapely
+from osgeo import ogr, osr
+
+ogr.UseExceptions()
+
+COVERAGE_GOAL = 0.99      # 覆盖率达到该值即停止选取
+MIN_GAIN_FRACTION = 0.01  # 新增覆盖不足本景与目标交集面积该比例的影像不再选取，避免为细碎缝隙多选影像
+
+
+def select_subset(footprints, target, costs=None, coverage_goal=COVERAGE_GOAL, min_gain_fraction=MIN_GAIN_FRACTION):
+    """footprints 为 shapely 多边形序列，costs 为各影像的代价（越小越优，默认均为 1）。
+
+    返回 (选中影像的下标列表, 覆盖率)。先用 STR 树筛出与目标相交的影像，再按“新增覆盖面积 / 代价”贪心选取；
+    新增面积只会随已选影像增多而减小，故采用惰性更新：每选中一景只经 STR 树标记与之相交的候选，
+    候选到达堆顶时才从其剩余部分中扣除这些影像。
+    """
+    footprints = np.asarray(footprints, dtype=object)
+    costs = np.ones(len(footprints)) if costs is None else np.asarray(costs, dtype=np.float64)
+    target_area = shapely.area(target)
+    if not len(footprints) or target_area <= 0:
+        return [], 0.0
+
+    candidates = shapely.STRtree(footprints).query(target, predicate="intersects")
+    if not len(candidates):
+        return [], 0.0
+
+    # 每景的剩余部分：与目标区域的交集，减去已选影像后即为选中它能新增的覆盖
+    shapes = footprints[candidates]
+    residuals = shapely.intersection(shapes, target)
+    gains = shapely.area(residuals)
+    min_gains = gains * min_gain_fraction
+    ratios = gains / costs[candidates]
+    tree = shapely.STRtree(shapes)
+    pending = [[] for _ in range(len(candidates))]  # 上次更新后新选中、与该候选相交的影像
+
+    heap = [(-ratios[k], k) for k in range(len(candidates)) if gains[k] > 0]
+    heapq.heapify(heap)
+
+    selected = []
+    covered = 0.0
+    while heap and covered < target_area * coverage_goal:
+        _, k = heapq.heappop(heap)
+        if pending[k]:
+            for h in pending[k]:
+                residuals[k] = shapely.difference(residuals[k], shapes[h])
+            gains[k] = shapely.area(residuals[k])
+            pending[k] = []
+            if gains[k] <= 0 or gains[k] < min_gains[k]:
+                continue  # 已被先选的影像完全覆盖，或新增覆盖过小
+            ratio = gains[k] / costs[candidates[k]]
+            if heap and ratio < -heap[0][0]:
+                heapq.heappush(heap, (-ratio, k))
+                continue
+
+        selected.append(k)
+        covered += gains[k]
+        for h in tree.query(shapes[k], predicate="intersects").tolist():
+            pending[h].append(k)
+
+    return [int(candidates[k]) for k in selected], min(1.0, covered / target_area)
+
+
+def weight_costs(values, prefer_high=False):
+    """将云量、日期、侧摆角等属性归一化为代价，取值范围 [1, 2]，最优的影像代价为 1"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    low, high = np.nanmin(values), np.nanmax(values)
+    scaled = np.zeros(len(values)) if high <= low else (values - low) / (high - low)
+    scaled = np.nan_to_num(scaled, nan=1.0)  # 属性缺失的影像视为最差
+    return 1.0 + (1.0 - scaled if prefer_high else scaled)
+
+
+def select_subset_file(footprint_file, target_file, output_file, log_func, weight_field=None, prefer_high=False,
+                       coverage_goal=COVERAGE_GOAL):
+    """从边界图层中选取覆盖目标区域的影像子集，写出为 shapefile，返回 [output_file]"""
+    start = time.perf_counter()
+    source = ogr.Open(footprint_file)
+    layer = source.GetLayer()
+    srs = layer.GetSpatialRef()
+
+    features, geometries, values = [], [], []
+    for feature in layer:
+        geometry = feature.GetGeometryRef()
+        if geometry is None:
+            continue
+        features.append(feature)
+        geometries.append(shapely.from_wkb(bytes(geometry.ExportToWkb())))
+        if weight_field:
+            values.append(_field_number(feature, weight_field))
+
+    target = _read_target(target_file, srs)
+    costs = weight_costs(values, prefer_high) if weight_field else None
+    indices, coverage = select_subset(geometries, target, costs, coverage_goal)
+
+    _write_subset(output_file, layer, srs, [features[i] for i in indices])
+    log_func(f"✅ 影像优选完成: {len(features)} 景中选出 {len(indices)} 景，覆盖率 {coverage:.2%}"
+             f"（耗时 {time.perf_counter() - start:.2f}s）→ {output_file}")
+    return [output_file] if indices else []
+
+
+def _field_number(feature, name):
+    """数值字段直接取值，日期字段转换为天数，缺失时返回 NaN"""
+    index = feature.GetFieldIndex(name)
+    if index < 0:
+        raise ValueError(f"边界图层中没有字段：{name}")
+    if not feature.IsFieldSetAndNotNull(index):
+        return np.nan
+    field_type = feature.GetFieldDefnRef(index).GetType()
+    if field_type in (ogr.OFTDate, ogr.OFTDateTime):
+        year, month, day = feature.GetFieldAsDateTime(index)[:3]
+        return float(np.datetime64(f"{year:04d}-{month:02d}-{day:02d}").astype("datetime64[D]").astype(np.int64))
+    return feature.GetFieldAsDouble(index)
+
+
+def _read_target(target_file, srs):
+    """目标区域图层中所有多边形合并为一个，并转换到边界图层的坐标系"""
+    source = ogr.Open(target_file)
+    layer = source.GetLayer()
+    transform = None
+    if srs is not None and layer.GetSpatialRef() is not None:
+        source_srs, target_srs = layer.GetSpatialRef().Clone(), srs.Clone()
+        for item in (source_srs, target_srs):
+            item.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        if not source_srs.IsSame(target_srs):
+            transform = osr.CoordinateTransformation(source_srs, target_srs)
+
+    parts = []
+    for feature in layer:
+        geometry = feature.GetGeometryRef()
+        if geometry is None:
+            continue
+        geometry = geometry.Clone()
+        if transform:
+            geometry.Transform(transform)
+        parts.append(shapely.from_wkb(bytes(geometry.ExportToWkb())))
+    if not parts:
+        raise ValueError(f"目标区域图层为空：{target_file}")
+    return shapely.union_all(parts)
+
+
+def _write_subset(output_file, source_layer, srs, features):
+    driver = ogr.GetDriverByName("ESRI Shapefile")
+    if os.path.exists(output_file):
+        driver.DeleteDataSource(output_file)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    datasource = driver.CreateDataSource(output_file)
+
+    layer = datasource.CreateLayer(os.path.splitext(os.path.basename(output_file))[0], srs,
+                                   source_layer.GetGeomType())
+    source_defn = source_layer.GetLayerDefn()
+    for i in range(source_defn.GetFieldCount()):
+        layer.CreateField(source_defn.GetFieldDefn(i))
+
+    layer.StartTransaction()
+    for feature in features:
+        out = ogr.Feature(layer.GetLayerDefn())
+        out.SetFrom(feature)
+        layer.CreateFeature(out)
+    layer.CommitTransaction()
+    datasource = None
@@ -3,6 +3,7 @@ from PyQt5.QtCore import QObject, QThread, pyqtSignal
 class TaskRunner(QObject):
     finished = pyqtSignal()
     failed = pyqtSignal(str)
+    progress = pyqtSignal(object)  # 任务执行中途产生的结果，经信号转到界面线程处理
 
     def __init__(self, func, *args, **kwargs):
         super().__init__()
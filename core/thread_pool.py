@@ -1,4 +1,10 @@
-from concurrent.futures import ThreadPoolExecutor
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 
 
 class ThreadPool:
@@ -8,11 +14,130 @@ class ThreadPool:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance.executor = ThreadPoolExecutor(max_workers=max_workers)
+            cls._instance.max_workers = max_workers
         return cls._instance
 
     def submit(self, func, *args, **kwargs):
         return self.executor.submit(func, *args, **kwargs)
 
+    @contextmanager
+    def log_channel(self, log_func):
+        # 线程内可直接调用 log_func，与 ProcessPool 保持相同接口
+        yield log_func
+
     def shutdown(self, wait=True):
         self.executor.shutdown(wait=wait)
         ThreadPool._instance = None
+
+
+# 各类 CPU 密集作业的进程数，None 表示使用全部 CPU 核
+PROCESS_WORKERS = {
+    "downsample": None,
+    "lidar_convert": None,
+    "orthorectify": None,
+    "boundary": None,
+}
+
+_worker_log_queue = None
+
+
+def _init_worker(log_queue):
+    global _worker_log_queue
+    _worker_log_queue = log_queue
+
+
+class ProcessLog:
+    """子进程中使用的日志函数，消息经队列转发回主进程的 log_func"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def __call__(self, text):
+        _worker_log_queue.put((self.channel, text))
+
+
+class ProcessPool:
+    """按作业类型区分的进程池单例，用于绕开 GIL 的纯 Python 计算任务"""
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, job_type="default", max_workers=None):
+        with cls._lock:
+            if job_type not in cls._instances:
+                instance = super().__new__(cls)
+                workers = max_workers or PROCESS_WORKERS.get(job_type) or os.cpu_count() or 1
+                instance._start(job_type, workers)
+                cls._instances[job_type] = instance
+            return cls._instances[job_type]
+
+    def _start(self, job_type, max_workers):
+        # 使用 spawn 启动子进程，子进程不会继承主进程中的 Qt/QGIS 状态
+        self._context = multiprocessing.get_context("spawn")
+        self.job_type = job_type
+        self.max_workers = max_workers
+        self.log_queue = self._context.SimpleQueue()
+        self.executor = self._new_executor()
+        self._channels = {}
+        self._channel_ids = itertools.count(1)
+        self._listener = threading.Thread(target=self._forward_logs, daemon=True)
+        self._listener.start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.log_queue,)
+        )
+
+    def submit(self, func, *args, **kwargs):
+        executor = self.executor
+        try:
+            return executor.submit(func, *args, **kwargs)
+        except BrokenProcessPool:
+            # 有子进程异常退出（GDAL 段错误、内存不足被系统终止等）后执行器不再接受任务，
+            # 换一个新的执行器继续，日志队列与通道沿用，本次会话中后续同类作业不受影响
+            self._restart(executor)
+            return self.executor.submit(func, *args, **kwargs)
+
+    def _restart(self, broken):
+        with ProcessPool._lock:
+            if self.executor is broken:
+                broken.shutdown(wait=False)
+                self.executor = self._new_executor()
+
+    @contextmanager
+    def log_channel(self, log_func):
+        """分配一个日志通道，返回可传入子进程的日志函数；退出时等待该通道的日志全部转发完毕"""
+        channel = next(self._channel_ids)
+        done = threading.Event()
+        self._channels[channel] = (log_func, done)
+        try:
+            yield ProcessLog(channel)
+        finally:
+            # SimpleQueue 同步写入，子进程返回结果前日志已入队，结束标记必然排在其后
+            self.log_queue.put((channel, None))
+            done.wait()
+
+    def _forward_logs(self):
+        while True:
+            channel, text = self.log_queue.get()
+            if channel is None:
+                break
+            log_func, done = self._channels.get(channel, (None, None))
+            if log_func is None:
+                continue
+            if text is None:
+                del self._channels[channel]
+                done.set()
+                continue
+            try:
+                log_func(text)
+            except Exception:
+                pass  # 日志回调出错不能终止转发线程，否则 log_channel 会一直等待
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        self.log_queue.put((None, None))
+        with ProcessPool._lock:
+            ProcessPool._instances.pop(self.job_type, None)
@@ -1,53 +1,226 @@
+import fnmatch
+import heapq
 import os
 import shutil
 import zipfile
 import tarfile
+import zlib
+from concurrent.futures import as_completed
 import rarfile  # 需要 pip install rarfile
+from core.archive_reader import archive_stem
+from core.job_manifest import JobManifest
 from core.thread_pool import ThreadPool
 
+PARALLEL_ARCHIVE_BYTES = 1 << 30   # 超过该大小的 zip/rar 按成员拆分给多个线程并行解压
+COPY_BUFFER = 8 << 20              # 成员写出时的缓冲区大小
+SUPPORTED_EXT = (".zip", ".tar", ".gz", ".bz2", ".xz", ".rar")
 
-def unpack_all(input_folder, output_folder, log_func=print):
-    supported_ext = (".zip", ".tar", ".gz", ".bz2", ".xz", ".rar")
+
+def unpack_all(input_folder, output_folder, log_func=print, incremental=True, include=None, exclude=None):
+    """include / exclude 为通配符列表（如 ["*.csv", "*.tif"]），匹配包内路径或文件名；
+    先为所有压缩包建立成员索引，已解压且大小与 CRC 一致的成员跳过，其余按数据量从大到小调度，避免批次末尾只剩一个大包。
+    返回解压失败的压缩文件数"""
     thread_pool = ThreadPool()
-    futures = []
+    filters = {"include": include, "exclude": exclude} if include or exclude else None
+    manifest = JobManifest(output_folder, "unpack", filters)
+    skipped = 0
+    failed = 0
 
-    for filename in os.listdir(input_folder):
+    archives = []
+    for filename in sorted(os.listdir(input_folder)):
         file_path = os.path.join(input_folder, filename)
-        name, ext = os.path.splitext(filename)
+        if not filename.lower().endswith(SUPPORTED_EXT) or not os.path.isfile(file_path):
+            continue
 
-        if ext.lower() not in supported_ext or not os.path.isfile(file_path):
+        # B.tar.gz 解压到 B 目录，与直接读取压缩包时的场景名一致
+        target_dir = os.path.join(output_folder, archive_stem(filename))
+        if incremental and manifest.is_done([file_path], [target_dir]):
+            skipped += 1
             continue
+        archives.append((file_path, target_dir))
 
-        target_dir = os.path.join(output_folder, name)
-        os.makedirs(target_dir, exist_ok=True)
+    # 成员索引只读取目录信息，各压缩包并行扫描
+    scans = [thread_pool.submit(plan_archive, file_path, target_dir, thread_pool.max_workers, include, exclude, log_func)
+             for file_path, target_dir in archives]
+    tasks = []
+    pending = {}       # 压缩文件 → [未完成的任务数, 是否全部成功, 已是最新的成员数]
+    for (file_path, target_dir), scan in zip(archives, scans):
+        plan = scan.result()
+        if plan is None:
+            failed += 1
+            continue
+        archive_tasks, current = plan
+        pending[file_path] = [len(archive_tasks), True, current]
+        tasks.extend((size, file_path, target_dir, func, args) for size, func, args in archive_tasks)
+        if not archive_tasks:
+            _finish_archive(file_path, target_dir, current, manifest, log_func)
 
-        future = thread_pool.submit(_unpack_single, file_path, target_dir, log_func)
-        futures.append(future)
+    # 数据量大的任务先提交，线程池按提交顺序开工
+    futures = {}
+    for size, file_path, target_dir, func, args in sorted(tasks, key=lambda t: t[0], reverse=True):
+        futures[thread_pool.submit(func, *args)] = (file_path, target_dir)
 
-    # ✅ 等待所有任务完成后再返回
-    for f in futures:
-        f.result()
+    # ✅ 等待所有任务完成后再返回，每个压缩文件全部解压成功后立即写入清单
+    for f in as_completed(futures):
+        file_path, target_dir = futures[f]
+        state = pending[file_path]
+        state[0] -= 1
+        state[1] = f.result() and state[1]
+        if state[0] == 0:
+            if state[1]:
+                _finish_archive(file_path, target_dir, state[2], manifest, log_func)
+            else:
+                failed += 1
 
+    if skipped:
+        log_func(f"⏭️ 跳过 {skipped} 个未变化的压缩文件")
+    if failed:
+        log_func(f"⚠️ {failed} 个压缩文件解压失败")
     log_func("🎉 所有压缩文件已解压完成")
+    return failed
+
+
+def _finish_archive(file_path, target_dir, current, manifest, log_func):
+    note = f"（{current} 个成员已是最新，未重复解压）" if current else ""
+    log_func(f"✅ 解压完成: {os.path.basename(file_path)}{note}")
+    manifest.mark_done([file_path], [target_dir])
+
 
+def plan_archive(file_path, target_dir, workers, include=None, exclude=None, log_func=print):
+    """建立成员索引并规划解压任务，返回 ([(数据量, 函数, 参数), ...], 已是最新的成员数)，无法读取时返回 None。
 
-def _unpack_single(file_path, target_dir, log_func):
+    zip/rar 按索引筛选成员并跳过已解压且大小、CRC 一致的成员，大包按成员大小均衡拆成多个任务；
+    tar 为顺序流，整包一个任务，边读边按通配符与大小、修改时间筛选"""
+    name = os.path.basename(file_path)
     try:
-        if zipfile.is_zipfile(file_path):
-            with zipfile.ZipFile(file_path, 'r') as zf:
-                zf.extractall(target_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        if not zipfile.is_zipfile(file_path) and not file_path.lower().endswith(".rar"):
+            if not tarfile.is_tarfile(file_path):
+                raise ValueError(f"不支持的压缩格式：{file_path}")
+            return [(os.path.getsize(file_path), _unpack_tar, (file_path, target_dir, include, exclude, log_func))], 0
+
+        members, current = [], 0
+        for member, size, crc in index_archive(file_path):
+            if not _selected(member, include, exclude):
+                continue
+            path = _member_path(target_dir, member)
+            if _is_current(path, size, crc):
+                current += 1
+            else:
+                members.append((size, member))
+        if not members:
+            return [], current
+
+        groups = [[m for _, m in members]]
+        if len(members) > 1 and workers > 1 and os.path.getsize(file_path) >= PARALLEL_ARCHIVE_BYTES \
+                and _splittable(file_path):
+            groups = _balance(members, workers)
+            log_func(f"🔀 并行解压: {name}（{len(members)} 个成员，{len(groups)} 个线程）")
+        sizes = {m: s for s, m in members}
+        return [(sum(sizes[m] for m in g), _unpack_members, (file_path, target_dir, g, log_func)) for g in groups], current
+    except Exception as e:
+        log_func(f"❌ 解压失败: {name} -> {e}")
+        return None
+
+
+def index_archive(file_path):
+    """zip/rar 的成员索引：[(包内路径, 解压后大小, CRC32 或 None)]，不含目录"""
+    with _open_archive(file_path) as archive:
+        return [(info.filename, info.file_size, getattr(info, "CRC", None))
+                for info in archive.infolist() if not info.is_dir()]
+
 
-        elif tarfile.is_tarfile(file_path):
-            with tarfile.open(file_path, 'r:*') as tf:
-                tf.extractall(target_dir)
+def _open_archive(file_path):
+    if zipfile.is_zipfile(file_path):
+        return zipfile.ZipFile(file_path, 'r')
+    return rarfile.RarFile(file_path)
 
-        elif file_path.endswith(".rar"):
-            with rarfile.RarFile(file_path) as rf:
-                rf.extractall(target_dir)
 
-        else:
-            raise ValueError(f"不支持的压缩格式：{file_path}")
+def _splittable(file_path):
+    """固实压缩的 rar 成员须从头顺序解压，并行无益"""
+    if zipfile.is_zipfile(file_path):
+        return True
+    with rarfile.RarFile(file_path) as rf:
+        return not rf.is_solid()
 
-        log_func(f"✅ 解压完成: {os.path.basename(file_path)}")
+
+def _balance(members, workers):
+    """最大成员优先放入当前总量最小的分组"""
+    groups = [(0, i, []) for i in range(min(workers, len(members)))]
+    for size, name in sorted(members, reverse=True):
+        total, i, names = heapq.heappop(groups)
+        names.append(name)
+        heapq.heappush(groups, (total + size, i, names))
+    return [names for _, _, names in groups]
+
+
+def _selected(member, include, exclude):
+    """通配符同时匹配包内完整路径与文件名，不区分大小写"""
+    member = member.lower()
+    candidates = (member, member.rsplit("/", 1)[-1])
+    if include and not any(fnmatch.fnmatchcase(c, p.lower()) for p in include for c in candidates):
+        return False
+    return not (exclude and any(fnmatch.fnmatchcase(c, p.lower()) for p in exclude for c in candidates))
+
+
+def _is_current(path, size, crc):
+    """已解压文件大小一致且 CRC 一致（索引中无 CRC 时只比较大小）"""
+    if not os.path.isfile(path) or os.path.getsize(path) != size:
+        return False
+    if crc is None:
+        return True
+    value = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(COPY_BUFFER)
+            if not block:
+                break
+            value = zlib.crc32(block, value)
+    return value == crc
+
+
+def _unpack_members(file_path, target_dir, names, log_func):
+    name = os.path.basename(file_path)
+    try:
+        with _open_archive(file_path) as archive:
+            for member in names:
+                path = _member_path(target_dir, member)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with archive.open(member) as src, open(path, "wb", buffering=COPY_BUFFER) as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER)
+        return True
     except Exception as e:
-        log_func(f"❌ 解压失败: {os.path.basename(file_path)} -> {e}")
+        log_func(f"❌ 解压失败: {name} -> {e}")
+        return False
+
+
+def _unpack_tar(file_path, target_dir, include, exclude, log_func):
+    """顺序读取 tar 流，只写出普通文件（不创建链接与设备文件），大小与修改时间一致的成员跳过"""
+    name = os.path.basename(file_path)
+    try:
+        with tarfile.open(file_path, 'r:*') as tf:
+            for info in tf:
+                if not info.isfile() or not _selected(info.name, include, exclude):
+                    continue
+                path = _member_path(target_dir, info.name)
+                if os.path.isfile(path) and os.path.getsize(path) == info.size \
+                        and int(os.path.getmtime(path)) == int(info.mtime):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with tf.extractfile(info) as src, open(path, "wb", buffering=COPY_BUFFER) as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER)
+                os.utime(path, (info.mtime, info.mtime))
+        return True
+    except Exception as e:
+        log_func(f"❌ 解压失败: {name} -> {e}")
+        return False
+
+
+def _member_path(target_dir, member):
+    """与 zipfile.extractall 一致，去掉盘符、开头的分隔符与 ".."，成员只会落在目标目录内"""
+    parts = [p for p in member.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    if parts and len(parts[0]) == 2 and parts[0][1] == ":":
+        parts = parts[1:]
+    if not parts:
+        raise ValueError(f"非法的成员路径：{member}")
+    return os.path.join(target_dir, *parts)
@@ -1,14 +1,32 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from config.qgis_env import init_qgis
-from ui.main_window import MainWindow
+import time
 
 if __name__ == "__main__":
+    # Qt/QGIS 只在主进程导入：进程池以 spawn 方式启动子进程时会重新导入本模块
+    start = time.perf_counter()
+    from PyQt5.QtWidgets import QApplication
+
     app = QApplication(sys.argv)
+    t_qt = time.perf_counter()
 
-    init_qgis()
+    # 主窗口不依赖 QGIS，先显示出来；各功能对话框及 GDAL 等模块在首次打开时才导入
+    from ui.main_window import MainWindow
 
     window = MainWindow()
     window.show()
+    app.processEvents()
+    t_window = time.perf_counter()
+
+    # QgsApplication 须在 GUI 线程初始化，放在窗口首次绘制之后，完成后再创建地图画布
+    from config.qgis_env import init_qgis
+
+    init_qgis()
+    t_qgis = time.perf_counter()
+    window.init_canvas()
+    t_canvas = time.perf_counter()
+
+    window.log(f"⏱️ 启动耗时：Qt {t_qt - start:.2f}s，主窗口 {t_window - t_qt:.2f}s"
+               f"（窗口在 {t_window - start:.2f}s 时显示），QGIS 初始化 {t_qgis - t_window:.2f}s，"
+               f"地图画布 {t_canvas - t_qgis:.2f}s，合计 {t_canvas - start:.2f}s")
 
     sys.exit(app.exec_())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入 core 下的模块，与 main.py / tools.py 一样以仓库根目录为导入起点
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+import tarfile
+
+import pytest
+
+from core.archive_reader import (archive_stem, is_compressed_tar, list_files, open_texts, scene_name, split_vsi,
+                                 vsi_path)
+
+
+@pytest.mark.parametrize("name, stem", [("B.tar.gz", "B"), ("a.b.zip", "a.b"), ("x.TGZ", "x"), ("y.rar", "y")])
+def test_archive_stem(name, stem):
+    assert archive_stem(name) == stem
+
+
+def test_vsi_round_trip():
+    path = vsi_path("C:\\data\\B.tar.gz", "B/beam1/")
+    assert path == "/vsitar/C:/data/B.tar.gz/B/beam1"
+    assert split_vsi(path) == ("C:/data/B.tar.gz", "B/beam1")
+    assert split_vsi("/vsizip//data/a.zip") == ("/data/a.zip", "")
+    assert split_vsi("/data/a.zip") is None
+    assert is_compressed_tar("a.tar.xz") and not is_compressed_tar("a.tar")
+
+
+def test_scene_name_keeps_archives_apart():
+    # 不同压缩包中相同的包内路径得到不同的输出名，与包同名的顶层目录不重复
+    assert scene_name("A", ["img.tif"]) == "A_img.tif"
+    assert scene_name("B", ["img.tif"]) == "B_img.tif"
+    assert scene_name("A", ["A", "beam1"]) == "A_beam1"
+    assert scene_name("A", [".", "sub", "img.tif"]) == "A_sub_img.tif"
+
+
+def test_tar_members_are_read_in_stored_order(tmp_path):
+    archive = str(tmp_path / "scene.tar.gz")
+    with tarfile.open(archive, "w:gz") as tf:
+        for name in ("c.csv", "a.csv", "b.csv"):
+            (tmp_path / name).write_text(f"{name}\n", encoding="utf-8")
+            tf.add(str(tmp_path / name), f"scene/{name}")
+
+    paths = list_files(vsi_path(archive, "scene"), (".csv",))
+    assert [p.rsplit("/", 1)[1] for p in paths] == ["a.csv", "b.csv", "c.csv"]
+    with open_texts(paths) as (ordered, opener):
+        assert [p.rsplit("/", 1)[1] for p in ordered] == ["c.csv", "a.csv", "b.csv"]
+        texts = []
+        for path in ordered:
+            with opener(path) as f:
+                texts.append(f.read())
+    assert texts == ["c.csv\n", "a.csv\n", "b.csv\n"]
@@ -0,0 +1,139 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from core import downsampler
+from core.downsampler import _parse_lines, _select_adaptive, _split_ranges
+
+
+class _InlinePool:
+    """同步执行的进程池替身，分块抽稀的调度逻辑与真实进程池一致"""
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+def _write_points(path, count, seed=0, newline="\n"):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(30, 31, count)
+    lons = rng.uniform(110, 111, count)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{count}{newline}")
+        for i in range(count):
+            f.write(f"{i + 1}\t{lats[i]:.8f}\t{lons[i]:.8f}\t{rng.uniform(0, 100):.3f}{newline}")
+
+
+def _read_lines(path):
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8").split("\n")[:-1]
+
+
+def _read_output(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert b"\r" not in data
+    return _read_lines(path)
+
+
+def test_parse_lines_keeps_rows_with_four_columns():
+    # 与原实现一致：只保留按空白拆分后至少 4 列的行，列数不足的行不能经 loadtxt 快速路径混入
+    lines = ["1\t30.1\t110.1\t5.0\n", "2\t30.2\t110.2\n", "\n", "4 30.4 110.4 7.0 extra\n", "x\t30.5\t110.5\th\n"]
+    lats, lons, kept = _parse_lines(lines)
+    assert kept == [line for line in lines if len(line.split()) >= 4]
+    assert lats.tolist() == [30.1, 30.4, 30.5]
+    assert lons.tolist() == [110.1, 110.4, 110.5]
+
+    clean = ["1\t30.1\t110.1\t5.0\n", "2\t30.2\t110.2\t6.0\n"]
+    assert _parse_lines(clean)[2] == clean
+
+
+def test_three_column_file_yields_no_points(tmp_path):
+    path = tmp_path / "points.txt"
+    path.write_text("5\n" + "".join(f"{i}\t30.{i}\t110.{i}\n" for i in range(5)), encoding="utf-8")
+    assert downsampler._downsample_uniform(str(path), str(tmp_path / "out.txt"), 3, print)
+    assert _read_output(str(tmp_path / "out.txt")) == ["0"]
+
+
+@pytest.mark.parametrize("count, target", [(10_000, 1), (10_000, 137), (10_000, 2_500), (50_000, 9_999)])
+def test_select_adaptive_hits_exact_count(count, target):
+    rng = np.random.default_rng(count + target)
+    lats, lons = rng.normal(0, 1, count), rng.uniform(0, 5, count)
+    selected, iterations = _select_adaptive(lats, lons, target, np.random.default_rng(1), 0.01)
+    assert len(selected) == target
+    assert len(np.unique(selected)) == target
+    assert np.all(np.diff(selected) > 0)
+    assert 1 <= iterations <= downsampler.ADAPTIVE_MAX_ITER
+
+
+def test_select_adaptive_with_duplicate_points():
+    # 重复点多于目标点数时无法达标，返回全部不同位置各一个点
+    lats = np.repeat([0.0, 1.0, 2.0], 100)
+    lons = np.repeat([0.0, 1.0, 2.0], 100)
+    selected, _ = _select_adaptive(lats, lons, 10, np.random.default_rng(0), 0.01)
+    assert len(selected) == 3
+
+
+def test_select_adaptive_is_seedable():
+    rng = np.random.default_rng(5)
+    lats, lons = rng.random(5_000), rng.random(5_000)
+    first, _ = _select_adaptive(lats, lons, 500, np.random.default_rng(42), 0.01)
+    second, _ = _select_adaptive(lats, lons, 500, np.random.default_rng(42), 0.01)
+    assert first.tolist() == second.tolist()
+
+
+def test_split_ranges_cover_file_on_line_boundaries(tmp_path):
+    path = str(tmp_path / "points.txt")
+    _write_points(path, 5_000)
+    ranges = _split_ranges(path, 4096)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert ranges[0][0] == data.index(b"\n") + 1
+    assert ranges[-1][1] == len(data)
+    assert all(hi == lo for (_, hi), (lo, _) in zip(ranges[:-1], ranges[1:]))
+    assert all(data[lo - 1:lo] == b"\n" for lo, _ in ranges)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_chunked_matches_stream_contract(tmp_path, monkeypatch, newline):
+    # 分块并行与整文件流式抽稀的随机数序列不同，比较两者共同保证的性质：点数、原始行、原有顺序、统一的换行
+    monkeypatch.setattr(downsampler, "CHUNK_BYTES", 65_536)
+    monkeypatch.setattr(downsampler, "RANGE_READ_BYTES", 8192)
+    path = str(tmp_path / "points.txt")
+    _write_points(path, 20_000, newline=newline)
+    source = [line.rstrip("\r") for line in _read_lines(path)[1:]]
+    position = {line: i for i, line in enumerate(source)}
+
+    assert downsampler._downsample_chunked(path, str(tmp_path / "chunked.txt"), 300, print, 7, _InlinePool())
+    assert downsampler._downsample_stream(path, str(tmp_path / "stream.txt"), 300, print, 7)
+    for name in ("chunked", "stream"):
+        lines = _read_output(str(tmp_path / f"{name}.txt"))
+        assert int(lines[0]) == len(lines) - 1 == 300
+        order = [position[line] for line in lines[1:]]
+        assert order == sorted(order)
+
+
+def test_chunked_is_deterministic_for_a_seed(tmp_path, monkeypatch):
+    monkeypatch.setattr(downsampler, "CHUNK_BYTES", 16_384)
+    path = str(tmp_path / "points.txt")
+    _write_points(path, 10_000)
+    for name in ("a", "b"):
+        downsampler._downsample_chunked(path, str(tmp_path / f"{name}.txt"), 500, print, 3, _InlinePool())
+    assert _read_output(str(tmp_path / "a.txt")) == _read_output(str(tmp_path / "b.txt"))
+
+
+def test_memory_mode_uses_cache_and_text_alike(tmp_path):
+    # 命中二进制缓存与解析文本两种途径，选中的点与写出的行完全一致
+    from core.lidar_converter import _write_points as write_converted
+    rng = np.random.default_rng(9)
+    points = [(f"{a:.8f}", f"{b:.8f}", f"{c:.3f}") for a, b, c in rng.uniform(0, 1, (3_000, 3))]
+    cached, plain = str(tmp_path / "cached.txt"), str(tmp_path / "plain.txt")
+    write_converted(cached, points, write_cache=True)
+    write_converted(plain, points, write_cache=False)
+
+    for path in (cached, plain):
+        assert downsampler._downsample_uniform(path, path + ".out", 400, print, seed=11, adaptive=True)
+    assert _read_output(cached + ".out") == _read_output(plain + ".out")
+    assert int(_read_output(cached + ".out")[0]) == 400
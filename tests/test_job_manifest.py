@@ -0,0 +1,125 @@
+import json
+import os
+
+from core import job_manifest
+from core.job_manifest import MANIFEST_NAME, JobManifest
+
+
+def _make_job(tmp_path, name, text="data"):
+    source = tmp_path / "in" / f"{name}.csv"
+    output = tmp_path / "out" / f"{name}.txt"
+    for path in (source, output):
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    return str(source), str(output)
+
+
+def _journal_lines(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME + job_manifest.JOURNAL_SUFFIX)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return f.readlines()
+
+
+def test_mark_done_appends_and_reopen_resumes(tmp_path):
+    out = str(tmp_path / "out")
+    jobs = [_make_job(tmp_path, f"scene{i}") for i in range(3)]
+    manifest = JobManifest(out, "lidar_convert", {"filters": [("h_ph", ">", 0)]})
+    for source, output in jobs:
+        manifest.mark_done([source], [output])
+
+    # 每完成一项只追加一行日志，清单文件本身不重写
+    assert len(_journal_lines(out)) == 3
+    assert not os.path.exists(os.path.join(out, MANIFEST_NAME))
+
+    reopened = JobManifest(out, "lidar_convert", {"filters": [("h_ph", ">", 0)]})
+    assert all(reopened.is_done([source], [output]) for source, output in jobs)
+    # 打开时已把日志合并进清单文件
+    assert _journal_lines(out) == []
+    with open(os.path.join(out, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        assert len(json.load(f)["jobs"]["lidar_convert"]) == 3
+
+
+def test_changed_inputs_outputs_or_params_are_redone(tmp_path):
+    out = str(tmp_path / "out")
+    (source, output), (other_source, other_output) = _make_job(tmp_path, "a"), _make_job(tmp_path, "b")
+    manifest = JobManifest(out, "downsample", {"target_count": 10})
+    manifest.mark_done([source], [output])
+    manifest.mark_done([other_source], [other_output])
+
+    assert not JobManifest(out, "downsample", {"target_count": 20}).is_done([source], [output])
+    assert not JobManifest(out, "unpack", {"target_count": 10}).is_done([source], [output])
+
+    with open(source, "a", encoding="utf-8") as f:
+        f.write("more")
+    os.remove(other_output)
+    reopened = JobManifest(out, "downsample", {"target_count": 10})
+    assert not reopened.is_done([source], [output])
+    assert not reopened.is_done([other_source], [other_output])
+
+
+def test_compacts_every_compact_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_manifest, "COMPACT_ENTRIES", 4)
+    out = str(tmp_path / "out")
+    manifest = JobManifest(out, "lidar_convert")
+    for i in range(6):
+        manifest.mark_done(*[[path] for path in _make_job(tmp_path, f"scene{i}")])
+        assert len(_journal_lines(out)) == (i + 1) % 4
+
+    with open(os.path.join(out, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        assert len(json.load(f)["jobs"]["lidar_convert"]) == 4
+    assert len(JobManifest(out, "lidar_convert")._entries) == 6
+
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    out = str(tmp_path / "out")
+    source, output = _make_job(tmp_path, "scene")
+    JobManifest(out, "lidar_convert").mark_done([source], [output])
+    # 写入中途进程退出留下半行
+    with open(os.path.join(out, MANIFEST_NAME + job_manifest.JOURNAL_SUFFIX), "a", encoding="utf-8") as f:
+        f.write('{"job": "lidar_convert", "key": ')
+
+    assert JobManifest(out, "lidar_convert").is_done([source], [output])
+
+
+def _mark_many(output_dir, source_dir, worker, count):
+    # 子进程重新导入模块，在此调小合并间隔，让各进程在追加的同时频繁合并
+    job_manifest.COMPACT_ENTRIES = 7
+    manifest = JobManifest(output_dir, "lidar_convert")
+    for i in range(count):
+        source = os.path.join(source_dir, f"w{worker}_{i}.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(str(i))
+        manifest.mark_done([source], [source])
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    # 多个进程（如同时运行的多个命令行任务）共用一个清单，合并时不能丢失其他进程追加的条目
+    import multiprocessing
+    out, sources = str(tmp_path / "out"), str(tmp_path / "in")
+    os.makedirs(out)
+    os.makedirs(sources)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_mark_many, args=(out, sources, w, 60)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert len(JobManifest(out, "lidar_convert")._entries) == 240
+
+
+def test_mark_done_waits_for_the_file_lock(tmp_path):
+    import threading
+    out = str(tmp_path / "out")
+    source, output = _make_job(tmp_path, "scene")
+    manifest = JobManifest(out, "lidar_convert")
+    writer = threading.Thread(target=manifest.mark_done, args=([source], [output]), daemon=True)
+    with job_manifest._file_lock(manifest.lock_path):
+        writer.start()
+        writer.join(0.3)
+        assert writer.is_alive(), "其他进程持有锁时不能写入日志"
+        assert _journal_lines(out) == []
+    writer.join(5)
+    assert len(_journal_lines(out)) == 1
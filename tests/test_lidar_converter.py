@@ -0,0 +1,203 @@
+import csv
+import glob
+import os
+import random
+import tarfile
+import zipfile
+
+import pytest
+
+from core import lidar_converter
+from core.archive_reader import vsi_path
+from core.lidar_converter import convert_all_lidar_folders, merge_csv_to_txt
+from core.point_cache import load_point_cache, read_point_lines
+
+HEADER = ["delta_time", "lat_ph", "lon_ph", "h_ph", "classification", "signal_conf_ph", "beam_strength", "quality_ph"]
+
+
+def _reference_merge(folder_path, output_file):
+    """原始的逐行实现（固定默认筛选条件），作为输出结果的基准；文件按名称排序，与现在的合并顺序一致"""
+    all_points = []
+    for csv_file in sorted(glob.glob(os.path.join(folder_path, "*.csv"))):
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            csv_reader = csv.reader(f)
+            header = next(csv_reader)
+            lon_idx = header.index('lon_ph')
+            lat_idx = header.index('lat_ph')
+            h_idx = header.index('h_ph')
+            class_idx = header.index('classification')
+            signal_conf_idx = header.index('signal_conf_ph')
+            beam_strength_idx = header.index('beam_strength')
+            for row in csv_reader:
+                if len(row) > max(lon_idx, lat_idx, h_idx, class_idx, signal_conf_idx, beam_strength_idx):
+                    if (row[beam_strength_idx] == "strong" and
+                            int(row[signal_conf_idx]) > 2 and
+                            int(row[class_idx]) == 1):
+                        all_points.append((row[lat_idx], row[lon_idx], row[h_idx]))
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"{len(all_points)}\n")
+        for i, (lat, lon, height) in enumerate(all_points):
+            f.write(f"{i+1}\t{lat}\t{lon}\t{height}\n")
+
+
+def _rows(rng, count):
+    return [[
+        f"{rng.random() * 1000:.6f}",
+        f"{rng.uniform(-60, 60):.8f}",
+        f"{rng.uniform(-180, 180):.8f}",
+        f"{rng.uniform(-50, 3000):.3f}",
+        str(rng.choice([0, 1, 1, 2])),
+        str(rng.randint(0, 4)),
+        rng.choice(["strong", "weak", "strong_x"]),
+        str(rng.randint(0, 3)),
+    ] for _ in range(count)]
+
+
+def _write_csv(path, rows, newline="\n", blank_at=(), ragged_at=()):
+    lines = [",".join(HEADER)]
+    for i, row in enumerate(rows):
+        if i in blank_at:
+            lines.append("")
+        if i in ragged_at:
+            # 字段数不一致的行：偶数行多一列且满足筛选条件；奇数行在波束列之前截断，
+            # 但含有 "strong" 字样，通过子串预筛后快速路径解析出错，回退逐行解析并跳过该行
+            row = row[:4] + ["1", "3", "strong", "0", "extra"] if i % 2 == 0 else row[:3] + ["strong"]
+        lines.append(",".join(row))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(newline.join(lines) + newline)
+
+
+def _make_folder(tmp_path, variant, files=3, rows=400):
+    rng = random.Random(variant)
+    folder = tmp_path / "scene"
+    folder.mkdir()
+    for k in range(files):
+        kwargs = {
+            "clean": {},
+            "crlf": {"newline": "\r\n"},
+            "blank": {"blank_at": {rows // 2, rows - 1}},
+            "ragged": {"ragged_at": {rows // 2, rows // 2 + 1, rows - 2}},
+            "mixed": {"newline": "\r\n", "blank_at": {rows - 5}, "ragged_at": {rows - 10, rows - 9}},
+        }[variant]
+        _write_csv(folder / f"part_{k}.csv", _rows(rng, rows), **kwargs)
+    return folder
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+VARIANTS = ["clean", "crlf", "blank", "ragged", "mixed"]
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("streaming", [False, True])
+def test_merge_matches_row_loop(tmp_path, variant, streaming):
+    folder = _make_folder(tmp_path, variant)
+    _reference_merge(str(folder), str(tmp_path / "expected.txt"))
+    merge_csv_to_txt(str(folder), str(tmp_path / "actual.txt"), write_cache=False, streaming=streaming)
+    assert _read(tmp_path / "actual.txt") == _read(tmp_path / "expected.txt")
+
+
+@pytest.mark.parametrize("variant", ["ragged", "mixed"])
+def test_fallback_after_emitted_chunks(tmp_path, monkeypatch, variant):
+    # 小块读取：快速路径先返回若干块，遇到字段数不一致的行后回退逐行解析，已返回的点不能重复
+    monkeypatch.setattr(lidar_converter, "READ_CHUNK_BYTES", 2048)
+    monkeypatch.setattr(lidar_converter, "READ_CHUNK_ROWS", 50)
+    skips = []
+    filter_rows = lidar_converter._filter_csv_rows
+
+    def spy(csv_file, filters, skip=0, opener=None):
+        skips.append(skip)
+        return filter_rows(csv_file, filters, skip, opener)
+
+    monkeypatch.setattr(lidar_converter, "_filter_csv_rows", spy)
+    folder = _make_folder(tmp_path, variant)
+    _reference_merge(str(folder), str(tmp_path / "expected.txt"))
+    merge_csv_to_txt(str(folder), str(tmp_path / "actual.txt"), write_cache=False, streaming=True)
+    assert _read(tmp_path / "actual.txt") == _read(tmp_path / "expected.txt")
+    assert any(skips), "快速路径应在返回部分点之后才回退"
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_cache_offsets_point_at_lines(tmp_path, streaming):
+    folder = _make_folder(tmp_path, "mixed")
+    output = str(tmp_path / "points.txt")
+    merge_csv_to_txt(str(folder), output, streaming=streaming)
+
+    cache = load_point_cache(output)
+    assert cache is not None
+    with open(output, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    assert int(lines[0]) == len(cache) == len(lines) - 1
+    assert read_point_lines(output, cache, list(range(len(cache)))) == lines[1:]
+    fields = [line.split("\t") for line in lines[1:]]
+    assert cache["lat"].tolist() == [float(p[1]) for p in fields]
+    assert cache["lon"].tolist() == [float(p[2]) for p in fields]
+    assert cache["h"].tolist() == [float(p[3]) for p in fields]
+
+
+def test_streaming_and_memory_caches_match(tmp_path):
+    folder = _make_folder(tmp_path, "blank")
+    merge_csv_to_txt(str(folder), str(tmp_path / "memory.txt"))
+    merge_csv_to_txt(str(folder), str(tmp_path / "stream.txt"), streaming=True)
+    assert _read(tmp_path / "memory.txt") == _read(tmp_path / "stream.txt")
+    assert (load_point_cache(str(tmp_path / "memory.txt")).tolist()
+            == load_point_cache(str(tmp_path / "stream.txt")).tolist())
+
+
+@pytest.mark.parametrize("suffix, mode", [(".zip", None), (".tar.gz", "w:gz"), (".tar", "w")])
+def test_archive_member_folder_matches_extracted(tmp_path, suffix, mode):
+    folder = _make_folder(tmp_path, "mixed")
+    archive = str(tmp_path / f"scene{suffix}")
+    names = sorted(os.listdir(folder))
+    if mode is None:
+        with zipfile.ZipFile(archive, "w") as zf:
+            for name in names:
+                zf.write(folder / name, f"scene/data/{name}")
+    else:
+        with tarfile.open(archive, mode) as tf:
+            for name in names:
+                tf.add(str(folder / name), f"scene/data/{name}")
+
+    _reference_merge(str(folder), str(tmp_path / "expected.txt"))
+    merge_csv_to_txt(vsi_path(archive, "scene/data"), str(tmp_path / "actual.txt"), write_cache=False)
+    assert _read(tmp_path / "actual.txt") == _read(tmp_path / "expected.txt")
+
+
+def test_compressed_tar_is_read_in_one_pass(tmp_path, monkeypatch):
+    # 同一 tar.gz 内的多个目录合成一个任务，成员索引的读取次数与目录数无关
+    extracted = tmp_path / "extracted"
+    archive = str(tmp_path / "input" / "batch.tar.gz")
+    (tmp_path / "input").mkdir()
+    with tarfile.open(archive, "w:gz") as tf:
+        for k, variant in enumerate(VARIANTS * 2):
+            (tmp_path / f"src{k}").mkdir()
+            folder = _make_folder(tmp_path / f"src{k}", variant, files=2, rows=100)
+            target = extracted / f"batch_beam{k}"
+            target.mkdir(parents=True)
+            for name in sorted(os.listdir(folder)):
+                (target / name).write_bytes((folder / name).read_bytes())
+                tf.add(str(folder / name), f"batch/beam{k}/{name}")
+
+    calls = []
+    getmembers = tarfile.TarFile.getmembers
+
+    def spy(self):
+        calls.append(self.name)
+        return getmembers(self)
+
+    monkeypatch.setattr(tarfile.TarFile, "getmembers", spy)
+    output = tmp_path / "output"
+    output.mkdir()
+    assert convert_all_lidar_folders(str(tmp_path / "input"), str(output), lambda _: None, use_processes=False,
+                                     write_cache=False, incremental=False) == 0
+    assert len(calls) <= 2
+
+    names = sorted(os.listdir(extracted))
+    assert sorted(f for f in os.listdir(output) if f.endswith(".txt")) == [f"{name}.txt" for name in names]
+    for name in names:
+        _reference_merge(str(extracted / name), str(tmp_path / "expected.txt"))
+        assert _read(output / f"{name}.txt") == _read(tmp_path / "expected.txt")
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.lidar_filter import (DEFAULT_FILTERS, compile_filters, format_filter_spec, parse_filter_spec, rule_mask,
+                               rule_match)
+
+
+@pytest.mark.parametrize("filters", [
+    DEFAULT_FILTERS,
+    [("classification", "in", [1, 2]), ("beam_strength", "!=", "weak")],
+    [("signal_conf_ph", ">=", 2.5), ("quality_ph", "not in", [3, 4]), ("h_ph", "<", -10)],
+])
+def test_format_parse_round_trip(filters):
+    assert parse_filter_spec(format_filter_spec(filters)) == filters
+
+
+def test_parse_spec_values():
+    assert parse_filter_spec("beam_strength == strong; signal_conf_ph > 2\nclassification in 1, 2") == [
+        ("beam_strength", "==", "strong"),
+        ("signal_conf_ph", ">", 2),
+        ("classification", "in", [1, 2]),
+    ]
+    # 带引号的值始终为字符串，多个空格的 not in 归一化
+    assert parse_filter_spec("classification == '1'; beam not   in a,b") == [
+        ("classification", "==", "1"),
+        ("beam", "not in", ["a", "b"]),
+    ]
+
+
+@pytest.mark.parametrize("text", ["beam_strength", "beam_strength > strong", "== 1"])
+def test_parse_spec_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_filter_spec(text)
+
+
+def test_compile_orders_string_rules_first():
+    header = ["classification", "signal_conf_ph", "beam_strength", "h_ph"]
+    str_rules, num_rules = compile_filters(DEFAULT_FILTERS + [("h_ph", ">", 0.5)], header)
+    assert str_rules == [(2, "==", "strong", None)]
+    assert num_rules == [(1, ">", 2, int), (0, "==", 1, int), (3, ">", 0.5, float)]
+
+
+@pytest.mark.parametrize("op, value", [
+    ("==", 3), ("!=", 3), (">", 2), (">=", 2), ("<", 4), ("<=", 4), ("in", [1, 4]), ("not in", [1, 4]),
+])
+def test_rule_mask_matches_rule_match(op, value):
+    fields = ["0", "1", "2", "3", "4", "5"]
+    expected = [rule_match(f, op, value, int) for f in fields]
+    numbers = np.array([int(f) for f in fields])
+    assert rule_mask(numbers, op, value).tolist() == expected
+    assert rule_mask(pd.Series(numbers), op, value).tolist() == expected
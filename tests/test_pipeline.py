@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("osgeo")
+pytest.importorskip("rarfile")
+
+from core import pipeline  # noqa: E402
+from core.pipeline import _Feed  # noqa: E402
+
+
+def _pending():
+    future = Future()
+    return future, (lambda: future)
+
+
+def _drain(feed, items):
+    for item in feed:
+        items.append(item)
+
+
+def test_submit_blocks_until_downstream_takes_results():
+    feed = _Feed(2)
+    first, submit_first = _pending()
+    second, submit_second = _pending()
+    feed.submit("a", submit_first)
+    feed.submit("b", submit_second)
+
+    third, submit_third = _pending()
+    blocked = threading.Thread(target=feed.submit, args=("c", submit_third), daemon=True)
+    blocked.start()
+    time.sleep(0.2)
+    assert blocked.is_alive(), "两个名额都被占用时第三次提交应等待"
+
+    # 任务完成但结果尚未被下游取走时名额仍被占用
+    first.set_result(True)
+    time.sleep(0.2)
+    assert blocked.is_alive()
+
+    items = iter(feed)
+    assert next(items) == ("a", True)
+    blocked.join(2)
+    assert not blocked.is_alive()
+
+    second.set_exception(RuntimeError("boom"))
+    third.set_result(True)
+    feed.close()
+    assert list(items) == [("b", False), ("c", True)]
+
+
+def test_close_waits_for_pending_results():
+    feed = _Feed(4)
+    future, submit = _pending()
+    feed.submit("a", submit)
+    feed.put("b", True)
+    feed.close()
+
+    items = []
+    consumer = threading.Thread(target=_drain, args=(feed, items), daemon=True)
+    consumer.start()
+    time.sleep(0.2)
+    assert consumer.is_alive(), "未完成的任务入队前不能结束迭代"
+    future.set_result(False)
+    consumer.join(2)
+    assert items == [("b", True), ("a", False)]
+
+
+def test_failed_submit_returns_its_slot():
+    feed = _Feed(1)
+
+    def broken():
+        raise OSError("pool is gone")
+
+    for _ in range(3):
+        with pytest.raises(OSError):
+            feed.submit("x", broken)
+    feed.put("y", False)
+    feed.close()
+    assert list(feed) == [("y", False)]
+
+
+class _BrokenManifest:
+    def mark_done(self, inputs, outputs):
+        raise OSError("No space left on device")
+
+
+def test_process_stage_survives_manifest_write_failure(tmp_path):
+    # 清单写入失败不能让处理阶段退出，否则上游占满名额后一直等待
+    context = {
+        "dirs": {name: str(tmp_path / name) for name in ("lidar_convert", "orthorectified")},
+        "manifests": {"unpack": _BrokenManifest()},
+        "log_func": lambda _: None,
+        "failed": {"process": 0},
+        "outputs": set(),
+        "dem_path": None,
+    }
+    unpacked, processed = _Feed(2), _Feed(2)
+
+    def unpack():
+        for i in range(6):
+            scene = tmp_path / f"scene{i}"
+            scene.mkdir()
+            unpacked.put((str(tmp_path / f"scene{i}.zip"), str(scene), True), True)
+        unpacked.close()
+
+    threads = [threading.Thread(target=unpack, daemon=True),
+               threading.Thread(target=pipeline._process_stage, args=(unpacked, processed, context), daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert list(processed) == []
+    assert context["failed"]["process"] == 6
+
+
+def test_no_extract_still_unpacks_compressed_tars(tmp_path):
+    # 直读模式下 zip 与未压缩的 tar 不解压；tar.gz 逐个目录直读时每次都要从头解压，仍先解压
+    import tarfile
+    import zipfile
+    from core.archive_reader import vsi_path
+    from core.job_manifest import JobManifest
+
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    (tmp_path / "x.csv").write_text("a,b\n", encoding="utf-8")
+    with zipfile.ZipFile(inputs / "a.zip", "w") as zf:
+        zf.write(tmp_path / "x.csv", "a/x.csv")
+    for name, mode in (("b.tar", "w"), ("c.tar.gz", "w:gz")):
+        with tarfile.open(inputs / name, mode) as tf:
+            tf.add(str(tmp_path / "x.csv"), "x.csv")
+
+    unpack_dir = str(tmp_path / "unpack")
+    context = {
+        "dirs": {"unpack": unpack_dir},
+        "manifests": {"unpack": JobManifest(unpack_dir, "unpack", {"include": pipeline.PIPELINE_INCLUDE})},
+        "incremental": True,
+        "extract": False,
+        "log_func": lambda _: None,
+        "failed": {"unpack": 0},
+    }
+    unpacked = _Feed(8)
+    pipeline._unpack_stage(str(inputs), unpacked, context)
+    unpacked.close()
+    items = sorted(list(unpacked))
+    assert [tag for tag, _ in items] == [
+        (str(inputs / "a.zip"), vsi_path(str(inputs / "a.zip")), False),
+        (str(inputs / "b.tar"), vsi_path(str(inputs / "b.tar")), False),
+        (str(inputs / "c.tar.gz"), str(tmp_path / "unpack" / "c"), True),
+    ]
+    assert all(ok for _, ok in items)
+    assert (tmp_path / "unpack" / "c" / "x.csv").exists()
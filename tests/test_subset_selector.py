@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+shapely = pytest.importorskip("shapely")
+pytest.importorskip("osgeo")
+
+from core.subset_selector import select_subset  # noqa: E402
+
+
+def _random_boxes(count, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(0, 90, count), rng.uniform(0, 90, count)
+    size = rng.uniform(5, 15, count)
+    return list(shapely.box(x, y, x + size, y + size))
+
+
+def test_every_selected_scene_adds_coverage():
+    # 目标区域大于影像范围之和，覆盖率目标永远达不到；不设最小新增比例时也不能选入被完全覆盖的影像
+    footprints = _random_boxes(300)
+    target = shapely.box(-50, -50, 150, 150)
+    indices, coverage = select_subset(footprints, target, coverage_goal=1.0, min_gain_fraction=0)
+
+    assert len(indices) < len(footprints)
+    union = shapely.union_all([footprints[i] for i in indices])
+    assert coverage == pytest.approx(shapely.area(union) / shapely.area(target))
+    assert shapely.area(union) == pytest.approx(shapely.area(shapely.union_all(footprints)))
+    # 按选取顺序，每景都在已选影像之外新增了覆盖
+    areas = [shapely.area(shapely.union_all([footprints[i] for i in indices[:n]])) for n in range(1, len(indices) + 1)]
+    assert all(b > a for a, b in zip(areas, areas[1:]))
+
+
+def test_reaches_goal_with_few_scenes():
+    footprints = [shapely.box(0, 0, 10, 10), shapely.box(0, 0, 5, 5), shapely.box(10, 0, 20, 10)]
+    indices, coverage = select_subset(footprints, shapely.box(0, 0, 20, 10))
+    assert sorted(indices) == [0, 2]
+    assert coverage == pytest.approx(1.0)
@@ -0,0 +1,27 @@
+import tools
+
+
+def _write_points(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{count}\n")
+        f.writelines(f"{i + 1}\t{30 + i / count:.6f}\t{110 + (i * 7 % count) / count:.6f}\t1.0\n" for i in range(count))
+
+
+def test_exit_code_reflects_failed_items(tmp_path):
+    inputs, output = tmp_path / "in", tmp_path / "out"
+    inputs.mkdir()
+    _write_points(inputs / "good.txt", 500)
+    argv = ["downsample", str(inputs), str(output), "--count", "50", "--threads", "--seed", "1"]
+    assert tools.main(argv) == 0
+
+    # 无法按 UTF-8 读取的文件抽稀失败，其余文件照常处理，整体以非零退出码结束
+    (inputs / "bad.txt").write_bytes(b"2\n\xff\xfe\t2\t3\t4\n")
+    assert tools.main(argv + ["--no-incremental"]) == 1
+    assert (output / "good.txt").exists()
+
+
+def test_exit_code_on_lidar_convert_failure(tmp_path):
+    inputs, output = tmp_path / "in", tmp_path / "out"
+    (inputs / "scene").mkdir(parents=True)
+    (inputs / "scene" / "part.csv").write_text("lat_ph,lon_ph\n1,2\n", encoding="utf-8")
+    assert tools.main(["lidar-convert", str(inputs), str(output), "--threads"]) == 1
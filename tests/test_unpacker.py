@@ -0,0 +1,147 @@
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("rarfile")
+
+from core import unpacker  # noqa: E402
+from core.unpacker import _balance, _member_path, plan_archive  # noqa: E402
+
+MEMBERS = {
+    "scene/data/part_0.csv": b"a" * 5000,
+    "scene/data/part_1.csv": b"b" * 3000,
+    "scene/image.tif": b"c" * 8000,
+    "scene/image_rpc.txt": b"d" * 100,
+    "scene/readme.md": b"e" * 50,
+}
+
+
+def _make_zip(path, members=MEMBERS):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def _run(tasks):
+    return all(func(*args) for _, func, args in tasks)
+
+
+def _tree(folder):
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, folder).replace(os.sep, "/")] = f.read()
+    return files
+
+
+def test_balance_assigns_every_member_once():
+    members = [(size, f"m{size}") for size in (90, 70, 50, 40, 30, 20, 10, 5)]
+    groups = _balance(members, 3)
+    assert sorted(m for g in groups for m in g) == sorted(m for _, m in members)
+    sizes = {m: s for s, m in members}
+    totals = sorted(sum(sizes[m] for m in g) for g in groups)
+    assert totals[-1] - totals[0] <= max(sizes.values())
+
+
+def test_large_zip_is_split_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(unpacker, "PARALLEL_ARCHIVE_BYTES", 0)
+    archive = _make_zip(tmp_path / "scene.zip")
+    target = str(tmp_path / "out" / "scene")
+    tasks, current = plan_archive(archive, target, 3, log_func=lambda _: None)
+    assert len(tasks) == 3 and current == 0
+    assert sum(size for size, _, _ in tasks) == sum(len(d) for d in MEMBERS.values())
+    assert _run(tasks)
+    assert _tree(target) == MEMBERS
+
+
+def test_member_paths_stay_inside_target(tmp_path):
+    target = str(tmp_path)
+    assert _member_path(target, "../../etc/passwd") == os.path.join(target, "etc", "passwd")
+    assert _member_path(target, "C:\\win\\a.txt") == os.path.join(target, "win", "a.txt")
+    with pytest.raises(ValueError):
+        _member_path(target, "../")
+
+
+@pytest.mark.parametrize("include, exclude, expected", [
+    (None, None, set(MEMBERS)),
+    (["*.csv"], None, {"scene/data/part_0.csv", "scene/data/part_1.csv"}),
+    (["scene/data/*"], ["*_1.csv"], {"scene/data/part_0.csv"}),
+    (["*.TIF", "*_rpc.txt"], None, {"scene/image.tif", "scene/image_rpc.txt"}),
+    (None, ["*.md", "*.csv"], {"scene/image.tif", "scene/image_rpc.txt"}),
+])
+def test_include_exclude_patterns(tmp_path, include, exclude, expected):
+    archive = _make_zip(tmp_path / "scene.zip")
+    target = str(tmp_path / "out")
+    tasks, _ = plan_archive(archive, target, 1, include, exclude, log_func=lambda _: None)
+    assert _run(tasks)
+    assert set(_tree(target)) == expected
+
+
+def test_current_members_are_not_extracted_again(tmp_path):
+    archive = _make_zip(tmp_path / "scene.zip")
+    target = str(tmp_path / "out")
+    assert _run(plan_archive(archive, target, 1, log_func=lambda _: None)[0])
+
+    # 大小相同但内容不同的文件按 CRC 识别为需重新解压
+    with open(os.path.join(target, "scene", "image.tif"), "wb") as f:
+        f.write(b"x" * 8000)
+    os.remove(os.path.join(target, "scene", "readme.md"))
+    tasks, current = plan_archive(archive, target, 1, log_func=lambda _: None)
+    assert current == 3
+    assert sorted(tasks[0][2][2]) == ["scene/image.tif", "scene/readme.md"]
+    assert _run(tasks)
+    assert _tree(target) == MEMBERS
+    assert plan_archive(archive, target, 1, log_func=lambda _: None) == ([], 5)
+
+
+def test_tar_skips_members_with_same_size_and_mtime(tmp_path):
+    import tarfile
+    source = tmp_path / "src"
+    for name, data in MEMBERS.items():
+        path = source / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    archive = str(tmp_path / "scene.tar.gz")
+    with tarfile.open(archive, "w:gz") as tf:
+        tf.add(str(source / "scene"), "scene")
+
+    target = str(tmp_path / "out")
+    tasks, _ = plan_archive(archive, target, 4, ["*.csv"], log_func=lambda _: None)
+    assert len(tasks) == 1 and _run(tasks)
+    assert set(_tree(target)) == {"scene/data/part_0.csv", "scene/data/part_1.csv"}
+
+    kept = os.path.join(target, "scene", "data", "part_0.csv")
+    stale = os.path.join(target, "scene", "data", "part_1.csv")
+    with open(stale, "wb") as f:
+        f.write(b"changed")
+    # 大小与修改时间不变时视为已是最新，内容不再比较
+    mtime = os.stat(kept).st_mtime
+    with open(kept, "wb") as f:
+        f.write(b"z" * len(MEMBERS["scene/data/part_0.csv"]))
+    os.utime(kept, (mtime, mtime))
+
+    assert _run(plan_archive(archive, target, 4, ["*.csv"], log_func=lambda _: None)[0])
+    assert _tree(target)["scene/data/part_0.csv"] == b"z" * len(MEMBERS["scene/data/part_0.csv"])
+    assert _tree(target)["scene/data/part_1.csv"] == MEMBERS["scene/data/part_1.csv"]
+
+
+def test_unpack_all_skips_unchanged_archives(tmp_path):
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    _make_zip(inputs / "a.zip")
+    _make_zip(inputs / "b.zip", {"b/x.csv": b"1,2,3\n"})
+    (inputs / "broken.zip").write_bytes(b"not an archive")
+    output = str(tmp_path / "out")
+
+    logs = []
+    assert unpacker.unpack_all(str(inputs), output, logs.append, include=["*.csv"]) == 1
+    assert set(_tree(output + "/a")) == {"scene/data/part_0.csv", "scene/data/part_1.csv"}
+    assert _tree(output + "/b") == {"b/x.csv": b"1,2,3\n"}
+
+    logs.clear()
+    assert unpacker.unpack_all(str(inputs), output, logs.append, include=["*.csv"]) == 1
+    assert "⏭️ 跳过 2 个未变化的压缩文件" in logs
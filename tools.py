@@ -0,0 +1,132 @@
+# 命令行批处理入口：python -m tools <子命令> ...
+# 不导入 Qt/QGIS，各子命令用到的 core 模块（numpy、pandas、GDAL 等）在执行时才导入，启动与 --help 均很快
+import argparse
+import os
+import sys
+import time
+
+
+def _log_func(args):
+    """指定 --log-dir 时与界面一致写入 log_*.txt（同时输出到控制台），否则只输出到控制台"""
+    if not args.log_dir:
+        return print, None
+    from core.log_manager import LogManager
+    logger = LogManager(args.log_dir)
+    return logger.log, logger
+
+
+def cmd_unpack(args, log_func, logger):
+    from core.unpacker import unpack_all
+    return unpack_all(args.input, args.output, log_func, incremental=args.incremental,
+                      include=args.include, exclude=args.exclude)
+
+
+def cmd_lidar_convert(args, log_func, logger):
+    from core.lidar_converter import convert_all_lidar_folders
+    from core.lidar_filter import parse_filter_spec
+    filters = parse_filter_spec(args.filters) if args.filters is not None else None
+    return convert_all_lidar_folders(args.input, args.output, log_func, logger, use_processes=not args.threads,
+                                     write_cache=args.cache, streaming=args.streaming, filters=filters,
+                                     incremental=args.incremental)
+
+
+def cmd_downsample(args, log_func, logger):
+    from core.downsampler import downsample_all
+    return downsample_all(args.input, args.output, args.count, log_func, logger, mode=args.mode, seed=args.seed,
+                          tolerance=args.tolerance, use_processes=not args.threads, incremental=args.incremental)
+
+
+def cmd_ortho(args, log_func, logger):
+    from core.gdal_profile import ResourceProfile
+    from core.orthorectifier import orthorectify_all
+    # 未指定的项沿用按本机 CPU 核数与可用内存推算的值
+    auto = ResourceProfile.auto()
+    profile = ResourceProfile(*(getattr(auto, name) if getattr(args, name) is None else getattr(args, name)
+                                for name in ("concurrent_warps", "warp_threads", "cache_mb", "warp_memory_mb")))
+    tiled = {"auto": None, "on": True, "off": False}[args.tiled]
+    _, failed = orthorectify_all(args.input, args.output, log_func, incremental=args.incremental, tiled=tiled,
+                                 dem_path=args.dem, profile=profile, preview=args.preview,
+                                 preview_images=args.preview_images)
+    return failed
+
+
+def cmd_pipeline(args, log_func, logger):
+    from core.pipeline import run_pipeline
+    _, failed = run_pipeline(args.input, args.output, log_func, logger, target_count=args.count, dem_path=args.dem,
+                             incremental=args.incremental, extract=not args.no_extract)
+    return failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m tools", description="遥感影像与点云批处理（无界面）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, func, help_text):
+        sub = commands.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("input", help="输入路径")
+        sub.add_argument("output", help="输出路径")
+        sub.add_argument("--no-incremental", dest="incremental", action="store_false",
+                         help="忽略作业清单，全部重新处理")
+        sub.add_argument("--log-dir", help="日志保存目录，与界面工程目录下的 log_*.txt 格式一致")
+        sub.set_defaults(func=func)
+        return sub
+
+    sub = add_command("unpack", cmd_unpack, "批量解压")
+    sub.add_argument("--include", nargs="+", metavar="GLOB", help="只解压匹配的成员，如 *.csv *.tif")
+    sub.add_argument("--exclude", nargs="+", metavar="GLOB", help="不解压匹配的成员")
+
+    sub = add_command("lidar-convert", cmd_lidar_convert, "激光格式转换（CSV → txt）")
+    sub.add_argument("--filters", help='筛选条件，如 "beam_strength == strong; signal_conf_ph > 2"，默认使用内置条件')
+    sub.add_argument("--streaming", action="store_true", help="流式写出，内存只与单块数据量相关")
+    sub.add_argument("--no-cache", dest="cache", action="store_false", help="不写二进制坐标缓存")
+    sub.add_argument("--threads", action="store_true", help="使用线程池而非进程池")
+
+    sub = add_command("downsample", cmd_downsample, "点云抽稀")
+    sub.add_argument("--count", type=int, required=True, help="目标点数")
+    # 取值与 core.downsampler 中的 MODE_* 常量一致，此处不导入以保持启动速度
+    sub.add_argument("--mode", choices=("memory", "stream", "adaptive"), default="memory", help="抽稀模式")
+    sub.add_argument("--seed", type=int, help="随机种子，留空则每次随机")
+    sub.add_argument("--tolerance", type=float, default=0.01, help="自适应模式的点数容差")
+    sub.add_argument("--threads", action="store_true", help="使用线程池而非进程池")
+
+    sub = add_command("ortho", cmd_ortho, "RPC 影像正射")
+    sub.add_argument("--dem", help="DEM 文件，按每景范围裁剪后参与正射")
+    sub.add_argument("--tiled", choices=("auto", "on", "off"), default="auto", help="大影像分块并行正射")
+    sub.add_argument("--preview", action="store_true", help="只计算各景范围，输出 preview/footprints.shp")
+    sub.add_argument("--preview-images", action="store_true", help="预览时另生成降采样正射影像")
+    sub.add_argument("--concurrent-warps", type=int, help="同时正射的景数，默认按 CPU 核数与内存自动分配")
+    sub.add_argument("--warp-threads", type=int, help="每景 Warp 线程数")
+    sub.add_argument("--cache-mb", type=int, help="每景块缓存（MB）")
+    sub.add_argument("--warp-memory-mb", type=int, help="每景 Warp 缓冲（MB）")
+
+    sub = add_command("pipeline", cmd_pipeline, "流水线处理：解压 → 激光转换 / 正射 → 抽稀")
+    sub.add_argument("--count", type=int, help="抽稀点数，留空则不抽稀")
+    sub.add_argument("--dem", help="DEM 文件")
+    sub.add_argument("--no-extract", action="store_true", help="zip 与未压缩的 tar 包不解压，直接从包内读取")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    log_func, logger = _log_func(args)
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        # 各子命令返回失败的条目数，有失败时以非零退出码结束，便于调度系统发现
+        failed = args.func(args, log_func, logger)
+        log_func(f"⏱️ 总耗时 {time.perf_counter() - start:.2f}s")
+        if failed:
+            log_func(f"❌ {failed} 项处理失败")
+            return 1
+        return 0
+    except Exception as e:
+        log_func(f"❌ 任务失败: {e}")
+        return 1
+    finally:
+        if logger:
+            logger.flush()
+
+
+if __name__ == "__main__":
+    # 进程池以 spawn 方式启动子进程时会重新导入本模块，入口必须放在此判断之后
+    sys.exit(main())
@@ -1,22 +1,16 @@
 import os
 
-from PyQt5.QtGui import QCloseEvent, QPainter
+from PyQt5.QtGui import QCloseEvent
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QListWidget, QTextEdit, QLabel,
     QVBoxLayout, QHBoxLayout, QAction, QFileDialog, QMessageBox, QGroupBox, QListWidgetItem
 )
 from PyQt5.QtCore import Qt, QThread
 
-from core.layer_batch_loader import load_layers_batch
-from core.layer_loader import LayerLoader
 from core.log_manager import LogManager
 from core.thread_manager import ThreadManager
-from widgets.downsample_dialog import DownsampleDialog
-from widgets.map_canvas import MapCanvas
-from widgets.orthorectify_dialog import OrthorectifyDialog
-from widgets.unpack_dialog import UnpackDialog
-from widgets.lidar_convert_dialog import LidarConvertDialog
-from qgis.core import QgsRasterLayer, QgsProject
+
+# 各功能对话框及其依赖的 GDAL、rarfile、QGIS 等模块在首次使用时才导入，主窗口先显示
 
 
 class MainWindow(QMainWindow):
@@ -47,12 +41,13 @@ class MainWindow(QMainWindow):
         # 中间地图画布
         canvas_group = QGroupBox("地图显示")
         canvas_layout = QVBoxLayout()
-        self.map_canvas = MapCanvas()
-        self.map_canvas.setCanvasColor(Qt.white)
-        self.map_canvas.setCachingEnabled(True)
-        self.map_canvas.setRenderFlag(True)
-        canvas_layout.addWidget(self.map_canvas)
+        # QGIS 初始化完成后由 init_canvas 替换为地图画布
+        self.map_canvas = None
+        self._canvas_placeholder = QLabel("地图组件加载中…")
+        self._canvas_placeholder.setAlignment(Qt.AlignCenter)
+        canvas_layout.addWidget(self._canvas_placeholder)
         canvas_group.setLayout(canvas_layout)
+        self._canvas_layout = canvas_layout
         main_layout.addWidget(canvas_group)
 
         # 右侧日志输出
@@ -76,6 +71,26 @@ class MainWindow(QMainWindow):
         # 日志
         self.logger = None
 
+    def init_canvas(self):
+        """QGIS 初始化完成后调用：创建地图画布并替换占位标签"""
+        from widgets.map_canvas import MapCanvas
+        self.map_canvas = MapCanvas()
+        self.map_canvas.setCanvasColor(Qt.white)
+        self.map_canvas.setCachingEnabled(True)
+        self.map_canvas.setRenderFlag(True)
+        self._canvas_layout.replaceWidget(self._canvas_placeholder, self.map_canvas)
+        self._canvas_placeholder.deleteLater()
+        self._canvas_placeholder = None
+
+    def _load_layers(self, paths):
+        from core.layer_batch_loader import load_layers_batch
+        load_layers_batch(
+            layer_paths=paths,
+            canvas=self.map_canvas,
+            layer_list_widget=self.layer_list,
+            log_func=self.log
+        )
+
     def _create_menus(self):
         menu_bar = self.menuBar()
 
@@ -91,6 +106,11 @@ class MainWindow(QMainWindow):
         action_unpack.triggered.connect(self.show_unpack_dialog)
         self.menu_file.addAction(action_unpack)
 
+        # 流水线处理：解压后逐景转换/正射、抽稀并注册图层
+        action_pipeline = QAction("流水线处理", self)
+        action_pipeline.triggered.connect(self.show_pipeline_dialog)
+        self.menu_file.addAction(action_pipeline)
+
         # 激光数据处理
         self.menu_lidar = self.menu_file.addMenu("激光处理")
         action_lidar_convert = QAction("激光格式转换", self)
@@ -105,6 +125,21 @@ class MainWindow(QMainWindow):
         action_ortho.triggered.connect(self.show_orthorectify_dialog)
         self.menu_photogrammetry.addAction(action_ortho)
 
+        # 影像边界提取
+        action_boundary = QAction("影像边界提取", self)
+        action_boundary.triggered.connect(self.show_boundary_dialog)
+        self.menu_photogrammetry.addAction(action_boundary)
+
+        # 影像优选子集
+        action_subset = QAction("影像优选子集", self)
+        action_subset.triggered.connect(self.show_subset_dialog)
+        self.menu_photogrammetry.addAction(action_subset)
+
+        # SHP 合并
+        action_merge = QAction("SHP 合并", self)
+        action_merge.triggered.connect(self.show_merge_dialog)
+        self.menu_photogrammetry.addAction(action_merge)
+
     def create_project(self):
         folder = QFileDialog.getExistingDirectory(self, "选择工程文件夹")
         if folder:
@@ -122,9 +157,19 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请先新建工程！")
             return
 
+        from widgets.unpack_dialog import UnpackDialog
         dialog = UnpackDialog(self.project_path, self.log, self)
         dialog.exec_()
 
+    def show_pipeline_dialog(self):
+        if not self.project_path:
+            QMessageBox.warning(self, "提示", "请先新建工程！")
+            return
+
+        from widgets.pipeline_dialog import PipelineDialog
+        dialog = PipelineDialog(self.project_path, self.log, self.load_images, self)
+        dialog.exec_()
+
     def log(self, text):
         self.log_output.append(text)
         self.log_output.verticalScrollBar().setValue(self.log_output.verticalScrollBar().maximum())
@@ -136,6 +181,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请先新建工程！")
             return
 
+        from widgets.lidar_convert_dialog import LidarConvertDialog
         dialog = LidarConvertDialog(self.project_path, self.log, self)
         dialog.exec_()
 
@@ -144,6 +190,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请先新建工程！")
             return
 
+        from widgets.downsample_dialog import DownsampleDialog
         dialog = DownsampleDialog(self.project_path, self.log, self)
         dialog.exec_()
 
@@ -162,15 +209,53 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请先新建工程！")
             return
 
+        from widgets.orthorectify_dialog import OrthorectifyDialog
         dialog = OrthorectifyDialog(
             self.project_path,
             self.log,
-            lambda paths: load_layers_batch(
-                layer_paths=paths,
-                canvas=self.map_canvas,
-                layer_list_widget=self.layer_list,
-                log_func=self.log
-            ),
+            self._load_layers,
+            self
+        )
+        dialog.exec_()
+
+    def show_boundary_dialog(self):
+        if not self.project_path:
+            QMessageBox.warning(self, "提示", "请先新建工程！")
+            return
+
+        from widgets.boundary_dialog import BoundaryDialog
+        dialog = BoundaryDialog(
+            self.project_path,
+            self.log,
+            self._load_layers,
+            self
+        )
+        dialog.exec_()
+
+    def show_subset_dialog(self):
+        if not self.project_path:
+            QMessageBox.warning(self, "提示", "请先新建工程！")
+            return
+
+        from widgets.subset_dialog import SubsetDialog
+        dialog = SubsetDialog(
+            self.project_path,
+            self.log,
+            self._load_layers,
+            self
+        )
+        dialog.exec_()
+
+    def show_merge_dialog(self):
+        if not self.project_path:
+            QMessageBox.warning(self, "提示", "请先新建工程！")
+            return
+
+        from widgets.merge_dialog import MergeDialog
+        dialog = MergeDialog(
+            self.project_path,
+            self.log,
+            self._load_layers,
             self
         )
         dialog.exec_()
@@ -182,6 +267,8 @@ class MainWindow(QMainWindow):
         if visible:
             self.log(f"🔄 开始加载图层：{path}")
 
+            from core.layer_loader import LayerLoader
+
             # 为每个图层单独创建线程和worker并保存引用
             thread = QThread()
             worker = LayerLoader(path)
@@ -203,6 +290,9 @@ class MainWindow(QMainWindow):
             self._remove_layer(item.text())
 
     def update_canvas_layers(self):
+        if self.map_canvas is None:
+            return
+        from qgis.core import QgsProject
         visible_layers = []
         layer_names = [
             self.layer_list.item(i).text()
@@ -218,18 +308,12 @@ class MainWindow(QMainWindow):
         self.map_canvas.refresh()
 
     def _on_layer_loaded(self, layer, extent, item):
+        from qgis.core import QgsProject
+        from core.layer_batch_loader import ensure_pyramids
         QgsProject.instance().addMapLayer(layer)
 
-        # 🧠 构建金字塔（提高加载大图时的滚动/缩放响应速度）
-        try:
-            if layer.dataProvider().supportsPyramids():
-                res = layer.dataProvider().buildPyramid()
-                if not res:
-                    self.log(f"⚠️ 构建金字塔失败：{layer.name()}")
-                else:
-                    self.log(f"📐 已为图层构建金字塔：{layer.name()}")
-        except Exception as e:
-            self.log(f"⚠️ 构建金字塔异常：{e}")
+        # 🧠 构建金字塔（提高加载大图时的滚动/缩放响应速度），已带金字塔的 COG 直接跳过
+        ensure_pyramids(layer, self.log)
 
         # 图层渲染
         current_layers = self.map_canvas.layers()
@@ -242,6 +326,7 @@ class MainWindow(QMainWindow):
         self.log(f"✅ 加载成功：{layer.name()}")
 
     def _remove_layer(self, layer_name):
+        from qgis.core import QgsProject
         for lyr in QgsProject.instance().mapLayers().values():
             if lyr.name() == layer_name:
                 QgsProject.instance().removeMapLayer(lyr.id())
@@ -0,0 +1,92 @@
+import os
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
+    QHBoxLayout, QFileDialog, QMessageBox
+)
+from core.boundary_extractor import extract_boundaries
+from core.task_runner import TaskRunner
+from core.thread_manager import ThreadManager
+
+
+class BoundaryDialog(QDialog):
+    def __init__(self, project_path, log_func, on_result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("影像边界提取")
+
+        self.project_path = project_path
+        self.log_func = log_func
+        self.on_result = on_result
+
+        self.input_edit = QLineEdit(os.path.join(project_path, "orthorectified"))
+        self.output_edit = QLineEdit(os.path.join(project_path, "boundary", "boundaries.shp"))
+
+        btn_input = QPushButton("选择影像路径")
+        btn_output = QPushButton("选择保存文件")
+        btn_run = QPushButton("开始提取")
+
+        btn_input.clicked.connect(self.select_input_path)
+        btn_output.clicked.connect(self.select_output_file)
+        btn_run.clicked.connect(self.start_extract)
+
+        layout = QVBoxLayout()
+        layout.addLayout(self._build_row("影像路径：", self.input_edit, btn_input))
+        layout.addLayout(self._build_row("保存文件：", self.output_edit, btn_output))
+        layout.addWidget(btn_run)
+
+        self.setLayout(layout)
+
+    def _build_row(self, label_text, *widgets):
+        layout = QHBoxLayout()
+        layout.addWidget(QLabel(label_text))
+        for w in widgets:
+            layout.addWidget(w)
+        return layout
+
+    def select_input_path(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择影像文件夹")
+        if folder:
+            self.input_edit.setText(folder)
+
+    def select_output_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "选择保存文件", self.output_edit.text(), "Shapefile (*.shp)")
+        if path:
+            self.output_edit.setText(path)
+
+    def start_extract(self):
+        input_path = self.input_edit.text().strip()
+        output_file = self.output_edit.text().strip()
+
+        if not os.path.isdir(input_path):
+            QMessageBox.warning(self, "错误", "请选择有效的影像路径")
+            return
+        if not output_file.lower().endswith(".shp"):
+            QMessageBox.warning(self, "错误", "保存文件须为 .shp")
+            return
+
+        self.log_func(f"\n=====影像边界提取=====\n影像路径: {input_path}\n保存文件: {output_file}\n")
+
+        parent = self.parent()
+        logger = parent.logger if parent and hasattr(parent, "logger") else None
+
+        # 包装成无参函数以获取结果
+        def wrapper():
+            self.worker.result = extract_boundaries(input_path, output_file, self.log_func, logger)
+
+        self.thread = QThread()
+        self.worker = TaskRunner(wrapper)
+        self.worker.result = None
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(lambda: self.on_result(self.worker.result))
+        self.worker.failed.connect(self.thread.quit)
+        self.worker.failed.connect(lambda msg: QMessageBox.critical(self, "错误", f"任务失败：{msg}"))
+
+        self.thread.start()
+
+        ThreadManager.instance().register(self.thread)
+
+        self.accept()
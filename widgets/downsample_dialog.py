@@ -3,9 +3,9 @@ import os
 from PyQt5.QtCore import QThread
 from PyQt5.QtWidgets import (
     QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
-    QHBoxLayout, QFileDialog, QMessageBox, QSpinBox
+    QHBoxLayout, QFileDialog, QMessageBox, QSpinBox, QComboBox
 )
-from core.downsampler import downsample_all
+from core.downsampler import downsample_all, MODE_MEMORY, MODE_STREAM, MODE_ADAPTIVE
 from core.task_runner import TaskRunner
 from core.thread_manager import ThreadManager
 
@@ -23,6 +23,12 @@ class DownsampleDialog(QDialog):
         self.count_spin = QSpinBox()
         self.count_spin.setRange(1, 10_000_000)
         self.count_spin.setValue(10000)
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("内存模式（速度快）", MODE_MEMORY)
+        self.mode_combo.addItem("流式模式（低内存，适合超大文件）", MODE_STREAM)
+        self.mode_combo.addItem("自适应模式（精确目标点数）", MODE_ADAPTIVE)
+        self.seed_edit = QLineEdit()
+        self.seed_edit.setPlaceholderText("留空则每次随机")
 
         btn_input = QPushButton("选择输入路径")
         btn_output = QPushButton("选择保存路径")
@@ -36,6 +42,8 @@ class DownsampleDialog(QDialog):
         layout.addLayout(self._build_row("待抽稀路径：", self.input_edit, btn_input))
         layout.addLayout(self._build_row("保存路径：", self.output_edit, btn_output))
         layout.addLayout(self._build_row("抽稀点数：", self.count_spin))
+        layout.addLayout(self._build_row("抽稀模式：", self.mode_combo))
+        layout.addLayout(self._build_row("随机种子：", self.seed_edit))
         layout.addWidget(btn_run)
 
         self.setLayout(layout)
@@ -65,6 +73,8 @@ class DownsampleDialog(QDialog):
         input_path = self.input_edit.text().strip()
         output_path = self.output_edit.text().strip()
         count = self.count_spin.value()
+        mode = self.mode_combo.currentData()
+        seed_text = self.seed_edit.text().strip()
 
         if not os.path.isdir(input_path):
             QMessageBox.warning(self, "错误", "请选择有效的输入路径")
@@ -72,16 +82,20 @@ class DownsampleDialog(QDialog):
         if not output_path:
             QMessageBox.warning(self, "错误", "请选择有效的保存路径")
             return
+        if seed_text and not seed_text.isdigit():
+            QMessageBox.warning(self, "错误", "随机种子必须为非负整数")
+            return
+        seed = int(seed_text) if seed_text else None
 
         os.makedirs(output_path, exist_ok=True)
-        self.log_func(f"\n=====点云抽稀=====\n输入路径: {input_path}\n输出路径: {output_path}\n目标点数: {count}\n")
+        self.log_func(f"\n=====点云抽稀=====\n输入路径: {input_path}\n输出路径: {output_path}\n目标点数: {count}\n抽稀模式: {self.mode_combo.currentText()}\n随机种子: {seed}\n")
 
         parent = self.parent()
         logger = parent.logger if parent and hasattr(parent, "logger") else None
 
         # ⏱ 启动线程封装任务
         self.thread = QThread()
-        self.worker = TaskRunner(downsample_all, input_path, output_path, count, self.log_func, logger)
+        self.worker = TaskRunner(downsample_all, input_path, output_path, count, self.log_func, logger, mode=mode, seed=seed)
         self.worker.moveToThread(self.thread)
 
         self.thread.started.connect(self.worker.run)
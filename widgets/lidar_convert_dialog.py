@@ -1,9 +1,10 @@
 import os
 from PyQt5.QtWidgets import (
     QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
-    QHBoxLayout, QFileDialog, QMessageBox
+    QHBoxLayout, QFileDialog, QMessageBox, QCheckBox
 )
 from core.lidar_converter import convert_all_lidar_folders
+from core.lidar_filter import DEFAULT_FILTERS, format_filter_spec, parse_filter_spec
 from PyQt5.QtCore import QThread
 from core.task_runner import TaskRunner
 from core.thread_manager import ThreadManager
@@ -19,6 +20,11 @@ class LidarConvertDialog(QDialog):
 
         self.input_edit = QLineEdit()
         self.output_edit = QLineEdit(os.path.join(project_path, "lidar_convert"))
+        self.filter_edit = QLineEdit(format_filter_spec(DEFAULT_FILTERS))
+        self.filter_edit.setToolTip("格式：列名 运算符 值，多个条件以分号分隔；运算符支持 == != > >= < <= in not in")
+        self.cache_check = QCheckBox("同时生成二进制缓存（加速后续抽稀）")
+        self.cache_check.setChecked(True)
+        self.streaming_check = QCheckBox("流式写出（低内存，适合超大文件夹）")
 
         btn_input = QPushButton("选择激光路径")
         btn_output = QPushButton("选择保存路径")
@@ -31,6 +37,12 @@ class LidarConvertDialog(QDialog):
         layout = QVBoxLayout()
         layout.addLayout(self._build_row("激光路径：", self.input_edit, btn_input))
         layout.addLayout(self._build_row("保存路径：", self.output_edit, btn_output))
+        filter_row = QHBoxLayout()
+        filter_row.addWidget(QLabel("筛选条件："))
+        filter_row.addWidget(self.filter_edit)
+        layout.addLayout(filter_row)
+        layout.addWidget(self.cache_check)
+        layout.addWidget(self.streaming_check)
         layout.addWidget(btn_run)
 
         self.setLayout(layout)
@@ -66,16 +78,24 @@ class LidarConvertDialog(QDialog):
         if not output_path:
             QMessageBox.warning(self, "错误", "请选择输出路径")
             return
+        try:
+            filters = parse_filter_spec(self.filter_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
 
         os.makedirs(output_path, exist_ok=True)
-        self.log_func(f"\n=====激光格式转换=====\n输入路径: {input_path}\n输出路径: {output_path}\n")
+        self.log_func(f"\n=====激光格式转换=====\n输入路径: {input_path}\n输出路径: {output_path}\n筛选条件: {format_filter_spec(filters)}\n")
 
         parent = self.parent()
         logger = parent.logger if parent and hasattr(parent, "logger") else None
 
         # 使用后台线程执行转换任务
         self.thread = QThread()
-        self.worker = TaskRunner(convert_all_lidar_folders, input_path, output_path, self.log_func, logger)
+        self.worker = TaskRunner(convert_all_lidar_folders, input_path, output_path, self.log_func, logger,
+                                 write_cache=self.cache_check.isChecked(),
+                                 streaming=self.streaming_check.isChecked(),
+                                 filters=filters)
         self.worker.moveToThread(self.thread)
 
         self.thread.started.connect(self.worker.run)
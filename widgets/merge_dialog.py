@@ -0,0 +1,100 @@
+import os
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
+    QHBoxLayout, QFileDialog, QMessageBox
+)
+from core.shp_merger import find_vector_files, merge_vector_files
+from core.task_runner import TaskRunner
+from core.thread_manager import ThreadManager
+
+
+class MergeDialog(QDialog):
+    def __init__(self, project_path, log_func, on_result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("SHP 合并")
+
+        self.project_path = project_path
+        self.log_func = log_func
+        self.on_result = on_result
+
+        self.input_edit = QLineEdit()
+        self.output_edit = QLineEdit(os.path.join(project_path, "merge", "merged.gpkg"))
+
+        btn_input = QPushButton("选择矢量路径")
+        btn_output = QPushButton("选择保存文件")
+        btn_run = QPushButton("开始合并")
+
+        btn_input.clicked.connect(self.select_input_path)
+        btn_output.clicked.connect(self.select_output_file)
+        btn_run.clicked.connect(self.start_merge)
+
+        layout = QVBoxLayout()
+        layout.addLayout(self._build_row("矢量路径：", self.input_edit, btn_input))
+        layout.addLayout(self._build_row("保存文件：", self.output_edit, btn_output))
+        layout.addWidget(btn_run)
+
+        self.setLayout(layout)
+
+    def _build_row(self, label_text, *widgets):
+        layout = QHBoxLayout()
+        layout.addWidget(QLabel(label_text))
+        for w in widgets:
+            layout.addWidget(w)
+        return layout
+
+    def select_input_path(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择矢量文件夹")
+        if folder:
+            self.input_edit.setText(folder)
+
+    def select_output_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "选择保存文件", self.output_edit.text(),
+                                              "GeoPackage (*.gpkg);;Shapefile (*.shp)")
+        if path:
+            self.output_edit.setText(path)
+
+    def start_merge(self):
+        input_path = self.input_edit.text().strip()
+        output_file = self.output_edit.text().strip()
+
+        if not os.path.isdir(input_path):
+            QMessageBox.warning(self, "错误", "请选择有效的矢量路径")
+            return
+        if not output_file.lower().endswith((".gpkg", ".shp")):
+            QMessageBox.warning(self, "错误", "保存文件须为 .gpkg 或 .shp")
+            return
+
+        input_files = [p for p in find_vector_files(input_path)
+                       if os.path.abspath(p) != os.path.abspath(output_file)]
+        if not input_files:
+            QMessageBox.warning(self, "错误", "所选路径下没有 shapefile")
+            return
+
+        self.log_func(f"\n=====SHP 合并=====\n矢量路径: {input_path}\n文件数量: {len(input_files)}\n"
+                      f"保存文件: {output_file}\n")
+
+        parent = self.parent()
+        logger = parent.logger if parent and hasattr(parent, "logger") else None
+
+        # 包装成无参函数以获取结果
+        def wrapper():
+            self.worker.result = merge_vector_files(input_files, output_file, self.log_func, logger)
+
+        self.thread = QThread()
+        self.worker = TaskRunner(wrapper)
+        self.worker.result = None
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(lambda: self.on_result(self.worker.result))
+        self.worker.failed.connect(self.thread.quit)
+        self.worker.failed.connect(lambda msg: QMessageBox.critical(self, "错误", f"任务失败：{msg}"))
+
+        self.thread.start()
+
+        ThreadManager.instance().register(self.thread)
+
+        self.accept()
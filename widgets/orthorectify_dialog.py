@@ -1,10 +1,11 @@
 import os
 from PyQt5.QtWidgets import (
     QDialog, QLabel, QLineEdit, QPushButton, QHBoxLayout,
-    QVBoxLayout, QFileDialog, QMessageBox
+    QVBoxLayout, QFileDialog, QMessageBox, QCheckBox, QSpinBox
 )
 from PyQt5.QtCore import QThread
 from core.task_runner import TaskRunner
+from core.gdal_profile import ResourceProfile
 from core.orthorectifier import orthorectify_all
 from core.thread_manager import ThreadManager
 
@@ -23,18 +24,45 @@ class OrthorectifyDialog(QDialog):
         self.input_edit = QLineEdit()
         self.output_edit = QLineEdit()
         self.output_edit.setText(os.path.join(self.project_path, "orthorectified"))
+        self.dem_edit = QLineEdit()
+        self.dem_edit.setPlaceholderText("可选，留空则使用 RPC 平均高程")
 
         input_btn = QPushButton("选择影像路径")
         output_btn = QPushButton("选择保存路径")
+        dem_btn = QPushButton("选择 DEM")
         start_btn = QPushButton("开始正射")
 
+        # 勾选时超大影像自动按输出窗口分块并行正射
+        self.tiled_check = QCheckBox("大幅影像分块并行正射")
+        self.tiled_check.setChecked(True)
+
+        # 预览模式只计算各景范围，几秒内即可在地图上看到落位
+        self.preview_check = QCheckBox("仅预览影像范围（不做完整正射）")
+        self.preview_images_check = QCheckBox("预览时生成降采样正射影像")
+        self.preview_images_check.setEnabled(False)
+        self.preview_check.toggled.connect(self.preview_images_check.setEnabled)
+
+        # 资源配置：默认按本机 CPU 核数与可用内存推算
+        profile = ResourceProfile.auto()
+        cpu_count = os.cpu_count() or 1
+        self.concurrent_spin = self._spin_box(1, cpu_count, profile.concurrent_warps)
+        self.threads_spin = self._spin_box(1, cpu_count, profile.warp_threads)
+        self.cache_spin = self._spin_box(64, 1 << 20, profile.cache_mb)
+        self.warp_memory_spin = self._spin_box(64, 1 << 20, profile.warp_memory_mb)
+
         input_btn.clicked.connect(self.choose_input_path)
         output_btn.clicked.connect(self.choose_output_path)
+        dem_btn.clicked.connect(self.choose_dem_path)
         start_btn.clicked.connect(self.start_orthorectify)
 
         layout = QVBoxLayout()
         layout.addLayout(self._form_row("影像路径：", self.input_edit, input_btn))
         layout.addLayout(self._form_row("保存路径：", self.output_edit, output_btn))
+        layout.addLayout(self._form_row("DEM：", self.dem_edit, dem_btn))
+        layout.addWidget(self.tiled_check)
+        layout.addWidget(self.preview_check)
+        layout.addWidget(self.preview_images_check)
+        layout.addLayout(self._profile_row())
         layout.addWidget(start_btn)
         self.setLayout(layout)
 
@@ -45,6 +73,20 @@ class OrthorectifyDialog(QDialog):
         layout.addWidget(button)
         return layout
 
+    def _spin_box(self, minimum, maximum, value):
+        spin = QSpinBox()
+        spin.setRange(minimum, maximum)
+        spin.setValue(min(max(value, minimum), maximum))
+        return spin
+
+    def _profile_row(self):
+        layout = QHBoxLayout()
+        for label_text, spin in (("并发景数：", self.concurrent_spin), ("每景线程：", self.threads_spin),
+                                 ("每景缓存(MB)：", self.cache_spin), ("Warp 缓冲(MB)：", self.warp_memory_spin)):
+            layout.addWidget(QLabel(label_text))
+            layout.addWidget(spin)
+        return layout
+
     def choose_input_path(self):
         folder = QFileDialog.getExistingDirectory(self, "选择影像文件夹")
         if folder:
@@ -55,9 +97,15 @@ class OrthorectifyDialog(QDialog):
         if folder:
             self.output_edit.setText(folder)
 
+    def choose_dem_path(self):
+        path, _ = QFileDialog.getOpenFileName(self, "选择 DEM 文件", "", "DEM (*.tif *.tiff *.vrt *.img);;所有文件 (*)")
+        if path:
+            self.dem_edit.setText(path)
+
     def start_orthorectify(self):
         input_path = self.input_edit.text().strip()
         output_path = self.output_edit.text().strip()
+        dem_path = self.dem_edit.text().strip() or None
 
         if not os.path.isdir(input_path):
             QMessageBox.warning(self, "错误", "请输入有效影像路径")
@@ -65,16 +113,27 @@ class OrthorectifyDialog(QDialog):
         if not output_path:
             QMessageBox.warning(self, "错误", "请输入有效保存路径")
             return
+        if dem_path and not os.path.isfile(dem_path):
+            QMessageBox.warning(self, "错误", "请输入有效 DEM 文件")
+            return
+
+        tiled = None if self.tiled_check.isChecked() else False
+        preview = self.preview_check.isChecked()
+        preview_images = preview and self.preview_images_check.isChecked()
+        profile = ResourceProfile(self.concurrent_spin.value(), self.threads_spin.value(),
+                                  self.cache_spin.value(), self.warp_memory_spin.value())
 
         os.makedirs(output_path, exist_ok=True)
-        self.log_func(f"\n=====影像正射=====\n输入路径: {input_path}\n输出路径: {output_path}\n")
+        self.log_func(f"\n=====影像正射=====\n输入路径: {input_path}\n输出路径: {output_path}\nDEM: {dem_path or '无'}\n")
 
         parent = self.parent()
         logger = parent.logger if parent and hasattr(parent, "logger") else None
 
         # 包装成无参函数以获取结果
         def wrapper():
-            self.worker.result = orthorectify_all(input_path, output_path, self.log_func)
+            self.worker.result, _ = orthorectify_all(input_path, output_path, self.log_func, tiled=tiled,
+                                                     dem_path=dem_path, profile=profile, preview=preview,
+                                                     preview_images=preview_images)
 
         self.thread = QThread()
         self.worker = TaskRunner(wrapper)
@@ -83,7 +142,7 @@ class OrthorectifyDialog(QDialog):
 
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(lambda: self.log_func("📌 所有影像正射完成"))
+        self.worker.finished.connect(lambda: self.log_func("📌 影像范围预览完成" if preview else "📌 所有影像正射完成"))
         self.worker.finished.connect(lambda: self.on_result(self.worker.result))
 
         self.worker.failed.connect(self.thread.quit)
@@ -0,0 +1,115 @@
+import os
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
+    QHBoxLayout, QFileDialog, QMessageBox, QSpinBox
+)
+from core.pipeline import run_pipeline
+from core.task_runner import TaskRunner
+from core.thread_manager import ThreadManager
+
+
+class PipelineDialog(QDialog):
+    def __init__(self, project_path, log_func, on_layer, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("流水线处理")
+
+        self.project_path = project_path
+        self.log_func = log_func
+        self.on_layer = on_layer
+
+        self.input_edit = QLineEdit()
+        self.output_edit = QLineEdit(project_path)
+        self.dem_edit = QLineEdit()
+        self.dem_edit.setPlaceholderText("可选，留空则使用 RPC 高程偏移面")
+        self.count_spin = QSpinBox()
+        self.count_spin.setRange(0, 10_000_000)
+        self.count_spin.setValue(10000)
+        self.count_spin.setSpecialValueText("不抽稀")
+
+        btn_input = QPushButton("选择压缩包路径")
+        btn_output = QPushButton("选择保存路径")
+        btn_dem = QPushButton("选择 DEM")
+        btn_run = QPushButton("开始处理")
+
+        btn_input.clicked.connect(self.select_input_path)
+        btn_output.clicked.connect(self.select_output_path)
+        btn_dem.clicked.connect(self.select_dem_path)
+        btn_run.clicked.connect(self.start_pipeline)
+
+        layout = QVBoxLayout()
+        layout.addLayout(self._build_row("压缩包路径：", self.input_edit, btn_input))
+        layout.addLayout(self._build_row("保存路径：", self.output_edit, btn_output))
+        layout.addLayout(self._build_row("DEM：", self.dem_edit, btn_dem))
+        layout.addLayout(self._build_row("抽稀点数：", self.count_spin))
+        layout.addWidget(btn_run)
+
+        self.setLayout(layout)
+
+    def _build_row(self, label_text, *widgets):
+        layout = QHBoxLayout()
+        layout.addWidget(QLabel(label_text))
+        for w in widgets:
+            layout.addWidget(w)
+        return layout
+
+    def select_input_path(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择压缩文件路径")
+        if folder:
+            self.input_edit.setText(folder)
+
+    def select_output_path(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择保存路径", self.output_edit.text())
+        if folder:
+            self.output_edit.setText(folder)
+
+    def select_dem_path(self):
+        path, _ = QFileDialog.getOpenFileName(self, "选择 DEM 文件", "", "DEM (*.tif *.tiff *.vrt *.img);;所有文件 (*)")
+        if path:
+            self.dem_edit.setText(path)
+
+    def start_pipeline(self):
+        input_path = self.input_edit.text().strip()
+        output_path = self.output_edit.text().strip()
+        dem_path = self.dem_edit.text().strip() or None
+        target_count = self.count_spin.value() or None
+
+        if not os.path.isdir(input_path):
+            QMessageBox.warning(self, "错误", "请输入有效的压缩文件路径")
+            return
+        if not output_path:
+            QMessageBox.warning(self, "错误", "请输入保存路径")
+            return
+        if dem_path and not os.path.isfile(dem_path):
+            QMessageBox.warning(self, "错误", "请输入有效 DEM 文件")
+            return
+
+        os.makedirs(output_path, exist_ok=True)
+        self.log_func(f"\n=====流水线处理=====\n输入路径: {input_path}\n输出路径: {output_path}\n"
+                      f"DEM: {dem_path or '无'}\n抽稀点数: {target_count or '不抽稀'}\n")
+
+        parent = self.parent()
+        logger = parent.logger if parent and hasattr(parent, "logger") else None
+
+        # 每景正射完成后经 progress 信号回到界面线程注册图层
+        def wrapper():
+            run_pipeline(input_path, output_path, self.log_func, logger, target_count=target_count,
+                         dem_path=dem_path, on_layer=self.worker.progress.emit)
+
+        self.thread = QThread()
+        self.worker = TaskRunner(wrapper)
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.progress.connect(lambda path: self.on_layer([path]))
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(lambda: QMessageBox.information(self, "完成", "流水线处理已完成！"))
+        self.worker.failed.connect(self.thread.quit)
+        self.worker.failed.connect(lambda msg: QMessageBox.critical(self, "错误", f"任务失败：{msg}"))
+
+        self.thread.start()
+
+        ThreadManager.instance().register(self.thread)
+
+        self.accept()
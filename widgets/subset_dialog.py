@@ -0,0 +1,113 @@
+import os
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout,
+    QHBoxLayout, QFileDialog, QMessageBox, QComboBox, QDoubleSpinBox
+)
+from core.subset_selector import select_subset_file, COVERAGE_GOAL
+from core.task_runner import TaskRunner
+from core.thread_manager import ThreadManager
+
+
+class SubsetDialog(QDialog):
+    def __init__(self, project_path, log_func, on_result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("影像优选子集")
+
+        self.project_path = project_path
+        self.log_func = log_func
+        self.on_result = on_result
+
+        self.footprint_edit = QLineEdit(os.path.join(project_path, "boundary", "boundaries.shp"))
+        self.target_edit = QLineEdit()
+        self.output_edit = QLineEdit(os.path.join(project_path, "subset", "subset.shp"))
+        self.weight_edit = QLineEdit()
+        self.weight_edit.setPlaceholderText("可选，如云量、日期、侧摆角字段；留空则只按覆盖面积选取")
+        self.prefer_combo = QComboBox()
+        self.prefer_combo.addItem("低值优先（云量、侧摆角）", False)
+        self.prefer_combo.addItem("高值优先（日期越新越好）", True)
+        self.coverage_spin = QDoubleSpinBox()
+        self.coverage_spin.setRange(0.5, 1.0)
+        self.coverage_spin.setSingleStep(0.01)
+        self.coverage_spin.setValue(COVERAGE_GOAL)
+
+        btn_footprint = QPushButton("选择边界图层")
+        btn_target = QPushButton("选择目标区域")
+        btn_output = QPushButton("选择保存文件")
+        btn_run = QPushButton("开始优选")
+
+        btn_footprint.clicked.connect(lambda: self._open_shp(self.footprint_edit, "选择边界图层"))
+        btn_target.clicked.connect(lambda: self._open_shp(self.target_edit, "选择目标区域"))
+        btn_output.clicked.connect(self.select_output_file)
+        btn_run.clicked.connect(self.start_select)
+
+        layout = QVBoxLayout()
+        layout.addLayout(self._build_row("边界图层：", self.footprint_edit, btn_footprint))
+        layout.addLayout(self._build_row("目标区域：", self.target_edit, btn_target))
+        layout.addLayout(self._build_row("保存文件：", self.output_edit, btn_output))
+        layout.addLayout(self._build_row("权重字段：", self.weight_edit, self.prefer_combo))
+        layout.addLayout(self._build_row("目标覆盖率：", self.coverage_spin))
+        layout.addWidget(btn_run)
+
+        self.setLayout(layout)
+
+    def _build_row(self, label_text, *widgets):
+        layout = QHBoxLayout()
+        layout.addWidget(QLabel(label_text))
+        for w in widgets:
+            layout.addWidget(w)
+        return layout
+
+    def _open_shp(self, line_edit, title):
+        path, _ = QFileDialog.getOpenFileName(self, title, line_edit.text(), "Shapefile (*.shp)")
+        if path:
+            line_edit.setText(path)
+
+    def select_output_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "选择保存文件", self.output_edit.text(), "Shapefile (*.shp)")
+        if path:
+            self.output_edit.setText(path)
+
+    def start_select(self):
+        footprint_file = self.footprint_edit.text().strip()
+        target_file = self.target_edit.text().strip()
+        output_file = self.output_edit.text().strip()
+        weight_field = self.weight_edit.text().strip() or None
+        prefer_high = self.prefer_combo.currentData()
+        coverage_goal = self.coverage_spin.value()
+
+        if not os.path.isfile(footprint_file):
+            QMessageBox.warning(self, "错误", "请选择有效的边界图层")
+            return
+        if not os.path.isfile(target_file):
+            QMessageBox.warning(self, "错误", "请选择有效的目标区域")
+            return
+        if not output_file.lower().endswith(".shp"):
+            QMessageBox.warning(self, "错误", "保存文件须为 .shp")
+            return
+
+        self.log_func(f"\n=====影像优选子集=====\n边界图层: {footprint_file}\n目标区域: {target_file}\n"
+                      f"保存文件: {output_file}\n权重字段: {weight_field or '无'}\n目标覆盖率: {coverage_goal:.2f}\n")
+
+        # 包装成无参函数以获取结果
+        def wrapper():
+            self.worker.result = select_subset_file(footprint_file, target_file, output_file, self.log_func,
+                                                    weight_field, prefer_high, coverage_goal)
+
+        self.thread = QThread()
+        self.worker = TaskRunner(wrapper)
+        self.worker.result = None
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(lambda: self.on_result(self.worker.result))
+        self.worker.failed.connect(self.thread.quit)
+        self.worker.failed.connect(lambda msg: QMessageBox.critical(self, "错误", f"任务失败：{msg}"))
+
+        self.thread.start()
+
+        ThreadManager.instance().register(self.thread)
+
+        self.accept()
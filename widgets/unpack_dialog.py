@@ -20,6 +20,10 @@ class UnpackDialog(QDialog):
 
         self.input_edit = QLineEdit()
         self.output_edit = QLineEdit(os.path.join(project_path, "unpack"))
+        self.include_edit = QLineEdit()
+        self.include_edit.setPlaceholderText("可选，如 *.csv; *.tif; *.rpb，留空则解压全部")
+        self.exclude_edit = QLineEdit()
+        self.exclude_edit.setPlaceholderText("可选，如 *.jpg; *browse*")
 
         btn_input = QPushButton("选择压缩包路径")
         btn_output = QPushButton("选择保存路径")
@@ -33,17 +37,23 @@ class UnpackDialog(QDialog):
         layout = QVBoxLayout()
         layout.addLayout(self._build_row("压缩包路径：", self.input_edit, btn_input))
         layout.addLayout(self._build_row("保存路径：", self.output_edit, btn_output))
+        layout.addLayout(self._build_row("包含文件：", self.include_edit))
+        layout.addLayout(self._build_row("排除文件：", self.exclude_edit))
         layout.addWidget(btn_ok)
 
         self.setLayout(layout)
 
-    def _build_row(self, label_text, line_edit, button):
+    def _build_row(self, label_text, *widgets):
         layout = QHBoxLayout()
         layout.addWidget(QLabel(label_text))
-        layout.addWidget(line_edit)
-        layout.addWidget(button)
+        for w in widgets:
+            layout.addWidget(w)
         return layout
 
+    def _patterns(self, line_edit):
+        text = line_edit.text().replace("；", ";").replace(",", ";")
+        return [p.strip() for p in text.split(";") if p.strip()] or None
+
     def select_input_path(self):
         folder = QFileDialog.getExistingDirectory(self, "选择压缩文件路径")
         if folder:
@@ -67,15 +77,20 @@ class UnpackDialog(QDialog):
             QMessageBox.warning(self, "错误", "请输入保存路径")
             return
 
+        include = self._patterns(self.include_edit)
+        exclude = self._patterns(self.exclude_edit)
+
         os.makedirs(output_path, exist_ok=True)
-        self.log_func(f"\n=====批量解压=====\n输入路径: {input_path}\n输出路径: {output_path}\n")
+        self.log_func(f"\n=====批量解压=====\n输入路径: {input_path}\n输出路径: {output_path}\n"
+                      f"包含文件: {'; '.join(include) if include else '全部'}\n"
+                      f"排除文件: {'; '.join(exclude) if exclude else '无'}\n")
 
         parent = self.parent()
         logger = parent.logger if parent and hasattr(parent, "logger") else None
 
         # 启动后台线程任务
         self.thread = QThread()
-        self.worker = TaskRunner(unpack_all, input_path, output_path, self.log_func)
+        self.worker = TaskRunner(unpack_all, input_path, output_path, self.log_func, include=include, exclude=exclude)
         self.worker.moveToThread(self.thread)
 
         self.thread.started.connect(self.worker.run)